@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Asteroid, Observation
+from .models import Asteroid, DesignationMapping, IngestedFile, MappingSource, Observation
 
 admin.site.register(Asteroid)
-admin.site.register(Observation)
\ No newline at end of file
+admin.site.register(Observation)
+admin.site.register(IngestedFile)
+admin.site.register(DesignationMapping)
+admin.site.register(MappingSource)
\ No newline at end of file
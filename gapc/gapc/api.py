@@ -0,0 +1,214 @@
+# gapc/api.py
+"""
+Read-only JSON endpoints of the GAPC catalog.
+
+The list endpoints read rows with `values_list()` (no model instances), return
+only the fields named in `fields` and page with a keyset cursor on the primary
+key: each page is an indexed range scan, however deep into the catalog it is.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse
+from django.views.decorators.http import condition, require_GET
+
+from .catalog_cache import catalog_etag, catalog_last_modified
+from .models import Asteroid, Observation
+from .search import rank_designations
+from .views import filter_observations, parse_date_param
+
+# Fields of the list endpoints, by public name: column (or annotation) read for each
+ASTEROID_FIELDS = {
+    'provisional_name': 'provisional_name',
+    'official_name': 'official_name',
+    'status': 'status',
+    'target_class': 'target_class',
+    'is_neo': 'is_neo',
+    'observation_count': 'observation_count',
+}
+OBSERVATION_FIELDS = {
+    'obs_id': 'obs_id',
+    'asteroid': 'asteroid_id',
+    'date_obs': 'date_obs',
+    'naxis1': 'naxis1',
+    'naxis2': 'naxis2',
+    'temperat': 'temperat',
+    'exptime': 'exptime',
+    'exposure': 'exposure',
+    'ra': 'ra',
+    'dec': 'dec',
+    'ra_deg': 'ra_deg',
+    'dec_deg': 'dec_deg',
+    'filename': 'filename',
+}
+
+
+class APIError(ValueError):
+    """Invalid request parameter, reported as a 400 response."""
+
+
+def encode_cursor(key):
+    """Opaque cursor of the page following the row with primary key `key`."""
+    return urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(urlsafe_b64decode(cursor.encode('ascii')))
+    except (DecodeError, UnicodeError, ValueError):
+        raise APIError('Invalid cursor')
+
+
+def selected_fields(request, available):
+    """Return the public field names requested with `fields` (comma separated), all of them by default."""
+    if not request.GET.get('fields'):
+        return list(available)
+    fields = [name.strip() for name in request.GET['fields'].split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise APIError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(available)}")
+    return list(dict.fromkeys(fields))
+
+
+def keyset_page(request, queryset, key, fields, available):
+    """
+    Read one page of a queryset ordered by its primary key `key`, after the request cursor.
+
+    :param fields: Public names of the fields to return
+    :param available: Column of each public field name
+    :return: The response payload: results, and the cursor and URL of the next page (None on the last page)
+    """
+    try:
+        limit = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise APIError('limit must be an integer')
+    limit = max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+    if request.GET.get('cursor'):
+        try:
+            queryset = queryset.filter(**{f'{key}__gt': decode_cursor(request.GET['cursor'])})
+        except (TypeError, ValueError):
+            raise APIError('Invalid cursor')
+    # The key is always read, to build the next cursor
+    columns = [available[name] for name in fields]
+    rows = list(queryset.order_by(key).values_list(key, *columns)[:limit + 1])
+
+    next_cursor = next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][0])
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        next_url = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+    return {
+        'count': len(rows),
+        'next_cursor': next_cursor,
+        'next': next_url,
+        'results': [dict(zip(fields, row[1:])) for row in rows],
+    }
+
+
+def api_view(view):
+    """Read-only catalog endpoint: GET only, revalidated with the catalog version, APIError as 400."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return JsonResponse(view(request, *args, **kwargs))
+        except APIError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+    return require_GET(condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)(wrapper))
+
+
+RANK_LABELS = {0: 'exact', 1: 'prefix', 2: 'substring'}
+
+
+@api_view
+def search_asteroids(request):
+    """
+    Search asteroids by designation through the search index, best match first.
+
+    Query parameters: q (designation, case and spacing are ignored) and limit.
+    """
+    query = request.GET.get('q', '')
+    try:
+        limit = min(int(request.GET.get('limit', 20)), settings.SEARCH_MAX_RESULTS)
+    except ValueError:
+        raise APIError('limit must be an integer')
+
+    ranked = rank_designations(query, limit=max(1, limit))
+    asteroids = Asteroid.objects.in_bulk([name for name, _ in ranked])
+    results = [
+        {
+            'provisional_name': name,
+            'official_name': asteroids[name].official_name,
+            'status': asteroids[name].status,
+            'target_class': asteroids[name].target_class,
+            'is_neo': asteroids[name].is_neo,
+            'match': RANK_LABELS[rank],
+        }
+        for name, rank in ranked if name in asteroids
+    ]
+    return {'query': query, 'count': len(results), 'results': results}
+
+
+@api_view
+def asteroid_list(request):
+    """
+    List asteroids, by provisional name.
+
+    Query parameters: status, target_class, is_neo (true/false), date_from and
+    date_to (asteroids observed in that range, as for `filter_observations`),
+    fields (comma separated, see ASTEROID_FIELDS), limit and cursor (the
+    `next_cursor` of the previous page).
+    """
+    fields = selected_fields(request, ASTEROID_FIELDS)
+    params = request.GET
+    queryset = Asteroid.objects.all()
+    if params.get('status'):
+        queryset = queryset.filter(status=params['status'])
+    if params.get('target_class'):
+        queryset = queryset.filter(target_class=params['target_class'])
+    if params.get('is_neo'):
+        if params['is_neo'].lower() not in ('true', 'false', '1', '0'):
+            raise APIError('is_neo must be true or false')
+        queryset = queryset.filter(is_neo=params['is_neo'].lower() in ('true', '1'))
+    if params.get('date_from') or params.get('date_to'):
+        observations = Observation.objects.filter(asteroid=OuterRef('pk'))
+        try:
+            if params.get('date_from'):
+                observations = observations.filter(date_obs__gte=parse_date_param(params['date_from']))
+            if params.get('date_to'):
+                observations = observations.filter(date_obs__lt=parse_date_param(params['date_to'], end=True))
+        except ValueError as e:
+            raise APIError(str(e))
+        queryset = queryset.filter(Exists(observations))
+    if 'observation_count' in fields:
+        # Correlated count, evaluated for the rows of the page only (through the asteroid/date index)
+        counts = (
+            Observation.objects.filter(asteroid=OuterRef('pk')).order_by()
+            .values('asteroid').annotate(count=Count('pk')).values('count')
+        )
+        queryset = queryset.annotate(observation_count=Coalesce(Subquery(counts), 0))
+    return keyset_page(request, queryset, 'provisional_name', fields, ASTEROID_FIELDS)
+
+
+@api_view
+def observation_list(request):
+    """
+    List observations, by observation id.
+
+    Query parameters: the filters of `filter_observations` (asteroid, status,
+    target_class, is_neo, date_from, date_to), fields (comma separated, see
+    OBSERVATION_FIELDS), limit and cursor (the `next_cursor` of the previous page).
+    """
+    fields = selected_fields(request, OBSERVATION_FIELDS)
+    try:
+        queryset = filter_observations(Observation.objects.all(), request.GET)
+    except ValueError as e:
+        raise APIError(str(e))
+    return keyset_page(request, queryset, 'obs_id', fields, OBSERVATION_FIELDS)
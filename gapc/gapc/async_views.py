@@ -0,0 +1,137 @@
+"""
+Async variants of the FITS-heavy views, for ASGI deployments.
+
+Under ASGI, Django runs each synchronous view in a thread of its request,
+without bound: a few slow preview renders or cutouts compete for the CPU and
+the GIL with every other page. In these views, FITS decoding and image
+encoding run in a bounded executor instead (threads, or processes with
+settings.FITS_EXECUTOR), shared by all requests, and file bodies are read in
+chunks from the default executor while they are sent. Under WSGI, where
+async views are run to completion per request, bodies are served as in the
+synchronous views.
+
+They are routed instead of their synchronous counterparts of `gapc.views`
+when settings.FITS_ASYNC_VIEWS is set. The other streamed responses (VOTable
+and catalog exports, frame bundles, cone searches) come from synchronous
+views, whose bodies are generated chunk by chunk while they are sent, see
+`gapc.views.streaming_response`.
+"""
+import os
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+
+from . import previews, views
+from .metrics import timed
+from .views import cutout_response, download_response, parse_cutout_params, preview_response, processed_fits_path
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def fits_executor():
+    """Return the executor running FITS work, created on first use with settings.FITS_EXECUTOR_WORKERS workers."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if settings.FITS_EXECUTOR == 'process':
+                # Workers import the ORM-free gapc.previews only, spawned to stay clear of the server's threads
+                _executor = ProcessPoolExecutor(settings.FITS_EXECUTOR_WORKERS,
+                                                mp_context=multiprocessing.get_context('spawn'))
+            else:
+                _executor = ThreadPoolExecutor(settings.FITS_EXECUTOR_WORKERS, thread_name_prefix='gapc-fits')
+        return _executor
+
+
+async def run_fits_task(func, *args, **kwargs):
+    """Run `func(*args, **kwargs)` in the FITS executor and return its result, timed as FITS work."""
+    loop = asyncio.get_running_loop()
+    with timed('fits'):
+        return await loop.run_in_executor(fits_executor(), partial(func, *args, **kwargs))
+
+
+async def aiter_file(path, chunk_size=None, start=0, length=None):
+    """Yield `length` bytes of a file from `start` (by default, all of it) in chunks, each read in the default executor."""
+    chunk_size = chunk_size or settings.FILE_STREAM_CHUNK_SIZE
+    remaining = float('inf') if length is None else length
+    loop = asyncio.get_running_loop()
+    fileobj = await loop.run_in_executor(None, open, path, 'rb')
+    try:
+        if start:
+            await loop.run_in_executor(None, fileobj.seek, start)
+        while remaining > 0:
+            chunk = await loop.run_in_executor(None, fileobj.read, min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def file_response(request, path, content_type, start=0, length=None):
+    """
+    Response streaming `length` bytes of a file from `start` (by default, all of it):
+    asynchronously under ASGI, as in the synchronous views otherwise.
+    """
+    if not isinstance(request, ASGIRequest):
+        return views.file_response(request, path, content_type, start, length)
+    if length is None:
+        length = os.path.getsize(path) - start
+    response = StreamingHttpResponse(aiter_file(path, start=start, length=length), content_type=content_type)
+    response['Content-Length'] = length
+    return response
+
+
+async def preview_image(request, filename):
+    """
+    Serve the cached preview image of a FITS file, rendering it in the FITS executor on first request.
+    """
+    fits_file_path = processed_fits_path(filename)
+
+    try:
+        image_path, key = await run_fits_task(
+            previews.ensure_preview, fits_file_path, filename, settings.PREVIEW_DIR,
+            max_size=settings.PREVIEW_MAX_SIZE, fmt=settings.PREVIEW_FORMAT,
+        )
+    except Exception as e:
+        logger.error(f"Error generating preview for FITS file '{filename}': {e}")
+        return HttpResponse("Error generating preview for FITS file.", status=500)
+
+    return preview_response(request, key, partial(file_response, request, image_path))
+
+
+async def fits_cutout(request, filename):
+    """
+    Return a square cutout of a FITS image, read and encoded in the FITS executor.
+
+    Query parameters: see `gapc.views.parse_cutout_params`.
+    """
+    fits_file_path = processed_fits_path(filename)
+    try:
+        params = parse_cutout_params(request.GET)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    try:
+        content, content_type = await run_fits_task(previews.render_cutout, fits_file_path, filename, **params)
+    except ValueError as e:
+        return HttpResponseBadRequest(f"Invalid cutout: {e}")
+    except Exception as e:
+        logger.error(f"Error reading cutout of FITS file '{filename}': {e}")
+        return HttpResponse("Error reading FITS file.", status=500)
+    return cutout_response(filename, content, content_type)
+
+
+async def download_fits(request, filename):
+    """ Download a processed FITS file, or a byte range of it, streamed without blocking the event loop. """
+    return download_response(request, filename, processed_fits_path(filename), file_response)
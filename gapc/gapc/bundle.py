@@ -0,0 +1,171 @@
+"""
+Streaming ZIP and TAR bundles of processed FITS frames.
+
+Archives are built on the fly while they are sent: frames are copied from the
+processed directory in chunks, stored as they are (FITS files are usually
+already compressed, or barely compressible), and every chunk is yielded as soon
+as it is written, so memory use is constant and the first bytes are sent right
+away, whatever the size of the bundle.
+
+- ZIP entries are written with data descriptors (sizes and CRC follow the data)
+  and ZIP64 extensions, by the standard `zipfile` writer on an unseekable sink,
+  so bundles and frames may exceed 4 GiB.
+- TAR (POSIX pax format, no size or name limits) headers are written from the
+  size found on disk before copying each frame.
+
+A VOTable manifest of the observations (see `gapc.votable`), whose `fits_link`
+column holds the path of each frame relative to the manifest, is added as the
+last member. It is spooled to a temporary file while the frames are sent, as
+TAR headers need the size of the member.
+"""
+import os
+import time
+import logging
+import tarfile
+import tempfile
+import zipfile
+
+from .export import StreamSink
+from .votable import field_index, stream_votable
+
+logger = logging.getLogger(__name__)
+
+# File extension and content type of each bundle format
+BUNDLE_FORMATS = {
+    'zip': ('.zip', 'application/zip'),
+    'tar': ('.tar', 'application/x-tar'),
+}
+
+MANIFEST_NAME = 'manifest.xml'
+MANIFEST_SPOOL_SIZE = 4 * 1024 * 1024  # bytes of manifest kept in memory before spooling to disk
+TAR_BLOCK = tarfile.BLOCKSIZE
+
+
+def stream_bundle(chunks, processed_dir, bundle_format, name, chunk_size=256 * 1024):
+    """
+    Return an iterator of the bytes of a bundle of the frames of observations.
+
+    Frames missing from the processed directory are skipped (they are still listed in the manifest).
+
+    :param chunks: Iterator of row chunks, as returned by `observation_rows`
+    :param processed_dir: Directory of the processed FITS files
+    :param bundle_format: 'zip' or 'tar'
+    :param name: Name of the top directory of the archive
+    :param chunk_size: Bytes of a frame read at a time
+    """
+    if bundle_format == 'zip':
+        return stream_zip(chunks, processed_dir, name, chunk_size)
+    if bundle_format == 'tar':
+        return stream_tar(chunks, processed_dir, name, chunk_size)
+    raise ValueError(f"Unsupported bundle format: {bundle_format}")
+
+
+def bundle_members(chunks, processed_dir, name, manifest):
+    """
+    Yield the (archive name, path, stat result) of the frames of observations present on disk.
+
+    The rows are written to the `manifest` file object as a VOTable along the way.
+    """
+    link_index = field_index('fits_link')
+    members = []
+
+    def manifest_chunks():
+        for chunk in chunks:
+            for row in chunk:
+                filename = row[link_index]
+                if not filename:
+                    continue
+                path = os.path.join(processed_dir, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError as e:
+                    logger.warning(f"Bundle {name}: skipping frame '{filename}': {e}")
+                    continue
+                members.append((f"{name}/{filename}", path, stat))
+            yield chunk
+
+    # The frames of each chunk are sent once its manifest rows are written
+    for piece in stream_votable(manifest_chunks(), '', resource_name=f"GAPC {name}",
+                                description=f"Observations of the frames bundled in {name}"):
+        manifest.write(piece.encode('utf-8'))
+        yield from members
+        members.clear()
+
+
+def read_chunks(path, size, chunk_size):
+    """Yield exactly `size` bytes of a file in chunks, padded with zeros if it shrank meanwhile."""
+    with open(path, 'rb') as fileobj:
+        remaining = size
+        while remaining > 0:
+            chunk = fileobj.read(min(chunk_size, remaining))
+            if not chunk:
+                logger.warning(f"Bundle: '{path}' shrank while being sent, padded with zeros")
+                chunk = bytes(min(chunk_size, remaining))
+            remaining -= len(chunk)
+            yield chunk
+
+
+def stream_zip(chunks, processed_dir, name, chunk_size):
+    """Yield a ZIP64 archive of stored frames, followed by the manifest."""
+    sink = StreamSink()
+    with tempfile.SpooledTemporaryFile(MANIFEST_SPOOL_SIZE) as manifest:
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for arcname, path, stat in bundle_members(chunks, processed_dir, name, manifest):
+                info = zipfile.ZipInfo(arcname, time.localtime(stat.st_mtime)[:6])
+                info.file_size = stat.st_size  # Selects ZIP64 headers for large frames
+                info.external_attr = 0o644 << 16
+                with archive.open(info, 'w') as member:
+                    for chunk in read_chunks(path, stat.st_size, chunk_size):
+                        member.write(chunk)
+                        yield sink.drain()
+                yield sink.drain()
+
+            info = zipfile.ZipInfo(f"{name}/{MANIFEST_NAME}", time.localtime()[:6])
+            info.external_attr = 0o644 << 16
+            manifest.seek(0)
+            with archive.open(info, 'w') as member:
+                while chunk := manifest.read(chunk_size):
+                    member.write(chunk)
+                    yield sink.drain()
+        yield sink.drain()  # The central directory
+
+
+def tar_header(arcname, size, mtime):
+    """Header block(s) of a regular file member of a pax TAR archive."""
+    info = tarfile.TarInfo(arcname)
+    info.size = size
+    info.mtime = int(mtime)
+    info.mode = 0o644
+    return info.tobuf(format=tarfile.PAX_FORMAT)
+
+
+def stream_tar(chunks, processed_dir, name, chunk_size):
+    """Yield a pax TAR archive of the frames, followed by the manifest."""
+    length = 0
+    with tempfile.SpooledTemporaryFile(MANIFEST_SPOOL_SIZE) as manifest:
+        for arcname, path, stat in bundle_members(chunks, processed_dir, name, manifest):
+            header = tar_header(arcname, stat.st_size, stat.st_mtime)
+            length += len(header)
+            yield header
+            for chunk in read_chunks(path, stat.st_size, chunk_size):
+                length += len(chunk)
+                yield chunk
+            padding = bytes(-stat.st_size % TAR_BLOCK)
+            length += len(padding)
+            yield padding
+
+        size = manifest.tell()
+        manifest.seek(0)
+        header = tar_header(f"{name}/{MANIFEST_NAME}", size, time.time())
+        length += len(header)
+        yield header
+        while chunk := manifest.read(chunk_size):
+            length += len(chunk)
+            yield chunk
+        length += -size % TAR_BLOCK
+        yield bytes(-size % TAR_BLOCK)
+
+    # End of archive: two zero blocks, padded to a whole record like `tarfile` does
+    end = 2 * TAR_BLOCK
+    end += -(length + end) % tarfile.RECORDSIZE
+    yield bytes(end)
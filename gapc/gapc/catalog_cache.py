@@ -0,0 +1,77 @@
+"""
+Caching of the catalog pages, invalidated by a catalog version counter.
+
+The catalog only changes when FITS files are ingested, mappings are applied or
+records are edited in the admin. Each of these increments the single
+CatalogVersion row in the same transaction as the change (`populate` once per
+committed batch), and every cached value is keyed by the current version: a
+change makes all previous entries unreachable at once, so cached pages are
+never stale, and nothing is recomputed while the catalog does not change.
+Obsolete entries are evicted by the default cache backend (see settings.CACHES),
+which also holds the template fragments.
+
+The version also provides the ETag and Last-Modified headers of the pages, so
+browsers revalidating an unchanged page get a 304 without any rendering.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CatalogVersion
+
+CACHE_KEY_PREFIX = 'gapc'
+
+
+def catalog_version():
+    """
+    Return the current catalog version and the date of the last change.
+
+    :return: A (version, updated_at) tuple; updated_at is None before the first change
+    """
+    current = CatalogVersion.objects.filter(pk=1).values_list('version', 'updated_at').first()
+    return current or (0, None)
+
+
+def request_catalog_version(request):
+    """Return `catalog_version()`, read once per request."""
+    if not hasattr(request, '_catalog_version'):
+        request._catalog_version = catalog_version()
+    return request._catalog_version
+
+
+def bump_catalog_version():
+    """
+    Increment the catalog version, invalidating every cached page.
+
+    Call it inside the transaction of the change, so the new version becomes
+    visible together with the data.
+    """
+    updated = CatalogVersion.objects.filter(pk=1).update(version=F('version') + 1, updated_at=timezone.now())
+    if not updated:
+        CatalogVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+
+
+def cache_key(name, version, *parts):
+    """Cache key of a value computed from a catalog version and the given parts (e.g. query parameters)."""
+    digest = hashlib.md5(repr(parts).encode('utf-8'), usedforsecurity=False).hexdigest()
+    return f"{CACHE_KEY_PREFIX}:{name}:{version}:{digest}"
+
+
+def get_or_compute(name, version, compute, *parts):
+    """Return the cached value for (name, version, parts), computing and caching it on a miss."""
+    return cache.get_or_set(cache_key(name, version, *parts), compute, settings.CATALOG_CACHE_TIMEOUT)
+
+
+def catalog_etag(request, *args, **kwargs):
+    """ETag of a catalog page: the catalog version (the URL already identifies the page)."""
+    version, _ = request_catalog_version(request)
+    return f"catalog-{version}"
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    """Last-Modified of a catalog page: the date of the last catalog change."""
+    _, updated_at = request_catalog_version(request)
+    return updated_at
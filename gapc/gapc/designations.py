@@ -0,0 +1,118 @@
+"""
+Index of provisional to official designation mappings.
+
+Mappings scraped by the `mappings` command are upserted into the
+DesignationMapping table (one row per provisional name, the latest official name
+wins), so the index never holds duplicates however often it is refreshed.
+Ingest looks up only the provisional names of the batch at hand, and
+`apply_mappings` confirms the asteroids already in the catalog in bulk.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+
+from .catalog_cache import bump_catalog_version
+from .models import Asteroid, DesignationMapping
+from .search import index_asteroids
+
+logger = logging.getLogger(__name__)
+
+# Number of names per IN (...) lookup, below the SQLite host parameter limit
+LOOKUP_BATCH_SIZE = 900
+
+
+def upsert_mappings(mappings, batch_size=1000):
+    """
+    Insert or update designation mappings.
+
+    :param mappings: Iterable of (provisional_name, official_name) pairs; for repeated
+                     provisional names the last pair wins
+    :return: The number of distinct provisional names written
+    """
+    latest = {provisional_name: official_name for provisional_name, official_name in mappings}
+    DesignationMapping.objects.bulk_create(
+        [DesignationMapping(provisional_name=name, official_name=official) for name, official in latest.items()],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['provisional_name'],
+        update_fields=['official_name', 'updated_at'],
+    )
+    return len(latest)
+
+
+def lookup_official_names(provisional_names):
+    """Return the official names of the given provisional names that have a mapping, by provisional name."""
+    names = list(provisional_names)
+    official_names = {}
+    for start in range(0, len(names), LOOKUP_BATCH_SIZE):
+        official_names.update(
+            DesignationMapping.objects.filter(provisional_name__in=names[start:start + LOOKUP_BATCH_SIZE])
+            .values_list('provisional_name', 'official_name')
+        )
+    return official_names
+
+
+def pending_confirmations():
+    """
+    Return the asteroids whose official name or status disagrees with the mapping index.
+
+    :return: An asteroid queryset annotated with `mapped_name`, the official name from the index
+    """
+    mapped_name = DesignationMapping.objects.filter(
+        provisional_name=OuterRef('provisional_name')
+    ).values('official_name')[:1]
+    return (
+        Asteroid.objects.annotate(mapped_name=Subquery(mapped_name))
+        .filter(mapped_name__isnull=False)
+        .filter(Q(official_name__isnull=True) | ~Q(official_name=F('mapped_name')) | ~Q(status='confirmed'))
+        .order_by('provisional_name')
+    )
+
+
+def apply_mappings(classifier=None, batch_size=500):
+    """
+    Confirm the asteroids of the catalog that have a mapping, in bulk.
+
+    Sets their official name and the 'confirmed' status (and their classification,
+    when a classifier is given) with one UPDATE batch per `batch_size` asteroids,
+    and refreshes their search tokens. Asteroids whose official name is already
+    used by another asteroid are left unchanged.
+
+    :param classifier: An `SBDBClassifier` used to classify the newly confirmed asteroids, or None
+    :return: The number of asteroids updated
+    """
+    pending = list(pending_confirmations().values_list('provisional_name', 'mapped_name'))
+    updated = 0
+    for start in range(0, len(pending), batch_size):
+        chunk = pending[start:start + batch_size]
+        owners = dict(
+            Asteroid.objects.filter(official_name__in={official for _, official in chunk})
+            .values_list('official_name', 'provisional_name')
+        )
+        asteroids = Asteroid.objects.in_bulk([name for name, _ in chunk])
+        classifications = classifier.classify_many([official for _, official in chunk]) if classifier else {}
+
+        confirmed = []
+        for provisional_name, official_name in chunk:
+            owner = owners.setdefault(official_name, provisional_name)
+            if owner != provisional_name:
+                logger.warning(f"Cannot confirm {provisional_name} as {official_name}: already used by {owner}")
+                continue
+            asteroid = asteroids[provisional_name]
+            asteroid.official_name = official_name
+            asteroid.status = 'confirmed'
+            classification, neo = classifications.get(official_name, (None, None))
+            if classification:
+                asteroid.target_class = classification
+                asteroid.is_neo = bool(neo)
+            confirmed.append(asteroid)
+
+        with transaction.atomic():
+            Asteroid.objects.bulk_update(confirmed, ['official_name', 'status', 'target_class', 'is_neo'])
+            # bulk_update skips post_save, so the search index is updated explicitly
+            index_asteroids(confirmed)
+            if confirmed:
+                bump_catalog_version()
+        updated += len(confirmed)
+    return updated
@@ -0,0 +1,210 @@
+"""
+Streaming bulk export of observation tables, as Parquet, FITS binary table or gzipped CSV.
+
+Like `gapc.votable`, the writers consume the row chunks of `observation_rows`
+(a `values_list(...).iterator()` read) and yield the encoded file piece by
+piece, so memory use depends on the chunk size, not on the number of rows:
+
+- Parquet (requires the optional `pyarrow` package) is written one row group per chunk.
+- FITS: the BINTABLE header is built from an empty `astropy.table.Table`
+  describing the columns, with NAXIS2 set to the row count given up front; the
+  rows are then appended chunk by chunk as fixed-width big-endian records.
+  FITS strings have a fixed width, so the table holds the file name relative
+  to the processed directory instead of its URL, whose prefix is written in
+  the FITSURL header keyword.
+- CSV is compressed incrementally with zlib in gzip format.
+"""
+import csv
+import io
+import logging
+import zlib
+
+import numpy as np
+from astropy.io import fits
+from astropy.table import Column, Table
+
+from .votable import OBSERVATION_FIELDS, field_index, to_columns
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+# File extension and content type of each export format
+EXPORT_FORMATS = {
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'fits': ('.fits', 'application/fits'),
+    'csv': ('.csv.gz', 'application/gzip'),
+}
+
+# Width in bytes of the string columns of FITS tables (the max_length of the model fields)
+FITS_STRING_WIDTHS = {
+    'provisional_name': 100,
+    'official_name': 100,
+    'date_obs': 32,
+    'ra': 50,
+    'dec': 50,
+    'filename': 255,
+}
+FITS_NUMERIC_TYPES = {'int': 'i4', 'long': 'i8', 'double': 'f8'}
+FITS_UNITS = {'temperature': 'deg_C', 'exptime': 's', 'exposure': 's', 'ra_deg': 'deg', 'dec_deg': 'deg'}
+FITS_BLOCK = 2880
+
+
+class StreamSink(io.RawIOBase):
+    """Write-only file object buffering written bytes until they are drained."""
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        """Return the bytes written since the previous call."""
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def stream_export(chunks, export_format, fits_base_url='', total=None):
+    """
+    Return an iterator of the bytes of an observation table export.
+
+    :param chunks: Iterator of row chunks, as returned by `observation_rows`
+    :param export_format: 'parquet', 'fits' or 'csv' (gzipped)
+    :param fits_base_url: URL prefix of the FITS files (the URL-quoted relative path is appended)
+    :param total: Number of rows, required by the FITS format (the header precedes the data)
+    """
+    if export_format == 'parquet':
+        if pa is None:
+            raise ValueError("Parquet export requires pyarrow to be installed.")
+        return stream_parquet(chunks, fits_base_url)
+    if export_format == 'fits':
+        if total is None:
+            raise ValueError("FITS export requires the number of rows.")
+        return stream_fits(chunks, fits_base_url, total)
+    if export_format == 'csv':
+        return stream_csv(chunks, fits_base_url)
+    raise ValueError(f"Unsupported export format: {export_format}")
+
+
+def stream_csv(chunks, fits_base_url):
+    """Yield a gzipped CSV table, compressed chunk by chunk."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([field['name'] for field in OBSERVATION_FIELDS])
+    for chunk in chunks:
+        writer.writerows(zip(*to_columns(chunk, fits_base_url)))
+        data = compressor.compress(buffer.getvalue().encode('utf-8'))
+        buffer.seek(0)
+        buffer.truncate()
+        if data:
+            yield data
+    yield compressor.compress(buffer.getvalue().encode('utf-8')) + compressor.flush()
+
+
+def parquet_schema():
+    """Arrow schema of the observation table; date_obs is a UTC timestamp."""
+    types = {'int': pa.int32(), 'long': pa.int64(), 'double': pa.float64(), 'char': pa.string()}
+    return pa.schema([
+        pa.field(field['name'], pa.timestamp('us', tz='UTC') if field['name'] == 'date_obs' else
+                 types[field['datatype']], metadata={'description': field['description'], 'ucd': field['ucd']})
+        for field in OBSERVATION_FIELDS
+    ])
+
+
+def stream_parquet(chunks, fits_base_url):
+    """Yield a Parquet file, one row group per chunk."""
+    schema = parquet_schema()
+    date_index = field_index('date_obs')
+    sink = StreamSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    for chunk in chunks:
+        columns = to_columns(chunk, fits_base_url)
+        columns[date_index] = [row[date_index] for row in chunk]  # Kept as datetimes
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+        ))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def fits_columns():
+    """Name and FITS record dtype of each column of the FITS table."""
+    columns = []
+    for field in OBSERVATION_FIELDS:
+        name = 'filename' if field['name'] == 'fits_link' else field['name']
+        if field['datatype'] == 'char':
+            columns.append((name, f"S{FITS_STRING_WIDTHS[name]}"))
+        else:
+            columns.append((name, f">{FITS_NUMERIC_TYPES[field['datatype']]}"))
+    return columns
+
+
+def fits_table_header(total, fits_base_url):
+    """Header of the BINTABLE extension, built from an empty astropy Table of the columns."""
+    table = Table([
+        Column(name=name, dtype=dtype, length=0, unit=FITS_UNITS.get(name), description=field['description'])
+        for (name, dtype), field in zip(fits_columns(), OBSERVATION_FIELDS)
+    ])
+    header = fits.table_to_hdu(table).header
+    header['EXTNAME'] = 'OBSERVATIONS'
+    header['NAXIS2'] = total
+    for index, field in enumerate(OBSERVATION_FIELDS, start=1):
+        header.comments[f'TTYPE{index}'] = field['description'][:47]
+    # Long URLs are continued over several cards, so the keyword has no comment
+    header['FITSURL'] = fits_base_url
+    header.add_comment('FITSURL is the URL prefix of the filename column')
+    return header
+
+
+def stream_fits(chunks, fits_base_url, total):
+    """
+    Yield a FITS file with the table as a BINTABLE extension of exactly `total` rows.
+
+    Rows beyond `total` (added while exporting) are dropped, missing rows are written empty.
+    """
+    yield fits.PrimaryHDU().header.tostring().encode('ascii')
+    yield fits_table_header(total, fits_base_url).tostring().encode('ascii')
+
+    dtype = np.dtype(fits_columns())
+    link_index = field_index('fits_link')
+    written = 0
+    for chunk in chunks:
+        chunk = chunk[:total - written]
+        if not chunk:
+            break
+        columns = to_columns(chunk, '')
+        columns[link_index] = [row[link_index] for row in chunk]  # The relative filename
+        records = np.zeros(len(chunk), dtype=dtype)
+        for (name, column_dtype), column in zip(fits_columns(), columns):
+            if column_dtype.startswith('S'):
+                records[name] = [b'' if value is None else value.encode('utf-8') for value in column]
+            else:
+                null = np.nan if column_dtype.endswith('f8') else 0
+                records[name] = [null if value is None else value for value in column]
+        written += len(chunk)
+        yield records.tobytes()
+
+    if written < total:
+        logger.warning(f"FITS export: {total - written} rows were deleted while exporting, written empty")
+        yield bytes(dtype.itemsize * (total - written))
+    size = dtype.itemsize * total
+    yield bytes(-size % FITS_BLOCK)
@@ -0,0 +1,262 @@
+"""
+Lightweight FITS access helpers shared by the ingest command and the views.
+
+GAPC only needs a handful of primary header keywords per frame, so the header
+reader parses the 2880-byte header blocks directly and stops as soon as it has
+what it needs, without ever touching the pixel data.
+
+Pixel data is accessed through `hdu.section`, strip by strip, so previews and
+cutouts of large mosaics never materialize the whole array in memory.
+
+Gzip-compressed files (.fits.gz) are decompressed on the fly; for tile-compressed
+files (.fz) the image and its keywords live in the first extension, so their
+headers are read through astropy.
+"""
+import os
+import gzip
+import hashlib
+import logging
+
+import numpy as np
+from astropy.io import fits
+
+logger = logging.getLogger(__name__)
+
+# FITS header keywords stored by GAPC
+HEADER_KEYWORDS = ('DATE-OBS', 'NAXIS1', 'NAXIS2', 'TEMPERAT', 'EXPTIME', 'EXPOSURE', 'RA', 'DEC')
+
+BLOCK_SIZE = 2880
+CARD_SIZE = 80
+
+# Upper bound on the number of pixels read at once by `read_region`
+STRIP_PIXELS = 4 * 1024 * 1024
+
+BINNING_METHODS = ('mean', 'stride')
+
+
+class HeaderParseError(ValueError):
+    """Raised when a primary header cannot be parsed by the minimal card parser."""
+
+
+def is_tile_compressed(path):
+    """Whether a file is a tile-compressed (fpack) FITS file, from its extension."""
+    return path.lower().endswith('.fz')
+
+
+def open_fits(path):
+    """Open a FITS file for binary reading, decompressing gzip files on the fly."""
+    return gzip.open(path, 'rb') if path.lower().endswith('.gz') else open(path, 'rb')
+
+
+def read_header(path, keywords=HEADER_KEYWORDS):
+    """
+    Read selected keywords from the primary header of a FITS file.
+
+    Only the header blocks are read, one 2880-byte block at a time, and reading
+    stops once every requested keyword has been found (or at the END card).
+    Headers the minimal parser cannot handle fall back to `fits.getheader`.
+    For tile-compressed files the keywords are read from the compressed image HDU.
+
+    :param path: Path to the FITS file
+    :param keywords: Keywords to extract
+    :return: A dict with the keywords found in the header (missing ones are omitted)
+    """
+    if is_tile_compressed(path):
+        return read_compressed_header(path, keywords)
+    try:
+        with open_fits(path) as fileobj:
+            return parse_header_blocks(fileobj, keywords)
+    except HeaderParseError as e:
+        logger.debug(f"Falling back to astropy for the header of {path}: {e}")
+        header = fits.getheader(path)
+        return {key: header[key] for key in keywords if key in header}
+
+
+def read_compressed_header(path, keywords=HEADER_KEYWORDS):
+    """
+    Read selected keywords of a tile-compressed FITS file.
+
+    Keywords are taken from the header of the compressed image (HDU 1), which
+    gives the dimensions of the uncompressed image, then from the primary header.
+    """
+    values = {}
+    with fits.open(path) as hdul:
+        headers = [hdul[1].header, hdul[0].header] if len(hdul) > 1 else [hdul[0].header]
+        for header in headers:
+            values.update((key, header[key]) for key in keywords if key in header and key not in values)
+    return values
+
+
+def header_digest(path):
+    """
+    Return a SHA-256 hex digest of the header blocks and the size of a FITS file.
+
+    It identifies a frame by its content, whatever its name or location, while
+    reading only the header: identical headers and sizes are taken as the same frame.
+    Gzip files are hashed decompressed; for tile-compressed files the header of
+    the compressed image is included too.
+    """
+    digest = hashlib.sha256()
+    headers = 2 if is_tile_compressed(path) else 1
+    size = os.stat(path).st_size
+    with open_fits(path) as fileobj:
+        while headers:
+            block = fileobj.read(BLOCK_SIZE)
+            digest.update(block)
+            if len(block) < BLOCK_SIZE:
+                break
+            if any(block[offset:offset + 8] == b'END     ' for offset in range(0, BLOCK_SIZE, CARD_SIZE)):
+                headers -= 1
+    digest.update(f":{size}".encode('ascii'))
+    return digest.hexdigest()
+
+
+def parse_header_blocks(fileobj, keywords=HEADER_KEYWORDS):
+    """
+    Parse the primary header from a binary file object, block by block.
+
+    :param fileobj: Binary file object positioned at the start of the FITS file
+    :param keywords: Keywords to extract
+    :return: A dict with the keywords found in the header
+    """
+    wanted = set(keywords)
+    values = {}
+    first_block = True
+    while True:
+        block = fileobj.read(BLOCK_SIZE)
+        if len(block) < BLOCK_SIZE:
+            raise HeaderParseError("Truncated header (no END card)")
+        if first_block and not block.startswith(b'SIMPLE  ='):
+            raise HeaderParseError("Not a FITS primary header")
+        first_block = False
+
+        for offset in range(0, BLOCK_SIZE, CARD_SIZE):
+            card = block[offset:offset + CARD_SIZE].decode('ascii', errors='replace')
+            keyword = card[:8].rstrip()
+            if keyword == 'END':
+                return values
+            if keyword in wanted and keyword not in values and card[8:10] == '= ':
+                values[keyword] = parse_card_value(card[10:])
+                if len(values) == len(wanted):
+                    return values
+
+
+def parse_card_value(text):
+    """
+    Convert the value field of a header card to a Python value.
+
+    Handles quoted strings (with '' escapes), logicals, integers and floats
+    (including Fortran 'D' exponents); an empty value is returned as None.
+    """
+    text = text.strip()
+    if text.startswith("'"):
+        chars = []
+        i = 1
+        while i < len(text):
+            if text[i] == "'":
+                if text[i + 1:i + 2] == "'":
+                    chars.append("'")
+                    i += 2
+                    continue
+                return ''.join(chars).rstrip()
+            chars.append(text[i])
+            i += 1
+        raise HeaderParseError(f"Unterminated string value: {text!r}")
+
+    value = text.split('/', 1)[0].strip()
+    if not value:
+        return None
+    if value == 'T':
+        return True
+    if value == 'F':
+        return False
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value.replace('D', 'E'))
+    except ValueError:
+        raise HeaderParseError(f"Unsupported value: {value!r}")
+
+
+def find_image_hdu(hdul):
+    """Return the first HDU of an open HDU list holding an image, without loading its data."""
+    for hdu in hdul:
+        if hdu.is_image and hdu.header.get('NAXIS', 0) >= 2:
+            return hdu
+    raise ValueError("No image data found in FITS file.")
+
+
+def image_shape(hdu):
+    """Return the (height, width) of the image held by an HDU, from its header."""
+    return hdu.header['NAXIS2'], hdu.header['NAXIS1']
+
+
+def read_image_shape(path):
+    """Return the (height, width) of the first image of a FITS file."""
+    with fits.open(path) as hdul:
+        return image_shape(find_image_hdu(hdul))
+
+
+def block_bin(data, factor):
+    """Downsample a 2D array by averaging `factor` x `factor` blocks (edges are cropped)."""
+    if factor <= 1:
+        return data.astype(np.float32)
+    height, width = (data.shape[0] // factor) * factor, (data.shape[1] // factor) * factor
+    blocks = data[:height, :width].reshape(height // factor, factor, width // factor, factor)
+    return blocks.mean(axis=(1, 3), dtype=np.float32)
+
+
+def read_region(path, x0=0, y0=0, x1=None, y1=None, bin_factor=1, method='mean'):
+    """
+    Read a rectangular region of the first image of a FITS file, optionally binned.
+
+    The region is read through `hdu.section` in strips of at most STRIP_PIXELS
+    source pixels, so memory use is bounded by the strip and the (binned) output,
+    whatever the size of the image. For cubes the first plane is used.
+
+    :param path: Path to the FITS file
+    :param x0, y0, x1, y1: Region bounds in 0-based pixels (clipped to the image, x1/y1 exclusive)
+    :param bin_factor: Downsampling factor along both axes
+    :param method: 'mean' to average bin_factor x bin_factor blocks, 'stride' to keep one pixel per block
+    :return: A tuple (float32 array, (x0, y0, x1, y1)) with the bounds actually read
+    """
+    if method not in BINNING_METHODS:
+        raise ValueError(f"Unsupported binning method: {method}")
+    bin_factor = max(1, int(bin_factor))
+
+    # Memory-mapped by default; an explicit memmap=True would refuse scaled (BZERO, e.g. unsigned 16-bit) images
+    with fits.open(path) as hdul:
+        hdu = find_image_hdu(hdul)
+        height, width = image_shape(hdu)
+        x0, y0 = max(0, x0), max(0, y0)
+        x1 = width if x1 is None else min(width, x1)
+        y1 = height if y1 is None else min(height, y1)
+        # Crop to whole bins
+        x1 -= (x1 - x0) % bin_factor if x1 > x0 else 0
+        y1 -= (y1 - y0) % bin_factor if y1 > y0 else 0
+        if x1 <= x0 or y1 <= y0:
+            raise ValueError("Empty region.")
+
+        plane = (0,) * (hdu.header['NAXIS'] - 2)
+        out = np.empty(((y1 - y0) // bin_factor, (x1 - x0) // bin_factor), dtype=np.float32)
+        strip_rows = max(bin_factor, (STRIP_PIXELS // (x1 - x0)) // bin_factor * bin_factor)
+        for start in range(y0, y1, strip_rows):
+            stop = min(start + strip_rows, y1)
+            if method == 'stride':
+                strip = hdu.section[plane + (slice(start, stop, bin_factor), slice(x0, x1, bin_factor))]
+            else:
+                strip = block_bin(hdu.section[plane + (slice(start, stop), slice(x0, x1))], bin_factor)
+            out[(start - y0) // bin_factor:(stop - y0) // bin_factor] = strip
+        return out, (x0, y0, x1, y1)
+
+
+def read_cutout(path, x, y, size, bin_factor=1, method='mean'):
+    """
+    Read a square cutout of `size` pixels centred on (x, y), clipped to the image.
+
+    :return: A tuple (float32 array, (x0, y0, x1, y1)) as returned by `read_region`
+    """
+    half = size // 2
+    return read_region(path, x - half, y - half, x - half + size, y - half + size, bin_factor, method)
@@ -0,0 +1,180 @@
+"""
+Building blocks of the FITS ingest pipeline used by the `populate` command.
+
+Header parsing runs either in-process or in a pool of worker processes, so the
+functions that parse files must not touch the ORM: they return plain records
+that a single writer (the management command) commits to the database.
+"""
+import os
+import time
+import logging
+from collections import deque
+from fnmatch import fnmatch
+from contextlib import contextmanager
+
+from .fitsio import header_digest, read_header
+from .previews import ensure_preview
+
+logger = logging.getLogger(__name__)
+
+
+def get_provisional_name_from_filename(filename):
+    """Extracts the provisional name from the filename."""
+    return os.path.basename(filename).split('_')[0]
+
+
+def matches_patterns(relative, name, patterns):
+    """Whether a path relative to the scanned directory, or its entry name, matches one of the glob patterns."""
+    return any(fnmatch(relative, pattern) or fnmatch(name, pattern) for pattern in patterns)
+
+
+def scan_fits_files(directory, extensions, include=(), exclude=(), skip=()):
+    """
+    Yield the paths of the FITS files under `directory`, recursively and lazily.
+
+    Directories are listed one at a time with `os.scandir` (entries sorted by name)
+    and walked depth-first, so memory use depends on the largest directory and the
+    depth of the tree, not on the total number of files.
+
+    Glob patterns are matched against the path relative to `directory` and
+    against the entry name.
+
+    :param extensions: Lowercase filename suffixes of FITS files (e.g. '.fits', '.fits.gz')
+    :param include: Patterns of the files to yield (all FITS files if empty)
+    :param exclude: Patterns of the files and directories to skip
+    :param skip: Directories not to descend into (e.g. a processed directory inside `directory`)
+    """
+    skip = {os.path.realpath(path) for path in skip}
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.warning(f"Cannot list directory {current}: {e}")
+            continue
+
+        subdirectories = []
+        for entry in entries:
+            relative = os.path.relpath(entry.path, directory)
+            if matches_patterns(relative, entry.name, exclude):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if os.path.realpath(entry.path) not in skip:
+                    subdirectories.append(entry.path)
+            elif entry.name.lower().endswith(extensions) and (
+                    not include or matches_patterns(relative, entry.name, include)):
+                yield entry.path
+        pending.extend(reversed(subdirectories))
+
+
+def read_fits_record(fits_file_path, preview_options=None, root=None):
+    """
+    Read the header keywords GAPC stores from a FITS file (header blocks only).
+
+    Errors are reported in the returned record instead of being raised, so a bad
+    file does not tear down a worker pool.
+
+    :param fits_file_path: Path to the FITS file
+    :param preview_options: Keyword arguments of `ensure_preview` (cache_dir, max_size, fmt)
+                            to also render the preview of the frame, or None
+    :param root: Input directory; the filename of the record is the path relative to it
+    :return: A dict with the path, filename, provisional name, header values, file
+             identity (size, mtime_ns, content_hash), error message (or None) and
+             the time spent parsing
+    """
+    start = time.perf_counter()
+    record = {
+        'path': fits_file_path,
+        'filename': os.path.relpath(fits_file_path, root) if root else os.path.basename(fits_file_path),
+        'provisional_name': get_provisional_name_from_filename(fits_file_path),
+        'header': None,
+        'size': None,
+        'mtime_ns': None,
+        'content_hash': None,
+        'error': None,
+    }
+    try:
+        stat = os.stat(fits_file_path)
+        record['size'], record['mtime_ns'] = stat.st_size, stat.st_mtime_ns
+        record['content_hash'] = header_digest(fits_file_path)
+        record['header'] = read_header(fits_file_path)
+    except Exception as e:
+        record['error'] = str(e)
+    else:
+        if preview_options is not None:
+            try:
+                ensure_preview(fits_file_path, record['filename'], **preview_options)
+            except Exception as e:
+                logger.warning(f"Could not render preview of {fits_file_path}: {e}")
+    record['elapsed'] = time.perf_counter() - start
+    return record
+
+
+def imap_bounded(executor, fn, iterable, window):
+    """
+    Like `executor.map`, but keeps at most `window` tasks in flight.
+
+    `Executor.map` submits the whole iterable up front; this keeps memory bounded
+    when the input is large or lazily generated. Results are yielded in order.
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class IngestStats:
+    """Per-stage counters used to report ingest throughput."""
+
+    STAGES = ('parse', 'write', 'move')
+
+    def __init__(self):
+        self.counts = dict.fromkeys(self.STAGES, 0)
+        self.seconds = dict.fromkeys(self.STAGES, 0.0)
+        # Files not read because the manifest shows them already ingested
+        self.skipped = 0
+        self.started = time.perf_counter()
+
+    def add(self, stage, count, seconds):
+        self.counts[stage] += count
+        self.seconds[stage] += seconds
+
+    @contextmanager
+    def timed(self, stage, count=1):
+        """Time the enclosed block and account it to `stage`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, count, time.perf_counter() - start)
+
+    def report(self, workers=1):
+        """
+        Return the throughput report as a list of lines.
+
+        Stage rates are files per second of busy time in that stage. With several
+        workers the parse time is summed across processes, so its rate is per
+        worker; the wall-clock line gives the end-to-end rate.
+        """
+        lines = []
+        for stage in self.STAGES:
+            count, seconds = self.counts[stage], self.seconds[stage]
+            rate = count / seconds if seconds > 0 else 0.0
+            suffix = f" per worker, {workers} workers" if stage == 'parse' and workers > 1 else ""
+            lines.append(f"{stage:>5}: {count} files in {seconds:.2f}s ({rate:.1f} files/s{suffix})")
+        wall = time.perf_counter() - self.started
+        total = self.counts['parse']
+        lines.append(f" wall: {total} files in {wall:.2f}s ({total / wall if wall > 0 else 0.0:.1f} files/s)")
+        if self.skipped:
+            lines.append(f" skip: {self.skipped} files already ingested")
+        return lines
+
+    def log_report(self, workers=1):
+        logger.info("Ingest throughput:")
+        for line in self.report(workers):
+            logger.info(line)
@@ -0,0 +1,54 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from gapc.designations import apply_mappings, pending_confirmations
+from gapc.sbdb import SBDBClassifier
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Confirm the asteroids of the catalog whose provisional name has a designation mapping'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of asteroids updated per transaction (defaults to 500)'
+        )
+        parser.add_argument(
+            '--no-classify',
+            action='store_true',
+            help='Do not look up the classification of the newly confirmed asteroids'
+        )
+        parser.add_argument(
+            '--offline',
+            action='store_true',
+            help='Classify asteroids using only the local SBDB cache, without network calls'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report the asteroids that would be updated'
+        )
+
+    def handle(self, *args, **options):
+        pending = pending_confirmations()
+        if options['dry_run']:
+            for provisional_name, official_name in pending.values_list('provisional_name', 'mapped_name'):
+                logger.info(f"Would confirm {provisional_name} as {official_name}")
+            logger.info(f"{pending.count()} asteroids to confirm.")
+            return
+
+        classifier = None
+        if not options['no_classify']:
+            classifier = SBDBClassifier.from_settings(offline=options['offline'])
+        try:
+            updated = apply_mappings(classifier, batch_size=max(1, options['batch_size']))
+        finally:
+            if classifier is not None:
+                classifier.close()
+        logger.info(f"Confirmed {updated} asteroids.")
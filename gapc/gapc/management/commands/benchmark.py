@@ -0,0 +1,318 @@
+import os
+import json
+import time
+import shutil
+import logging
+import platform
+import resource
+import tempfile
+
+import django
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from gapc.models import Asteroid, IngestedFile, Observation
+from gapc.synthetic import SYNTHETIC_PREFIX, synthetic_name, synthetic_observation, write_frames
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Metrics compared between runs: lower is better, except for rates
+LOWER_IS_BETTER = ('_ms', '_seconds', 'queries', '_mib')
+HIGHER_IS_BETTER = ('_per_second',)
+
+
+class Rollback(Exception):
+    """Raised to roll back the synthetic observations once a scale is benchmarked."""
+
+
+def peak_rss_mib(who=resource.RUSAGE_SELF):
+    """Peak resident set size so far, in MiB."""
+    return resource.getrusage(who).ru_maxrss / 1024  # KiB on Linux
+
+
+def flatten(results, prefix=''):
+    """Map the dotted path of every number of nested result dicts to its value."""
+    values = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{path}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[path] = value
+    return values
+
+
+class Command(BaseCommand):
+    help = ('Benchmark ingest (`populate`) and the catalog, asteroid, VOTable and preview views on synthetic '
+            'data, and write the results as JSON, optionally compared with a previous run '
+            '(synthetic rows are removed or rolled back afterwards, frames are temporary)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            default='benchmark-results.json',
+            help='Results file (defaults to benchmark-results.json)'
+        )
+        parser.add_argument(
+            '--compare',
+            type=str,
+            default=None,
+            help='Results file of a previous run to compare with'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.25,
+            help='Relative change reported as a regression or an improvement (defaults to 0.25)'
+        )
+        parser.add_argument(
+            '--fail-on-regression',
+            action='store_true',
+            help='Exit with an error when --compare finds a regression'
+        )
+        parser.add_argument(
+            '--label',
+            type=str,
+            default='',
+            help='Free text stored with the results, e.g. a commit or a machine name'
+        )
+        parser.add_argument(
+            '--frames',
+            type=int,
+            default=200,
+            help='Number of frames ingested with `populate` (defaults to 200, 0 to skip)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of `populate` worker processes (defaults to 1)'
+        )
+        parser.add_argument(
+            '--image-size',
+            type=int,
+            default=2048,
+            help='Side of the synthetic frames in pixels (defaults to 2048)'
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='*',
+            default=[1000, 100000],
+            help='Numbers of observations the views are benchmarked with (defaults to 1000 100000)'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=20,
+            help='Requests timed per view and scale (defaults to 20)'
+        )
+
+    def handle(self, *args, **options):
+        if Asteroid.objects.filter(provisional_name__startswith=SYNTHETIC_PREFIX).exists():
+            raise CommandError("Synthetic observations already exist, remove them with "
+                               "`generate_synthetic --clear` first.")
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        results = {'meta': self.meta(options), 'ingest': None, 'views': {}}
+        with tempfile.TemporaryDirectory(prefix='gapc-benchmark-') as tmp:
+            if options['frames'] > 0:
+                results['ingest'] = self.benchmark_ingest(tmp, options['frames'], options['image_size'],
+                                                          max(1, options['workers']))
+            for rows in options['rows']:
+                results['views'][str(rows)] = self.benchmark_views(tmp, rows, max(1, options['requests']),
+                                                                   options['image_size'])
+        results['peak_rss_mib'] = peak_rss_mib()
+
+        os.makedirs(os.path.dirname(os.path.abspath(options['output'])), exist_ok=True)
+        with open(options['output'], 'w') as output:
+            json.dump(results, output, indent=2)
+        logger.info(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = self.compare(baseline, results, options['threshold'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{len(regressions)} metrics regressed by more than "
+                                   f"{options['threshold']:.0%} against {options['compare']}")
+
+    def meta(self, options):
+        """Description of the run and its environment."""
+        return {
+            'label': options['label'],
+            'started_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'database': connection.vendor,
+            'cache': settings.CACHES['default']['BACKEND'],
+            'fits_async_views': settings.FITS_ASYNC_VIEWS,
+            'frames': options['frames'],
+            'workers': options['workers'],
+            'image_size': options['image_size'],
+            'requests': options['requests'],
+        }
+
+    def benchmark_ingest(self, tmp, frames, image_size, workers):
+        """Time `populate` on `frames` synthetic frames, then delete what it imported."""
+        input_dir = os.path.join(tmp, 'ingest')
+        processed_dir = os.path.join(tmp, 'ingest-processed')
+        size = write_frames(input_dir, range(frames), max(1, frames // 100), image_size)
+        logger.info(f"Ingesting {frames} synthetic frames ({size / 1e6:.0f} MB) with {workers} workers...")
+
+        start = time.perf_counter()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                call_command('populate', input=input_dir, processed=processed_dir, workers=workers, offline=True,
+                             sbdb_cache=os.path.join(tmp, 'sbdb_cache.sqlite3'))
+            elapsed = time.perf_counter() - start
+        finally:
+            call_command('generate_synthetic', clear=True)
+            IngestedFile.objects.filter(path__startswith=tmp).delete()
+
+        result = {
+            'frames': frames,
+            'workers': workers,
+            'seconds': elapsed,
+            'files_per_second': frames / elapsed,
+            'mb_per_second': size / 1e6 / elapsed,
+            'queries': len(queries),
+            'peak_rss_mib': peak_rss_mib(),
+            'workers_peak_rss_mib': peak_rss_mib(resource.RUSAGE_CHILDREN),
+        }
+        logger.info(f"Ingest: {result['files_per_second']:.1f} files/s, {len(queries)} queries")
+        return result
+
+    def benchmark_views(self, tmp, rows, requests, image_size):
+        """Time the views on `rows` synthetic observations, created in a transaction rolled back afterwards."""
+        asteroids = max(1, rows // 100)
+        processed_dir = os.path.join(tmp, f'processed-{rows}')
+        preview_dir = os.path.join(tmp, f'previews-{rows}')
+        # Frames of the first observations, read by the VOTable export and the previews
+        frames = min(rows, requests + 1)
+        write_frames(processed_dir, range(frames), asteroids, image_size)
+        filenames = [synthetic_observation(index, asteroids)['filename'] for index in range(frames)]
+
+        result = {}
+        try:
+            with transaction.atomic():
+                start = time.perf_counter()
+                call_command('generate_synthetic', rows=rows, asteroids=asteroids, image_size=image_size)
+                result['insert_seconds'] = time.perf_counter() - start
+
+                obs_ids = list(Observation.objects.filter(filename__in=filenames).values_list('obs_id', flat=True))
+                names = [synthetic_name(index) for index in range(min(asteroids, requests + 1))]
+                catalog = reverse('catalog')
+                pages = -(-asteroids // settings.CATALOG_PAGE_SIZE)
+                views = {
+                    'catalog': [catalog],
+                    'catalog_cached': [catalog],
+                    'catalog_page': [f"{catalog}?page={max(1, pages // 2)}"],
+                    'catalog_search': [f"{catalog}?search={name[:-1]}" for name in names],
+                    'catalog_classification': [f"{catalog}?classification=Apollo"],
+                    'asteroid_detail': [reverse('asteroid_detail', args=[name]) for name in names],
+                    'export_votable': [reverse('export_votable', args=[obs_id]) for obs_id in obs_ids],
+                    'export_votable_asteroid': [reverse('export_votable_asteroid', args=[name]) for name in names],
+                    'preview_fits_image': [reverse('preview_fits_image', args=[name]) for name in filenames],
+                    'preview_image': [reverse('preview_image', args=[name]) for name in filenames],
+                }
+                with override_settings(
+                    FITS_PROCESSED_DIR=processed_dir,
+                    PREVIEW_DIR=preview_dir,
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                ):
+                    for name, urls in views.items():
+                        result[name] = self.measure(urls, requests, cached=name == 'catalog_cached',
+                                                    preview_dir=preview_dir)
+                        logger.info(f"{rows} rows, {name}: p50 {result[name]['p50_ms']:.1f} ms, "
+                                    f"p95 {result[name]['p95_ms']:.1f} ms, {result[name]['mean_queries']:.1f} queries")
+                raise Rollback()
+        except Rollback:
+            pass
+        finally:
+            shutil.rmtree(processed_dir, ignore_errors=True)
+        result['peak_rss_mib'] = peak_rss_mib()
+        return result
+
+    def measure(self, urls, requests, cached=False, preview_dir=None):
+        """
+        Time `requests` requests of `urls` (cycled through), reading whole responses, after one untimed request.
+
+        Unless `cached`, the cache and the rendered previews are cleared before every request.
+        """
+        client = Client()
+        latencies, queries, sizes, errors = [], [], [], 0
+        for count in range(requests + 1):
+            url = urls[count % len(urls)]
+            if not cached:
+                cache.clear()
+                shutil.rmtree(preview_dir, ignore_errors=True)
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = client.get(url)
+                size = sum(len(chunk) for chunk in response) if response.streaming else len(response.content)
+                elapsed = time.perf_counter() - start
+            if response.status_code != 200:
+                errors += 1
+                logger.error(f"{url}: status {response.status_code}")
+            if count:
+                latencies.append(elapsed)
+                queries.append(len(captured))
+                sizes.append(size)
+
+        p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+        return {
+            'requests': requests,
+            'errors': errors,
+            'p50_ms': p50,
+            'p95_ms': p95,
+            'p99_ms': p99,
+            'max_ms': max(latencies) * 1000,
+            'mean_queries': float(np.mean(queries)),
+            'max_queries': max(queries),
+            'mean_bytes': float(np.mean(sizes)),
+        }
+
+    def compare(self, baseline, results, threshold):
+        """
+        Log the metrics that changed by more than `threshold` (relative) since the baseline run.
+
+        :return: The paths of the regressed metrics
+        """
+        before, after = flatten(baseline), flatten(results)
+        regressions, improvements = [], []
+        for path in sorted(before.keys() & after.keys()):
+            if path.endswith(LOWER_IS_BETTER):
+                sign = 1
+            elif path.endswith(HIGHER_IS_BETTER):
+                sign = -1
+            else:
+                continue
+            old, new = before[path], after[path]
+            if old == new:
+                continue
+            change = (new - old) / old if old else float('inf')
+            line = f"{path}: {old:.4g} -> {new:.4g} ({change:+.0%})"
+            if sign * change > threshold:
+                regressions.append(path)
+                logger.warning(f"Regression {line}")
+            elif sign * change < -threshold:
+                improvements.append(path)
+                logger.info(f"Improvement {line}")
+        logger.info(f"Compared with {baseline['meta'].get('label') or baseline['meta']['started_at']}: "
+                    f"{len(regressions)} regressions, {len(improvements)} improvements "
+                    f"(threshold {threshold:.0%}, {len(before.keys() & after.keys())} metrics)")
+        return regressions
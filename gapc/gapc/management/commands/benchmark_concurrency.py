@@ -0,0 +1,121 @@
+import os
+import time
+import types
+import asyncio
+import logging
+import tempfile
+
+import numpy as np
+from astropy.io import fits
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+from django.urls import path
+
+from gapc import async_views, urls, views
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Route of the preview view under test, added to the project URLs
+PREVIEW_ROUTE = 'benchmark/preview/'
+
+
+def benchmark_urlconf(preview_view):
+    """URLconf of the project, plus the given preview image view."""
+    urlconf = types.ModuleType('gapc_benchmark_urls')
+    urlconf.urlpatterns = [path(f'{PREVIEW_ROUTE}<path:filename>/', preview_view)] + urls.urlpatterns
+    return urlconf
+
+
+class Command(BaseCommand):
+    help = ('Measure catalog page latency while FITS previews are rendered, with the synchronous '
+            'and the async preview views, through the ASGI request handler (files are temporary)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--previews',
+            type=int,
+            default=8,
+            help='Number of previews rendered concurrently (defaults to 8)'
+        )
+        parser.add_argument(
+            '--image-size',
+            type=int,
+            default=2048,
+            help='Side of the synthetic FITS images in pixels (defaults to 2048)'
+        )
+        parser.add_argument(
+            '--catalog-requests',
+            type=int,
+            default=20,
+            help='Minimum number of catalog page requests timed per run (defaults to 20)'
+        )
+
+    def handle(self, *args, **options):
+        previews = max(1, options['previews'])
+        with tempfile.TemporaryDirectory(prefix='gapc-benchmark-') as tmp:
+            frames_dir = os.path.join(tmp, 'frames')
+            names = self.write_frames(frames_dir, previews, options['image_size'])
+
+            runs = [('idle', None), ('sync views', views.preview_image), ('async views', async_views.preview_image)]
+            for label, preview_view in runs:
+                with override_settings(
+                    ROOT_URLCONF=benchmark_urlconf(preview_view or views.preview_image),
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                    FITS_PROCESSED_DIR=frames_dir,
+                    # A new cache directory per run, so that every preview is rendered
+                    PREVIEW_DIR=os.path.join(tmp, f'previews-{label.replace(" ", "-")}'),
+                ):
+                    latencies, wall = asyncio.run(
+                        self.measure(names if preview_view else [], max(1, options['catalog_requests']))
+                    )
+                self.report(label, latencies, wall, len(names))
+
+    def write_frames(self, directory, count, size):
+        """Write `count` synthetic float32 FITS images of `size` x `size` pixels."""
+        os.makedirs(directory)
+        rng = np.random.default_rng(0)
+        names = []
+        for index in range(count):
+            name = f"benchmark_{index:03d}.fits"
+            data = rng.normal(1000, 50, (size, size)).astype(np.float32)
+            fits.PrimaryHDU(data=data).writeto(os.path.join(directory, name))
+            names.append(name)
+        logger.info(f"Wrote {count} synthetic {size}x{size} frames")
+        return names
+
+    async def measure(self, names, catalog_requests):
+        """
+        Request the previews of `names` all at once, and time catalog page requests until they are served.
+
+        :return: The catalog page latencies, and the time taken to serve the previews (None without previews)
+        """
+        client = AsyncClient()
+
+        async def render_previews():
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(client.get(f'/{PREVIEW_ROUTE}{name}/') for name in names))
+            failed = [response.status_code for response in responses if response.status_code != 200]
+            if failed:
+                logger.error(f"{len(failed)} preview requests failed (status {failed[0]})")
+            return time.perf_counter() - start
+
+        rendering = asyncio.create_task(render_previews()) if names else None
+        await asyncio.sleep(0)  # Let the preview requests start first
+        latencies = []
+        while len(latencies) < catalog_requests or (rendering and not rendering.done()):
+            start = time.perf_counter()
+            response = await client.get('/')
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                logger.error(f"Catalog request failed (status {response.status_code})")
+            await asyncio.sleep(0.01)
+        return latencies, (await rendering if rendering else None)
+
+    def report(self, label, latencies, wall, previews):
+        """Log catalog latency percentiles in milliseconds, and the preview throughput."""
+        p50, p95 = np.percentile(np.array(latencies) * 1000, [50, 95])
+        rendered = f", {previews} previews served in {wall:.2f}s" if wall is not None else ''
+        logger.info(f"{label}: catalog p50 {p50:.1f} ms, p95 {p95:.1f} ms, max {max(latencies) * 1000:.1f} ms "
+                    f"over {len(latencies)} requests{rendered}")
@@ -0,0 +1,121 @@
+import logging
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from gapc.models import Asteroid, Observation
+from gapc.sky import angular_separation, sky_cell
+from gapc.views import cone_queryset, filter_cone
+from gapc.votable import observation_rows
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class Rollback(Exception):
+    """Raised to roll back the synthetic observations once the benchmark is done."""
+
+
+class Command(BaseCommand):
+    help = 'Benchmark cone search latency on synthetic observations (the database is left unchanged)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[100000, 1000000],
+            help='Numbers of synthetic observations to benchmark (defaults to 100000 1000000)'
+        )
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=200,
+            help='Number of cone searches per run (defaults to 200)'
+        )
+        parser.add_argument(
+            '--radius',
+            type=float,
+            default=0.5,
+            help='Search radius in degrees (defaults to 0.5)'
+        )
+        parser.add_argument(
+            '--baseline-queries',
+            type=int,
+            default=5,
+            help='Number of full-scan searches run for comparison (defaults to 5, 0 to skip)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed of the synthetic positions and queries'
+        )
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        for rows in options['rows']:
+            try:
+                with transaction.atomic():
+                    self.insert_observations(rows, rng)
+                    self.run(rows, options['queries'], options['baseline_queries'], options['radius'], rng)
+                    raise Rollback()
+            except Rollback:
+                pass
+
+    def insert_observations(self, rows, rng, batch_size=5000):
+        """Insert `rows` observations spread uniformly over the sky, all of a single synthetic asteroid."""
+        start = time.perf_counter()
+        asteroid = Asteroid.objects.create(provisional_name='BENCHMARK-CONE')
+        ras = rng.uniform(0, 360, rows)
+        decs = np.degrees(np.arcsin(rng.uniform(-1, 1, rows)))
+        first_date = timezone.make_aware(datetime(2000, 1, 1))
+        for offset in range(0, rows, batch_size):
+            Observation.objects.bulk_create([
+                Observation(
+                    asteroid=asteroid,
+                    date_obs=first_date + timedelta(seconds=index),
+                    naxis1=1024, naxis2=1024, exptime=60.0, exposure=60.0,
+                    ra_deg=float(ras[index]), dec_deg=float(decs[index]),
+                    sky_cell=sky_cell(float(ras[index]), float(decs[index])),
+                    filename=f"benchmark_{index}.fits",
+                )
+                for index in range(offset, min(offset + batch_size, rows))
+            ])
+        logger.info(f"Inserted {rows} synthetic observations in {time.perf_counter() - start:.1f} seconds")
+
+    def run(self, rows, queries, baseline_queries, radius, rng):
+        """Time indexed cone searches, and a few full scans for comparison."""
+        centers = list(zip(rng.uniform(0, 360, queries), np.degrees(np.arcsin(rng.uniform(-1, 1, queries)))))
+        ra, dec = centers[0]
+        plan = cone_queryset(Observation.objects.all(), ra, dec, radius).explain()
+        logger.info(f"Query plan: {' | '.join(plan.splitlines())}")
+
+        latencies, matches = [], []
+        for ra, dec in centers:
+            start = time.perf_counter()
+            found = sum(len(chunk) for chunk in filter_cone(
+                observation_rows(cone_queryset(Observation.objects.all(), ra, dec, radius)), ra, dec, radius))
+            latencies.append(time.perf_counter() - start)
+            matches.append(found)
+        self.report(f"{rows} rows, indexed", latencies, matches)
+
+        latencies = []
+        for ra, dec in centers[:baseline_queries]:
+            start = time.perf_counter()
+            positions = np.array(Observation.objects.values_list('ra_deg', 'dec_deg'), dtype=float)
+            int((angular_separation(ra, dec, positions[:, 0], positions[:, 1]) <= radius).sum())
+            latencies.append(time.perf_counter() - start)
+        if latencies:
+            self.report(f"{rows} rows, full scan", latencies)
+
+    def report(self, label, latencies, matches=None):
+        """Log latency percentiles in milliseconds."""
+        p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+        found = f", {np.mean(matches):.1f} matches/query" if matches else ''
+        logger.info(f"{label} ({connection.vendor}): {len(latencies)} queries, "
+                    f"p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms, max {max(latencies) * 1000:.2f} ms{found}")
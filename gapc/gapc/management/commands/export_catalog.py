@@ -0,0 +1,87 @@
+import os
+import time
+import logging
+import resource
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from gapc.export import EXPORT_FORMATS, stream_export
+from gapc.models import Observation
+from gapc.views import filter_observations
+from gapc.votable import observation_rows
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Export the observation table as a Parquet, FITS binary table or gzipped CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=list(EXPORT_FORMATS),
+            default='csv',
+            help='Output format: parquet (requires pyarrow), fits or csv (gzipped, the default)'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='Output file (defaults to observations.parquet, observations.fits or observations.csv.gz)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=settings.EXPORT_CHUNK_SIZE,
+            help='Rows read and encoded at a time (defaults to settings.EXPORT_CHUNK_SIZE)'
+        )
+        parser.add_argument(
+            '--base-url',
+            type=str,
+            default='',
+            help='URL prefix of the FITS file links (by default, links are paths relative to the processed directory)'
+        )
+        parser.add_argument('--asteroid', type=str, default=None, help='Only export the observations of this asteroid')
+        parser.add_argument('--date-from', type=str, default=None, help='Only export observations from this date')
+        parser.add_argument('--date-to', type=str, default=None, help='Only export observations up to this date')
+
+    def handle(self, *args, **options):
+        export_format = options['format']
+        extension, _ = EXPORT_FORMATS[export_format]
+        output_file = options['output'] or f"observations{extension}"
+        chunk_size = max(1, options['chunk_size'])
+        filters = {name: options[name] for name in ('asteroid', 'date_from', 'date_to') if options[name]}
+
+        try:
+            queryset = filter_observations(Observation.objects.all(), filters).order_by('obs_id')
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        start = time.perf_counter()
+        # One transaction, so that the rows read match the count written in FITS headers
+        with transaction.atomic():
+            total = queryset.count()
+            logger.info(f"Exporting {total} observations to {output_file} ({export_format})...")
+            try:
+                content = stream_export(observation_rows(queryset, chunk_size=chunk_size), export_format,
+                                        options['base_url'], total)
+            except ValueError as e:
+                raise CommandError(str(e))
+
+            # Written next to the output and renamed once complete
+            os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+            partial_file = f"{output_file}.part"
+            size = 0
+            with open(partial_file, 'wb') as output:
+                for data in content:
+                    output.write(data)
+                    size += len(data)
+            os.replace(partial_file, output_file)
+
+        elapsed = time.perf_counter() - start
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+        logger.info(f"Exported {total} observations ({size / 1e6:.1f} MB) in {elapsed:.2f}s "
+                    f"({total / elapsed if elapsed else 0:.0f} rows/s), peak RSS {peak_rss:.0f} MiB")
@@ -0,0 +1,146 @@
+import os
+import time
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from gapc.catalog_cache import bump_catalog_version
+from gapc.models import Asteroid, IngestedFile, Observation
+from gapc.search import index_asteroids
+from gapc.sky import sky_cell
+from gapc.synthetic import SYNTHETIC_PREFIX, synthetic_asteroid, synthetic_observation, write_frames
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ('Generate synthetic FITS frames to ingest with `populate`, and/or bulk-create synthetic '
+            f'observations in the database (asteroids named {SYNTHETIC_PREFIX}00000, {SYNTHETIC_PREFIX}00001, ...)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--frames',
+            type=int,
+            default=0,
+            help='Number of FITS frames to write, those of the first observations (defaults to 0)'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=settings.FITS_DIR,
+            help='Directory of the frames (defaults to settings.FITS_DIR, the input directory of `populate`; '
+                 'use settings.FITS_PROCESSED_DIR to write the files of rows created with --rows)'
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=0,
+            help='Number of observations to create in the database (defaults to 0)'
+        )
+        parser.add_argument(
+            '--asteroids',
+            type=int,
+            default=None,
+            help='Number of asteroids the observations are spread over (defaults to one per 100 observations)'
+        )
+        parser.add_argument(
+            '--image-size',
+            type=int,
+            default=2048,
+            help='Side of the frames in pixels (defaults to 2048)'
+        )
+        parser.add_argument(
+            '--bitpix',
+            type=int,
+            choices=[16, -32],
+            default=16,
+            help='16 for unsigned 16-bit frames (the default), -32 for float32 frames'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Observations inserted per query (defaults to 5000)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed of the simulated image'
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete the synthetic asteroids and their observations first'
+        )
+
+    def handle(self, *args, **options):
+        frames, rows = max(0, options['frames']), max(0, options['rows'])
+        asteroids = options['asteroids'] or max(1, max(frames, rows) // 100)
+
+        if options['clear']:
+            self.clear()
+        if rows:
+            if Asteroid.objects.filter(provisional_name__startswith=SYNTHETIC_PREFIX).exists():
+                raise CommandError("Synthetic observations already exist, use --clear to replace them.")
+            self.create_observations(rows, asteroids, options['image_size'], max(1, options['batch_size']))
+        if frames:
+            start = time.perf_counter()
+            written = write_frames(options['output'], range(frames), asteroids, options['image_size'],
+                                   options['bitpix'], options['seed'])
+            elapsed = time.perf_counter() - start
+            logger.info(f"Wrote {frames} frames ({written / 1e6:.0f} MB) to {options['output']} in {elapsed:.2f}s "
+                        f"({frames / elapsed if elapsed else 0:.0f} frames/s)")
+
+    def clear(self):
+        """Delete the synthetic asteroids, with their observations and search tokens (ingested files are kept)."""
+        start = time.perf_counter()
+        asteroids = Asteroid.objects.filter(provisional_name__startswith=SYNTHETIC_PREFIX)
+        with transaction.atomic():
+            # What `delete()` would do for the ingest manifest (on_delete=SET_NULL)
+            IngestedFile.objects.filter(observation__asteroid__in=asteroids).update(observation=None)
+            # One statement: `delete()` would fetch every observation to send its post_delete signal
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {connection.ops.quote_name(Observation._meta.db_table)} WHERE asteroid_id LIKE %s",
+                    [f"{SYNTHETIC_PREFIX}%"],
+                )
+                observations = cursor.rowcount
+            count, _ = asteroids.delete()
+            bump_catalog_version()
+        logger.info(f"Deleted {observations} synthetic observations and {count} related rows "
+                    f"in {time.perf_counter() - start:.2f}s")
+
+    def create_observations(self, rows, asteroids, image_size, batch_size):
+        """Bulk-create the first `rows` synthetic observations and their asteroids, in one transaction."""
+        start = time.perf_counter()
+        current_timezone = timezone.get_current_timezone()
+        with transaction.atomic():
+            created = Asteroid.objects.bulk_create(
+                [Asteroid(**synthetic_asteroid(index)) for index in range(min(asteroids, rows))],
+                batch_size=batch_size,
+            )
+            index_asteroids(created)
+            for offset in range(0, rows, batch_size):
+                batch = []
+                for index in range(offset, min(offset + batch_size, rows)):
+                    values = synthetic_observation(index, asteroids)
+                    batch.append(Observation(
+                        asteroid_id=values['provisional_name'],
+                        # Aware in the current time zone, as `populate` reads DATE-OBS
+                        date_obs=timezone.make_aware(values['date_obs'], current_timezone),
+                        naxis1=image_size, naxis2=image_size,
+                        exptime=values['exptime'], exposure=values['exptime'], temperat=values['temperat'],
+                        ra=values['ra'], dec=values['dec'], ra_deg=values['ra_deg'], dec_deg=values['dec_deg'],
+                        sky_cell=sky_cell(values['ra_deg'], values['dec_deg']),
+                        filename=values['filename'],
+                    ))
+                Observation.objects.bulk_create(batch)
+            bump_catalog_version()
+        elapsed = time.perf_counter() - start
+        logger.info(f"Created {rows} observations of {len(created)} asteroids in {elapsed:.2f}s "
+                    f"({rows / elapsed if elapsed else 0:.0f} rows/s)")
@@ -1,91 +1,193 @@
 import os
+import time
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 import csv
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from gapc.designations import upsert_mappings
+from gapc.models import DesignationMapping, MappingSource
+from gapc.neocp import extract_mappings, fetch_page, parse_mapping_line
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-DEFAULT_OUTPUT_FILE = os.path.join(settings.MEDIA_ROOT, 'mappings.csv')
+BENCHMARK_FIXTURE = os.path.join(settings.BASE_DIR, 'gapc', 'fixtures', 'neocp_sample.htm')
 
 class Command(BaseCommand):
-    help = 'Fetch provisional and official asteroid names and save them to a CSV file'
+    help = 'Fetch provisional and official asteroid names and store them in the designation mapping index'
 
     def add_arguments(self, parser):
         parser.add_argument(
             '--url',
             type=str,
-            default='https://www.birtwhistle.org.uk/NEOCPObjects2022.htm',
-            help='URL of the page to scrape asteroid names from'
+            action='append',
+            default=[],
+            help='URL of a page to scrape asteroid names from (repeatable)'
+        )
+        parser.add_argument(
+            '--years',
+            type=str,
+            default=None,
+            help='Years of the NEOCP pages to scrape, e.g. "2022-2024" or "2019,2022" '
+                 '(defaults to settings.MAPPINGS_FIRST_YEAR to the current year when no --url is given)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.MAPPINGS_CONCURRENCY,
+            help='Number of pages fetched concurrently (defaults to settings.MAPPINGS_CONCURRENCY)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Fetch and parse every page, even if it has not changed since the last run'
         )
         parser.add_argument(
             '--output',
             type=str,
-            default=DEFAULT_OUTPUT_FILE,
-            help='Path to the output CSV file (defaults to settings.MEDIA_ROOT/asteroid_mappings.csv)'
+            default=None,
+            help='Also export the whole (deduplicated) mapping index to this CSV file'
         )
         parser.add_argument(
             '--append',
             action='store_true',
-            help='Append new mappings to the existing CSV file instead of overwriting it'
+            help='Deprecated, has no effect: fetched mappings are always merged into the index'
+        )
+        parser.add_argument(
+            '--benchmark',
+            nargs='?',
+            const=BENCHMARK_FIXTURE,
+            default=None,
+            metavar='HTML_FILE',
+            help='Benchmark the page parser on a saved HTML page (defaults to the bundled sample), offline'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='With --benchmark, number of copies of the page parsed as one document (defaults to 50)'
         )
 
     def handle(self, *args, **options):
-        url = options['url']
+        if options['benchmark']:
+            self.benchmark(options['benchmark'], max(1, options['repeat']))
+            return
+
+        urls = self.get_urls(options['url'], options['years'])
         output_file = options['output']
-        append = options['append']
 
-        logger.info(f"Starting to fetch asteroid mappings from {url}...")
+        logger.info(f"Starting to fetch asteroid mappings from {len(urls)} pages...")
         try:
-            mappings = self.fetch_designation_mappings(url)
-            self.write_to_csv(mappings, output_file, append)
-            logger.info(f"Asteroid mappings saved successfully to {output_file}")
+            self.fetch_designation_mappings(urls, max(1, options['concurrency']), options['force'])
+            logger.info(f"{DesignationMapping.objects.count()} asteroid mappings in the index")
+            if output_file:
+                self.write_to_csv(output_file)
+                logger.info(f"Asteroid mappings exported successfully to {output_file}")
         except Exception as e:
-            logger.error(f"Error while creating CSV: {e}", exc_info=True)
+            logger.error(f"Error while storing mappings: {e}", exc_info=True)
+
+    def get_urls(self, urls, years):
+        """Return the URLs to scrape: the given ones, plus the NEOCP page of each requested year."""
+        if years is None and urls:
+            return list(dict.fromkeys(urls))
+        if years is None:
+            selected = range(settings.MAPPINGS_FIRST_YEAR, timezone.now().year + 1)
+        else:
+            selected = []
+            try:
+                for part in years.split(','):
+                    first, _, last = part.strip().partition('-')
+                    selected.extend(range(int(first), int(last or first) + 1))
+            except ValueError:
+                raise CommandError(f"Invalid --years value: {years}")
+        return list(dict.fromkeys(urls + [settings.MAPPINGS_URL_TEMPLATE.format(year=year) for year in selected]))
+
+    def fetch_designation_mappings(self, urls, concurrency=4, force=False):
+        """
+        Fetch and parse the provisional to official designation mappings of several pages, concurrently.
+
+        Pages are requested with the ETag / Last-Modified of their previous fetch (unless `force`),
+        so unchanged ones are skipped. The mappings of each page are upserted as soon as it is parsed.
+        """
+        sources = {source.url: source for source in MappingSource.objects.filter(url__in=urls)}
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=concurrency)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        with session, ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {}
+            for url in urls:
+                source = sources.get(url)
+                validators = (source.etag, source.last_modified) if source and not force else (None, None)
+                logger.info(f"Fetching data from URL: {url}")
+                futures[executor.submit(fetch_page, session, url, *validators, settings.MAPPINGS_TIMEOUT)] = url
+
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    page = future.result()
+                except requests.RequestException as e:
+                    logger.error(f"Failed to fetch data from {url}: {e}")
+                    continue
+                if page.mappings is None:
+                    logger.info(f"{url} has not changed since the last fetch ({page.elapsed:.2f}s)")
+                    continue
+
+                stored = upsert_mappings(page.mappings)
+                MappingSource.objects.update_or_create(url=url, defaults={
+                    'etag': page.etag,
+                    'last_modified': page.last_modified,
+                    'mapping_count': stored,
+                    'fetched_at': timezone.now(),
+                })
+                logger.info(f"Stored {stored} mappings from {url} ({page.elapsed:.2f}s)")
+
+    def benchmark(self, html_file, repeat):
+        """Time the streaming extractor, and BeautifulSoup when installed, on a saved page."""
+        with open(html_file, 'r', encoding='utf-8') as htmlfile:
+            page = htmlfile.read()
+        document = page * repeat
+        size_mb = len(document.encode('utf-8')) / 1e6
+        chunk_size = 64 * 1024
+
+        start = time.perf_counter()
+        mappings = extract_mappings(document[i:i + chunk_size] for i in range(0, len(document), chunk_size))
+        elapsed = time.perf_counter() - start
+        logger.info(f"Streaming extractor: {len(mappings)} mappings from {size_mb:.1f} MB in {elapsed:.3f}s "
+                    f"({size_mb / elapsed:.1f} MB/s)")
 
-    def fetch_designation_mappings(self, url):
-        """Fetch and parse the provisional to official designation mappings."""
-        logger.info(f"Fetching data from URL: {url}")
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-        except requests.RequestException as e:
-            logger.error(f"Failed to fetch data from {url}: {e}", exc_info=True)
-            raise
+            from bs4 import BeautifulSoup
+        except ImportError:
+            logger.info("BeautifulSoup is not installed, skipping the comparison.")
+            return
+        start = time.perf_counter()
+        content = BeautifulSoup(document, 'html.parser').get_text()
+        reference = [mapping for mapping in map(parse_mapping_line, content.splitlines()) if mapping]
+        elapsed = time.perf_counter() - start
+        logger.info(f"BeautifulSoup get_text: {len(reference)} mappings from {size_mb:.1f} MB in {elapsed:.3f}s "
+                    f"({size_mb / elapsed:.1f} MB/s)")
+        logger.info(f"Same mappings: {'yes' if reference == mappings else 'no'}")
 
-        logger.info("Parsing HTML content...")
-        soup = BeautifulSoup(response.text, 'html.parser')
-        content = soup.get_text()
-
-        mappings = []
-        for line in content.splitlines():
-            if '=' in line:
-                parts = line.split('=')
-                if len(parts) == 2:
-                    official_name = parts[0].strip()
-                    provisional_part = parts[1].strip().split()
-                    if provisional_part:
-                        provisional_name = provisional_part[0]
-                        mappings.append((provisional_name, official_name))
-                        logger.debug(f"Mapping added: {provisional_name} -> {official_name}")
-        logger.info(f"Total mappings found: {len(mappings)}")
-        return mappings
-
-    def write_to_csv(self, mappings, output_file, append):
-        """Write the mappings to a CSV file."""
-        mode = 'a' if append else 'w'
-        logger.info(f"{'Appending' if append else 'Writing'} mappings to {output_file}...")
+    def write_to_csv(self, output_file):
+        """Export the mapping index to a CSV file, one row per provisional name."""
+        logger.info(f"Writing mappings to {output_file}...")
         try:
-            os.makedirs(os.path.dirname(output_file), exist_ok=True)  # Ensure the directory exists
-            with open(output_file, mode, newline='', encoding='utf-8') as csvfile:
+            os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)  # Ensure the directory exists
+            with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
                 writer = csv.writer(csvfile)
-                if not append or os.stat(output_file).st_size == 0:  # Write header only if not appending or file is empty
-                    writer.writerow(['Provisional Name', 'Official Name'])
-                writer.writerows(mappings)
+                writer.writerow(['Provisional Name', 'Official Name'])
+                writer.writerows(
+                    DesignationMapping.objects.order_by('provisional_name')
+                    .values_list('provisional_name', 'official_name').iterator()
+                )
         except Exception as e:
             logger.error(f"Failed to write to {output_file}: {e}", exc_info=True)
-            raise
\ No newline at end of file
+            raise
@@ -1,26 +1,37 @@
 import os
-import csv
+import time
+import signal
 import logging
 import shutil
-import requests
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import partial
 
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from django.db import close_old_connections, connections, transaction
 from django.utils import timezone
 
-from gapc.models import Asteroid, Observation
-from astropy.io import fits
+from gapc.ingest import IngestStats, imap_bounded, read_fits_record, scan_fits_files
+from gapc.catalog_cache import bump_catalog_version
+from gapc.designations import lookup_official_names
+from gapc.models import Asteroid, IngestedFile, Observation
+from gapc.sbdb import SBDBClassifier
+from gapc.search import index_asteroids
+from gapc.sky import parse_dec, parse_ra, sky_cell
+from gapc.watch import make_watcher
 from tqdm import tqdm
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-SUPPORTED_FITS_EXTENSIONS = ('fits', 'fit')
-MAPPINGS_FILE = os.path.join(settings.MEDIA_ROOT, 'mappings.csv')
+SUPPORTED_FITS_EXTENSIONS = ('.fits', '.fit', '.fts', '.fits.gz', '.fit.gz', '.fz')
+# Number of scanned files checked against the ingest manifest per query
+MANIFEST_LOOKUP_BATCH = 500
 
 class Command(BaseCommand):
     help = 'Import FITS files from a specified directory into the database'
+    preview_options = None
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -32,158 +43,486 @@ class Command(BaseCommand):
         parser.add_argument(
             '--processed',
             type=str,
-            default=os.path.join(settings.FITS_DIR, 'processed'),
-            help='Path to move processed files (defaults to "processed")'
+            default=settings.FITS_PROCESSED_DIR,
+            help='Path to move processed files (defaults to settings.FITS_PROCESSED_DIR)'
+        )
+        parser.add_argument(
+            '--include',
+            action='append',
+            default=[],
+            help='Glob pattern of the files to import, matched against the path relative to the input '
+                 'directory or the file name (repeatable, defaults to all FITS files)'
+        )
+        parser.add_argument(
+            '--exclude',
+            action='append',
+            default=[],
+            help='Glob pattern of the files or directories to skip (repeatable)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of processes used to parse FITS headers (defaults to 1, in-process)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of files committed per database transaction (defaults to 500)'
+        )
+        parser.add_argument(
+            '--previews',
+            action='store_true',
+            help='Render the cached preview of each frame while parsing it'
+        )
+        parser.add_argument(
+            '--offline',
+            action='store_true',
+            help='Classify asteroids using only the local SBDB cache, without network calls'
+        )
+        parser.add_argument(
+            '--sbdb-cache',
+            type=str,
+            default=settings.SBDB_CACHE_FILE,
+            help='Path to the SBDB classification cache (defaults to settings.SBDB_CACHE_FILE)'
+        )
+        parser.add_argument(
+            '--sbdb-url',
+            type=str,
+            default=settings.SBDB_API_URL,
+            help='SBDB API endpoint (defaults to settings.SBDB_API_URL)'
+        )
+        parser.add_argument(
+            '--sbdb-concurrency',
+            type=int,
+            default=settings.SBDB_CONCURRENCY,
+            help='Maximum number of concurrent SBDB lookups (defaults to settings.SBDB_CONCURRENCY)'
+        )
+        parser.add_argument(
+            '--sbdb-rate',
+            type=float,
+            default=settings.SBDB_RATE_LIMIT,
+            help='Maximum SBDB requests per second, 0 for no limit (defaults to settings.SBDB_RATE_LIMIT)'
+        )
+        parser.add_argument(
+            '--watch',
+            action='store_true',
+            help='Keep running and ingest new FITS files as soon as they are fully written'
+        )
+        parser.add_argument(
+            '--poll',
+            action='store_true',
+            help='In watch mode, poll the input directory instead of using inotify'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=0.5,
+            help='In watch mode, seconds between two polls of the input directory (defaults to 0.5)'
+        )
+        parser.add_argument(
+            '--batch-window',
+            type=float,
+            default=0.25,
+            help='In watch mode, seconds to wait for more files before committing a batch (defaults to 0.25)'
         )
 
     def handle(self, *args, **options):
         fits_dir = options['input']
         processed_dir = options['processed']
+        workers = max(1, options['workers'])
+        batch_size = max(1, options['batch_size'])
+        self.preview_options = None
+        if options['previews']:
+            self.preview_options = {
+                'cache_dir': settings.PREVIEW_DIR,
+                'max_size': settings.PREVIEW_MAX_SIZE,
+                'fmt': settings.PREVIEW_FORMAT,
+            }
         os.makedirs(processed_dir, exist_ok=True)
 
-        if not os.path.isdir(fits_dir) or not os.listdir(fits_dir):
+        if not os.path.isdir(fits_dir) or (not options['watch'] and not os.listdir(fits_dir)):
             logger.info(f"Directory '{fits_dir}' does not exist or is empty!")
             return
 
-        # Load mappings from CSV
-        mappings = self.load_mappings(MAPPINGS_FILE)
+        self.classifier = SBDBClassifier.from_settings(
+            cache_file=options['sbdb_cache'], api_url=options['sbdb_url'], offline=options['offline'],
+            concurrency=options['sbdb_concurrency'], rate_limit=options['sbdb_rate'],
+        )
 
-        logger.info(f"Starting FITS file import from '{fits_dir}'")
-        self.import_fits_files(fits_dir, processed_dir, mappings)
+        try:
+            if options['watch']:
+                self.watch_directory(fits_dir, processed_dir, batch_size,
+                                     options['poll'], options['poll_interval'], options['batch_window'],
+                                     options['include'], options['exclude'])
+            else:
+                logger.info(f"Starting FITS file import from '{fits_dir}'")
+                self.import_fits_files(fits_dir, processed_dir, workers, batch_size,
+                                       options['include'], options['exclude'])
+        finally:
+            self.classifier.close()
+        logger.info(f"SBDB network calls: {self.classifier.network_calls}")
         logger.info("FITS file import completed!")
 
-    def load_mappings(self, mappings_file):
-        """Load provisional-to-official name mappings from a CSV file."""
-        mappings = {}
-        try:
-            with open(mappings_file, 'r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    mappings[row['Provisional Name']] = row['Official Name']
-            logger.info(f"Loaded {len(mappings)} asteroid mappings.")
-        except FileNotFoundError:
-            logger.warning(f"Mappings file '{mappings_file}' not found. All asteroids will be set as 'not_confirmed'.")
-        return mappings
-
-    def import_fits_files(self, directory, processed_dir, mappings):
-        files = [
-            filename for filename in os.listdir(directory)
-            if filename.lower().endswith(SUPPORTED_FITS_EXTENSIONS)
-        ]
-
-        for filename in tqdm(files, desc="Processing FITS files", unit="file"):
-            fits_file_path = os.path.join(directory, filename)
-            self.process_fits_file(fits_file_path, mappings)
-
-            shutil.move(fits_file_path, os.path.join(processed_dir, filename))
-
-    def process_fits_file(self, fits_file_path, mappings):
-        provisional_name = self.get_provisional_name_from_filename(fits_file_path)
-        asteroid = self.get_or_create_asteroid(provisional_name, mappings)
-
-        with fits.open(fits_file_path) as hdul:
-            header = hdul[0].header
-            date_obs = self.parse_date_obs(header.get('DATE-OBS'))
-            if date_obs is None:
-                logger.error(f"Invalid DATE-OBS value in {fits_file_path}")
-                return
+    def import_fits_files(self, directory, processed_dir, workers=1, batch_size=500,
+                          include=(), exclude=()):
+        """
+        Parse the FITS files under `directory`, commit them and move them to `processed_dir`.
 
-            self.create_or_update_observation(header, asteroid, date_obs, fits_file_path)
+        The directory tree is scanned lazily and files are streamed through the
+        pipeline, so memory use does not grow with the number of files. Processed
+        files keep their path relative to `directory`.
 
-    def get_provisional_name_from_filename(self, filename):
-        """Extracts the provisional name from the filename."""
-        return os.path.basename(filename).split('_')[0]
-    
-    def get_asteroid_classification(self, asteroid_name):
+        With more than one worker, headers are parsed in a process pool while this
+        process acts as the single database writer.
         """
-        Retrieve asteroid classification and NEO status from NASA SSD API.
+        files = scan_fits_files(directory, SUPPORTED_FITS_EXTENSIONS, include, exclude, skip=[processed_dir])
+        stats = IngestStats()
+        files = self.pending_files(directory, files, processed_dir, stats)
+        read_record = partial(read_fits_record, preview_options=self.preview_options, root=directory)
 
-        :param asteroid_name: Official name of the asteroid
-        :return: A tuple (classification, is_neo) or (None, None) if not found
+        if workers > 1:
+            # Worker processes must not inherit open database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                records = imap_bounded(executor, read_record, files, window=workers * 4)
+                self.write_records(records, processed_dir, stats, batch_size)
+        else:
+            records = map(read_record, files)
+            self.write_records(records, processed_dir, stats, batch_size)
+
+        stats.log_report(workers)
+
+    def watch_directory(self, directory, processed_dir, batch_size=500, poll=False,
+                        poll_interval=0.5, batch_window=0.25, include=(), exclude=()):
+        """
+        Ingest FITS files as they arrive under `directory`, until interrupted (Ctrl+C or SIGTERM).
+
+        The whole tree is watched, with the same include/exclude rules as a one-off
+        import. Files are reported by the watcher once fully written; those arriving
+        within `batch_window` seconds of each other are committed together. The
+        classification cache stays loaded between batches, and official names are
+        looked up per batch, so new designation mappings are picked up right away.
         """
-        API_BASE_URL = 'https://ssd-api.jpl.nasa.gov/sbdb.api'
+        watcher = make_watcher(directory, SUPPORTED_FITS_EXTENSIONS, poll_interval, poll,
+                               include, exclude, skip=[processed_dir])
+        read_record = partial(read_fits_record, preview_options=self.preview_options, root=directory)
+        # Stop on SIGTERM as on Ctrl+C, between two statements of the loop
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
 
+        logger.info(f"Watching '{directory}' for new FITS files ({type(watcher).__name__}), press Ctrl+C to stop")
         try:
-            params = {"sstr": asteroid_name}
-            response = requests.get(API_BASE_URL, params=params)
-            response.raise_for_status()
-            data = response.json()
-
-            # Extract classification and NEO status
-            classification = data.get("object", {}).get("orbit_class", {}).get("name")
-            is_neo = data.get("object", {}).get("neo", False)  # Default to False if the key is not found
-            return classification, is_neo
-        
-        except requests.RequestException as e:
-            logger.error(f"Error fetching classification for asteroid {asteroid_name}: {e}")
-            return None, None
-
-    def get_or_create_asteroid(self, provisional_name, mappings):
-        """
-        Retrieves or creates an asteroid instance, setting additional properties if available.
-
-        :param provisional_name: Provisional name of the asteroid
-        :param mappings: A dictionary mapping provisional names to official names
-        :return: Asteroid instance and a boolean indicating creation
-        """
-        # Fetch the official name from mappings
-        official_name = mappings.get(provisional_name)
-        status = 'confirmed' if official_name else 'not_confirmed'
-        classification = None
-        neo = False
-
-        # Fetch classification and NEO status if the official name exists
-        if official_name:
-            classification, neo = self.get_asteroid_classification(official_name)
-
-        # Retrieve or create the asteroid instance
-        asteroid, created = Asteroid.objects.get_or_create(
-            provisional_name=provisional_name,
-            defaults={
-                'official_name': official_name,
-                'status': status,
-                'target_class': classification or "undefined",  # Default to "undefined" if classification is None
-                'is_neo': neo
-            }
+            while True:
+                files = watcher.changes()
+                deadline = time.monotonic() + batch_window
+                while files and len(files) < batch_size and time.monotonic() < deadline:
+                    files += [path for path in watcher.changes(deadline - time.monotonic()) if path not in files]
+                if not files:
+                    continue
+
+                # The database connection may have been closed by the server while idle
+                close_old_connections()
+
+                stats = IngestStats()
+                files = self.check_manifest(directory, files, processed_dir, stats)
+                self.write_records(map(read_record, files), processed_dir, stats, batch_size,
+                                   progress=False)
+                if files:
+                    wall = time.perf_counter() - stats.started
+                    logger.info(f"Processed {len(files)} new files in {wall:.2f}s")
+        except KeyboardInterrupt:
+            logger.info("Stopped watching.")
+        finally:
+            watcher.close()
+
+    def pending_files(self, directory, files, processed_dir, stats):
+        """Yield the files that still have to be parsed, checking them against the manifest in chunks."""
+        chunk = []
+        for path in files:
+            chunk.append(path)
+            if len(chunk) >= MANIFEST_LOOKUP_BATCH:
+                yield from self.check_manifest(directory, chunk, processed_dir, stats)
+                chunk = []
+        if chunk:
+            yield from self.check_manifest(directory, chunk, processed_dir, stats)
+
+    def check_manifest(self, directory, files, processed_dir, stats):
+        """
+        Sort out the files already known to the ingest manifest.
+
+        Files whose size and modification time match their manifest entry are not
+        read again: processed files and duplicates are skipped, and files committed
+        by an interrupted run are only moved to `processed_dir`.
+
+        :return: The files that still have to be parsed
+        """
+        manifest = {
+            path: (size, mtime_ns, status)
+            for path, size, mtime_ns, status in IngestedFile.objects.filter(
+                path__in=files
+            ).values_list('path', 'size', 'mtime_ns', 'status')
+        }
+
+        pending, committed, skipped = [], [], 0
+        for path in files:
+            entry = manifest.get(path)
+            if entry is not None:
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    # Already moved, e.g. reported again by the watcher after its ingest
+                    skipped += 1
+                    continue
+                size, mtime_ns, status = entry
+                if (size, mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                    if status == 'committed':
+                        committed.append({'path': path, 'filename': os.path.relpath(path, directory)})
+                        continue
+                    if status in ('processed', 'duplicate'):
+                        skipped += 1
+                        continue
+            pending.append(path)
+
+        if skipped:
+            logger.debug(f"Skipping {skipped} files already ingested.")
+            stats.skipped += skipped
+        if committed:
+            logger.info(f"Resuming {len(committed)} files committed by an interrupted run.")
+            self.move_files(committed, processed_dir, stats)
+        return pending
+
+    def write_records(self, records, processed_dir, stats, batch_size=500, total=None, progress=True):
+        """Commit parsed records to the database in batches and move their files."""
+        batch = []
+        for record in tqdm(records, total=total, desc="Processing FITS files", unit="file", disable=not progress):
+            stats.add('parse', 1, record['elapsed'])
+            if record['error']:
+                logger.error(f"Error reading FITS file {record['path']}: {record['error']}")
+
+            batch.append(record)
+            if len(batch) >= batch_size:
+                self.flush_batch(batch, processed_dir, stats)
+                batch = []
+
+        if batch:
+            self.flush_batch(batch, processed_dir, stats)
+
+    def flush_batch(self, batch, processed_dir, stats):
+        """Commit a batch of records, then move their files once the transaction is done."""
+        with stats.timed('write', len(batch)):
+            self.write_batch(batch)
+
+        self.move_files([record for record in batch if record['status'] == 'committed'], processed_dir, stats)
+
+    def move_files(self, records, processed_dir, stats):
+        """
+        Move committed files to `processed_dir` and mark them as processed in the manifest.
+
+        Files keep their path relative to the input directory, subdirectories are created as needed.
+        """
+        with stats.timed('move', len(records)):
+            created = set()
+            for record in records:
+                destination = os.path.join(processed_dir, record['filename'])
+                parent = os.path.dirname(destination)
+                if parent not in created:
+                    os.makedirs(parent, exist_ok=True)
+                    created.add(parent)
+                shutil.move(record['path'], destination)
+            IngestedFile.objects.filter(path__in=[record['path'] for record in records]).update(
+                status='processed', updated_at=timezone.now()
+            )
+
+    def write_batch(self, records):
+        """
+        Store the observations described by records returned by `read_fits_record`.
+
+        Existing asteroids and (asteroid, date_obs) keys are fetched with one query each,
+        and only the missing rows are inserted with `bulk_create` in a single transaction,
+        together with the manifest entries of the files. Frames whose content hash is
+        already known under another path are recorded as duplicates and not stored again.
+        Sets the manifest status of each record in `record['status']`.
+
+        :param records: Parsed records of the batch
+        """
+        known_hashes = dict(
+            IngestedFile.objects.filter(
+                content_hash__in={record['content_hash'] for record in records if record['content_hash']},
+                status__in=('committed', 'processed'),
+            ).exclude(path__in=[record['path'] for record in records]).values_list('content_hash', 'path')
+        )
+
+        rows = []
+        for record in records:
+            record['status'], record['duplicate_of'] = 'failed', None
+            if record['error']:
+                continue
+            date_obs = self.parse_date_obs(record['header'].get('DATE-OBS'))
+            if date_obs is None:
+                logger.error(f"Invalid DATE-OBS value in {record['path']}")
+                continue
+            original = known_hashes.get(record['content_hash'])
+            if original is not None:
+                logger.warning(f"{record['path']} is a duplicate of {original}, skipping it")
+                record['status'], record['duplicate_of'] = 'duplicate', original
+                continue
+            if record['content_hash']:
+                known_hashes[record['content_hash']] = record['path']
+            record['status'] = 'committed'
+            rows.append((record, date_obs))
+
+        provisional_names = {record['provisional_name'] for record in records}
+        new_asteroids = self.build_new_asteroids(provisional_names)
+
+        with transaction.atomic():
+            Asteroid.objects.bulk_create(new_asteroids)
+            # bulk_create skips post_save, so the search index is updated explicitly
+            index_asteroids(new_asteroids)
+
+            observations_by_key = self.fetch_observation_ids(rows)
+            observations = []
+            for record, date_obs in rows:
+                key = (record['provisional_name'], date_obs)
+                if key in observations_by_key:
+                    continue
+                observations_by_key[key] = None
+                observations.append(
+                    self.build_observation(record['header'], record['provisional_name'], date_obs, record['filename'])
+                )
+            Observation.objects.bulk_create(observations, ignore_conflicts=True)
+            if observations:
+                # Primary keys are not set by bulk_create(ignore_conflicts=True)
+                observations_by_key = self.fetch_observation_ids(rows)
+
+            self.write_manifest(records, rows, observations_by_key)
+            if new_asteroids or observations:
+                # Invalidates the cached catalog pages when the batch commits
+                bump_catalog_version()
+
+        for asteroid in new_asteroids:
+            logger.info(f"Created asteroid: Provisional={asteroid.provisional_name}, Official={asteroid.official_name}, "
+                        f"Status={asteroid.status}, Class={asteroid.target_class}, Is NEO={asteroid.is_neo}")
+
+    def fetch_observation_ids(self, rows):
+        """Return the ids of the stored observations among (record, date_obs) rows, by (asteroid, date_obs)."""
+        return {
+            (asteroid_id, date_obs): obs_id
+            for obs_id, asteroid_id, date_obs in Observation.objects.filter(
+                asteroid_id__in={record['provisional_name'] for record, _ in rows},
+                date_obs__in={date_obs for _, date_obs in rows},
+            ).values_list('obs_id', 'asteroid_id', 'date_obs')
+        }
+
+    def write_manifest(self, records, rows, observations_by_key):
+        """
+        Create or update the manifest entries of a batch of records.
+
+        Duplicates are linked to the observation of the frame they duplicate.
+        """
+        observation_ids = {
+            record['path']: observations_by_key.get((record['provisional_name'], date_obs))
+            for record, date_obs in rows
+        }
+        originals = dict(
+            IngestedFile.objects.filter(
+                path__in={record['duplicate_of'] for record in records if record['duplicate_of']}
+            ).values_list('path', 'observation_id')
+        )
+        entries = []
+        for record in records:
+            observation_id = observation_ids.get(record['path'])
+            if record['duplicate_of']:
+                observation_id = originals.get(record['duplicate_of'], observation_ids.get(record['duplicate_of']))
+            entries.append(IngestedFile(
+                path=record['path'],
+                size=record['size'] or 0,
+                mtime_ns=record['mtime_ns'] or 0,
+                content_hash=record['content_hash'],
+                status=record['status'],
+                observation_id=observation_id,
+            ))
+        IngestedFile.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=['path'],
+            update_fields=['size', 'mtime_ns', 'content_hash', 'status', 'observation', 'updated_at'],
         )
 
-        # Log information about the asteroid
-        if created:
-            logger.info(f"Created asteroid: Provisional={provisional_name}, Official={official_name}, "
-                        f"Status={status}, Class={classification}, Is NEO={neo}")
+    def build_new_asteroids(self, provisional_names):
+        """
+        Build (unsaved) asteroid instances for the provisional names not yet in the database,
+        setting additional properties if available.
 
-        return asteroid, created
+        Official names are looked up in the designation mapping index, for these names only.
+        An official name already used by another asteroid, or mapped from several names
+        of the batch, is given to the first owner only; the others stay unconfirmed.
 
-    def create_or_update_observation(self, header, asteroid, date_obs, filename):
+        :param provisional_names: Provisional names seen in the current batch
+        :return: A list of Asteroid instances to be bulk-created
         """
-        Creates or updates an observation based on FITS header data.
+        existing = set(
+            Asteroid.objects.filter(provisional_name__in=provisional_names).values_list('provisional_name', flat=True)
+        )
+        new_names = sorted(set(provisional_names) - existing)
+        mappings = lookup_official_names(new_names)
+        owners = dict(
+            Asteroid.objects.filter(official_name__in=set(mappings.values()))
+            .values_list('official_name', 'provisional_name')
+        )
+        for provisional_name in new_names:
+            official_name = mappings.get(provisional_name)
+            if official_name is None:
+                continue
+            owner = owners.setdefault(official_name, provisional_name)
+            if owner != provisional_name:
+                logger.warning(f"Cannot confirm {provisional_name} as {official_name}: already used by {owner}")
+                del mappings[provisional_name]
+
+        # Fetch classification and NEO status of the confirmed ones, concurrently
+        classifications = self.classifier.classify_many(
+            [mappings[name] for name in new_names if mappings.get(name)]
+        )
+
+        asteroids = []
+        for provisional_name in new_names:
+            # Fetch the official name from mappings
+            official_name = mappings.get(provisional_name)
+            status = 'confirmed' if official_name else 'not_confirmed'
+            classification, neo = classifications.get(official_name, (None, False))
+
+            asteroids.append(Asteroid(
+                provisional_name=provisional_name,
+                official_name=official_name,
+                status=status,
+                target_class=classification or "undefined",  # Default to "undefined" if classification is None
+                is_neo=bool(neo),
+            ))
+        return asteroids
+
+    def build_observation(self, header, provisional_name, date_obs, filename):
         """
-        # Extract only the asteroid instance from the tuple
-        if isinstance(asteroid, tuple):  # Handle cases where asteroid is returned as a tuple
-            asteroid = asteroid[0]
+        Builds an (unsaved) observation based on FITS header data.
 
-        filename = os.path.basename(filename)
-        exptime = header.get('EXPTIME', 0.0)
-        exposure = header.get('EXPOSURE', 0.0)
-        temperat = self.get_rounded_temperature( header.get('TEMPERAT') )
+        :param filename: Path of the file relative to the processed directory
+        """
         ra = header.get('RA', '00:00:00.0')
         dec = header.get('DEC', '00:00:00.0')
-        naxis1 = header.get('NAXIS1', 0)
-        naxis2 = header.get('NAXIS2', 0)
-        
-        observation, created = Observation.objects.get_or_create(
-            asteroid=asteroid,
+        ra_deg, dec_deg = parse_ra(ra), parse_dec(dec)
+        return Observation(
+            asteroid_id=provisional_name,
             date_obs=date_obs,
-            defaults={
-                'exptime' : exptime,
-                'exposure': exposure,
-                'temperat': temperat,
-                'ra': ra,
-                'dec': dec,
-                'naxis1': naxis1,
-                'naxis2': naxis2,
-                'filename': filename
-            }
+            exptime=header.get('EXPTIME', 0.0),
+            exposure=header.get('EXPOSURE', 0.0),
+            temperat=self.get_rounded_temperature(header.get('TEMPERAT')),
+            ra=ra,
+            dec=dec,
+            ra_deg=ra_deg,
+            dec_deg=dec_deg,
+            sky_cell=sky_cell(ra_deg, dec_deg),
+            naxis1=header.get('NAXIS1', 0),
+            naxis2=header.get('NAXIS2', 0),
+            filename=filename,
         )
 
     def get_rounded_temperature(self, temp):
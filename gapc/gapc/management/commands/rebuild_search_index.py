@@ -0,0 +1,37 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from tqdm import tqdm
+
+from gapc.models import Asteroid
+from gapc.search import index_asteroids
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the designation search index of all asteroids'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of asteroids indexed per transaction (defaults to 1000)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        pairs = Asteroid.objects.order_by().values_list('provisional_name', 'official_name')
+        total = pairs.count()
+
+        logger.info(f"Indexing designations of {total} asteroids...")
+        batch = []
+        for pair in tqdm(pairs.iterator(chunk_size=batch_size), total=total, desc="Indexing asteroids", unit="asteroid"):
+            batch.append(pair)
+            if len(batch) >= batch_size:
+                index_asteroids(batch)
+                batch = []
+        index_asteroids(batch)
+        logger.info("Search index rebuilt!")
@@ -0,0 +1,229 @@
+"""
+In-process request metrics, exposed in the Prometheus text format on /metrics.
+
+`gapc.middleware.RequestMetricsMiddleware` gives every request a `RequestStats`
+held in a context variable, so it follows the request into the threads of
+`sync_to_async` and the coroutines of the async views:
+
+- SQL queries are counted and timed by a database execute wrapper installed on
+  every connection (`install_query_recorder`).
+- Code wrapped in `timed(phase)` (FITS reads and renders, template rendering)
+  adds its duration to that phase.
+
+When the request ends its stats are added to the process-wide `registry`,
+labelled by view name. Updates take a lock once per request, and nothing is
+recorded outside requests. Metrics are kept per process: with several worker
+processes each one is scraped separately.
+"""
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Distinct SQL statements kept per request for the slow request log
+MAX_STATEMENTS = 200
+
+_current = contextvars.ContextVar('gapc_request_stats', default=None)
+
+
+class RequestStats:
+    """Counters of the request being served."""
+
+    __slots__ = ('queries', 'query_seconds', 'phases', 'statements')
+
+    def __init__(self, capture_sql=False):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.phases = defaultdict(float)
+        # SQL statement -> [count, total seconds], with capture_sql only
+        self.statements = {} if capture_sql else None
+
+    def add_query(self, sql, seconds):
+        self.queries += 1
+        self.query_seconds += seconds
+        if self.statements is not None:
+            entry = self.statements.get(sql)
+            if entry is not None:
+                entry[0] += 1
+                entry[1] += seconds
+            elif len(self.statements) < MAX_STATEMENTS:
+                self.statements[sql] = [1, seconds]
+
+    def top_statements(self, count):
+        """The `count` SQL statements with the largest total time, as (sql, count, seconds) tuples."""
+        ranked = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)
+        return [(sql, calls, seconds) for sql, (calls, seconds) in ranked[:count]]
+
+
+def start_request(capture_sql=False):
+    """Start collecting the stats of a request in the current context; return them and the context token."""
+    stats = RequestStats(capture_sql)
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current_stats():
+    """Stats of the request being served, or None."""
+    return _current.get()
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the enclosed block to `phase` of the current request (e.g. 'fits', 'render')."""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.phases[phase] += time.perf_counter() - start
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper timing the queries of the current request."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, time.perf_counter() - start)
+
+
+def install_query_recorder(connection=None, **kwargs):
+    """
+    Install `record_query` on a database connection, or on the connections of this thread.
+
+    Also connected to `connection_created`, for the connections of other threads.
+    """
+    for wrapper in [connection] if connection is not None else connections.all(initialized_only=True):
+        if record_query not in wrapper.execute_wrappers:
+            wrapper.execute_wrappers.append(record_query)
+
+
+def enable_query_recording():
+    install_query_recorder()
+    connection_created.connect(install_query_recorder, dispatch_uid='gapc_metrics_query_recorder')
+
+
+class Histogram:
+    """Prometheus histogram: counts of observations up to each bucket bound, their sum and count."""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # The last one for values above every bound
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """(le, cumulative count) pairs, ending with '+Inf'."""
+        cumulative = 0
+        for bound, count in zip(self.bounds + ('+Inf',), self.counts):
+            cumulative += count
+            yield bound, cumulative
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names, values):
+    return ','.join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values))
+
+
+class MetricsRegistry:
+    """Request metrics of this process, by view."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = defaultdict(int)  # (view, method, status)
+            self.durations = {}  # (view, method) -> Histogram
+            self.queries = {}  # view -> Histogram of queries per request
+            self.query_seconds = defaultdict(float)  # view
+            self.response_bytes = defaultdict(int)  # view
+            self.phase_seconds = defaultdict(float)  # (view, phase)
+
+    def record(self, view, method, status, seconds, stats, size=None):
+        """Add a served request; `size` is None for streamed responses, counted by `add_bytes` once sent."""
+        with self._lock:
+            self.requests[view, method, status] += 1
+            histogram = self.durations.get((view, method))
+            if histogram is None:
+                histogram = self.durations[view, method] = Histogram(settings.METRICS_LATENCY_BUCKETS)
+            histogram.observe(seconds)
+            histogram = self.queries.get(view)
+            if histogram is None:
+                histogram = self.queries[view] = Histogram(settings.METRICS_QUERY_BUCKETS)
+            histogram.observe(stats.queries)
+            self.query_seconds[view] += stats.query_seconds
+            for phase, phase_seconds in stats.phases.items():
+                self.phase_seconds[view, phase] += phase_seconds
+            if size is not None:
+                self.response_bytes[view] += size
+
+    def add_bytes(self, view, size):
+        with self._lock:
+            self.response_bytes[view] += size
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def family(name, kind, description, samples, label_names):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(samples.items()):
+                lines.append(f"{name}{{{format_labels(label_names, labels)}}} {value}")
+
+        def histograms(name, description, values, label_names):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in sorted(values.items()):
+                labels = labels if isinstance(labels, tuple) else (labels,)
+                base = format_labels(label_names, labels)
+                for bound, count in histogram.samples():
+                    lines.append(f'{name}_bucket{{{base},le="{bound}"}} {count}')
+                lines.append(f"{name}_sum{{{base}}} {histogram.sum}")
+                lines.append(f"{name}_count{{{base}}} {histogram.count}")
+
+        with self._lock:
+            family('gapc_requests_total', 'counter', 'Requests served, by view, method and status code.',
+                   self.requests, ('view', 'method', 'status'))
+            histograms('gapc_request_duration_seconds', 'Time to build the response (streamed bodies excluded).',
+                       self.durations, ('view', 'method'))
+            histograms('gapc_db_queries_per_request', 'SQL queries issued per request.', self.queries, ('view',))
+            family('gapc_db_query_seconds_total', 'counter', 'Time spent in SQL queries.',
+                   {(view,): seconds for view, seconds in self.query_seconds.items()}, ('view',))
+            family('gapc_response_bytes_total', 'counter', 'Response body bytes sent.',
+                   {(view,): size for view, size in self.response_bytes.items()}, ('view',))
+            family('gapc_phase_seconds_total', 'counter', 'Time spent in FITS I/O and rendering (fits, render).',
+                   self.phase_seconds, ('view', 'phase'))
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
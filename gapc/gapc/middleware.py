@@ -0,0 +1,123 @@
+"""
+Request metrics middleware, see `gapc.metrics`.
+"""
+import time
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def view_name(request):
+    """Label of the view that served a request: its namespaced URL name, which has a bounded set of values."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or 'unnamed'
+
+
+def count_streamed_bytes(response, view):
+    """Count the bytes of a streamed body as they are sent, and add them to the registry at the end."""
+    content = response.streaming_content
+
+    if response.is_async:
+        async def counted():
+            size = 0
+            try:
+                async for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+            finally:
+                metrics.registry.add_bytes(view, size)
+    else:
+        def counted():
+            size = 0
+            try:
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+            finally:
+                metrics.registry.add_bytes(view, size)
+
+    response.streaming_content = counted()
+
+
+class RequestMetricsMiddleware:
+    """
+    Record the latency, SQL queries, FITS I/O and rendering time and response size of every request, by view.
+
+    With settings.METRICS_SLOW_REQUEST_SECONDS, requests slower than that are
+    logged with their most expensive SQL statements. Disabled by
+    settings.METRICS_ENABLED = False. Should be the first middleware, to time
+    the others too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.slow_seconds = settings.METRICS_SLOW_REQUEST_SECONDS
+        metrics.enable_query_recording()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        stats, token = metrics.start_request(capture_sql=self.slow_seconds is not None)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        self.record(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        stats, token = metrics.start_request(capture_sql=self.slow_seconds is not None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        self.record(request, response, stats, time.perf_counter() - start)
+        return response
+
+    def process_template_response(self, request, response):
+        """Time the rendering of template responses, which happens after the view returns."""
+        stats = metrics.current_stats()
+        if stats is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                stats.phases['render'] += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def record(self, request, response, stats, seconds):
+        view = view_name(request)
+        size = None
+        if not response.streaming:
+            size = len(response.content)
+        elif response.has_header('Content-Length'):
+            # File responses: known up front, and wrapping the body would disable sendfile
+            size = int(response['Content-Length'])
+        else:
+            count_streamed_bytes(response, view)
+        metrics.registry.record(view, request.method, response.status_code, seconds, stats, size)
+
+        if self.slow_seconds is not None and seconds >= self.slow_seconds:
+            phases = ''.join(f", {phase} {phase_seconds:.3f}s" for phase, phase_seconds in stats.phases.items())
+            lines = [f"Slow request {request.method} {request.get_full_path()} ({view}): {seconds:.3f}s, "
+                     f"status {response.status_code}, {stats.queries} queries in {stats.query_seconds:.3f}s{phases}"]
+            for sql, calls, sql_seconds in stats.top_statements(settings.METRICS_SLOW_REQUEST_QUERIES):
+                lines.append(f"  {calls}x {sql_seconds:.3f}s: {sql[:1000]}")
+            logger.warning('\n'.join(lines))
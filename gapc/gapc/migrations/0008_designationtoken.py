@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:43
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def designation_tokens(*designations):
+    # Frozen copy of gapc.search.designation_tokens
+    tokens = set()
+    for designation in designations:
+        normalized = re.sub(r'[^A-Z0-9]', '', (designation or '').upper())
+        tokens.update((normalized[position:], position) for position in range(len(normalized)))
+    return tokens
+
+
+def index_existing_asteroids(apps, schema_editor):
+    Asteroid = apps.get_model('gapc', 'Asteroid')
+    DesignationToken = apps.get_model('gapc', 'DesignationToken')
+    tokens = []
+    for provisional_name, official_name in Asteroid.objects.values_list('provisional_name', 'official_name').iterator():
+        tokens.extend(
+            DesignationToken(asteroid_id=provisional_name, token=token, position=position)
+            for token, position in designation_tokens(provisional_name, official_name)
+        )
+        if len(tokens) >= 5000:
+            DesignationToken.objects.bulk_create(tokens)
+            tokens = []
+    DesignationToken.objects.bulk_create(tokens)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gapc', '0007_remove_asteroid_target_discovery_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DesignationToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(help_text='Suffix of a normalized designation', max_length=100)),
+                ('position', models.PositiveSmallIntegerField(help_text='Offset of the suffix in the normalized designation')),
+                ('asteroid', models.ForeignKey(help_text='Asteroid the designation belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='gapc.asteroid')),
+            ],
+            options={
+                'verbose_name': 'Designation token',
+                'verbose_name_plural': 'Designation tokens',
+                'indexes': [models.Index(fields=['token', 'position', 'asteroid'], name='gapc_designation_search_idx')],
+            },
+        ),
+        migrations.RunPython(index_existing_asteroids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gapc', '0008_designationtoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='observation',
+            name='dec_deg',
+            field=models.FloatField(blank=True, help_text='Declination in degrees', null=True),
+        ),
+        migrations.AddField(
+            model_name='observation',
+            name='ra_deg',
+            field=models.FloatField(blank=True, help_text='Right Ascension in degrees', null=True),
+        ),
+        migrations.AddField(
+            model_name='observation',
+            name='sky_cell',
+            field=models.IntegerField(blank=True, help_text='Sky cell id of the position (see gapc.sky)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='observation',
+            index=models.Index(fields=['date_obs'], name='gapc_obs_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='observation',
+            index=models.Index(fields=['asteroid', '-date_obs'], name='gapc_obs_asteroid_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='observation',
+            index=models.Index(fields=['sky_cell', 'dec_deg'], name='gapc_obs_sky_cell_idx'),
+        ),
+    ]
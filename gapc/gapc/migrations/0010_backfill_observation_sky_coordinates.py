@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:50
+
+import math
+import re
+
+from django.db import migrations
+
+# Frozen copy of the gapc.sky cell grid and coordinate parsing
+SKY_CELL_SIZE = 1.0
+DEC_BANDS = int(math.ceil(180 / SKY_CELL_SIZE))
+MAX_RA_BINS = int(math.ceil(360 / SKY_CELL_SIZE))
+
+SEXAGESIMAL = re.compile(r'^\s*([+-])?\s*(\d+(?:\.\d*)?)[\s:hd]+(\d+(?:\.\d*)?)(?:[\s:m\']+(\d+(?:\.\d*)?))?[s"]?\s*$')
+
+
+def parse_angle(value, hours):
+    # Frozen copy of gapc.sky._parse_angle
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    match = SEXAGESIMAL.match(text)
+    if match:
+        sign, first, minutes, seconds = match.groups()
+        angle = float(first) + float(minutes) / 60 + float(seconds or 0) / 3600
+        angle = angle * 15 if hours else angle
+        return -angle if sign == '-' else angle
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_ra(value):
+    # Frozen copy of gapc.sky.parse_ra
+    degrees = parse_angle(value, hours=True)
+    if degrees is None or not 0 <= degrees <= 360:
+        return None
+    return degrees % 360
+
+
+def parse_dec(value):
+    # Frozen copy of gapc.sky.parse_dec
+    degrees = parse_angle(value, hours=False)
+    if degrees is None or not -90 <= degrees <= 90:
+        return None
+    return degrees
+
+
+def sky_cell(ra, dec):
+    # Frozen copy of gapc.sky.sky_cell
+    if ra is None or dec is None:
+        return None
+    band = min(DEC_BANDS - 1, int((dec + 90) // SKY_CELL_SIZE))
+    bins = max(1, int(MAX_RA_BINS * math.cos(math.radians(-90 + (band + 0.5) * SKY_CELL_SIZE))))
+    return band * MAX_RA_BINS + min(bins - 1, int((ra % 360) / 360 * bins))
+
+
+def backfill_sky_coordinates(apps, schema_editor):
+    Observation = apps.get_model('gapc', 'Observation')
+    batch = []
+    for observation in Observation.objects.only('obs_id', 'ra', 'dec').iterator(chunk_size=2000):
+        observation.ra_deg = parse_ra(observation.ra)
+        observation.dec_deg = parse_dec(observation.dec)
+        observation.sky_cell = sky_cell(observation.ra_deg, observation.dec_deg)
+        batch.append(observation)
+        if len(batch) >= 2000:
+            Observation.objects.bulk_update(batch, ['ra_deg', 'dec_deg', 'sky_cell'])
+            batch = []
+    Observation.objects.bulk_update(batch, ['ra_deg', 'dec_deg', 'sky_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gapc', '0009_observation_sky_coordinates'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_sky_coordinates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gapc', '0010_backfill_observation_sky_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestedFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(help_text='Path of the file when it was ingested', max_length=1024, unique=True)),
+                ('size', models.BigIntegerField(help_text='File size in bytes')),
+                ('mtime_ns', models.BigIntegerField(help_text='File modification time in nanoseconds')),
+                ('content_hash', models.CharField(blank=True, db_index=True, help_text='SHA-256 of the primary header blocks and file size', max_length=64, null=True)),
+                ('status', models.CharField(choices=[('committed', 'Committed'), ('processed', 'Processed'), ('duplicate', 'Duplicate'), ('failed', 'Failed')], help_text='Ingest status of the file', max_length=15)),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Date and time of the last status change')),
+                ('observation', models.ForeignKey(blank=True, help_text='Observation stored for the file', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ingested_files', to='gapc.observation')),
+            ],
+            options={
+                'verbose_name': 'Ingested file',
+                'verbose_name_plural': 'Ingested files',
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:54
+
+import csv
+import os
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def import_mappings_csv(apps, schema_editor):
+    # Carry over the mappings previously read by populate from MEDIA_ROOT/mappings.csv
+    DesignationMapping = apps.get_model('gapc', 'DesignationMapping')
+    path = os.path.join(settings.MEDIA_ROOT, 'mappings.csv')
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as csvfile:
+        latest = {row['Provisional Name']: row['Official Name'] for row in csv.DictReader(csvfile)}
+    DesignationMapping.objects.bulk_create(
+        [DesignationMapping(provisional_name=name, official_name=official) for name, official in latest.items() if name],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gapc', '0011_ingestedfile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DesignationMapping',
+            fields=[
+                ('provisional_name', models.CharField(help_text='Provisional name or designation of the asteroid', max_length=100, primary_key=True, serialize=False)),
+                ('official_name', models.CharField(help_text='Official name of the asteroid', max_length=100)),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Date and time the mapping was last fetched')),
+            ],
+            options={
+                'verbose_name': 'Designation mapping',
+                'verbose_name_plural': 'Designation mappings',
+            },
+        ),
+        migrations.RunPython(import_mappings_csv, migrations.RunPython.noop),
+    ]
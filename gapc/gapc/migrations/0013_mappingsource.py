@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gapc', '0012_designationmapping'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MappingSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(help_text='URL of the designation mappings page', max_length=500, unique=True)),
+                ('etag', models.CharField(blank=True, help_text='ETag of the last fetched version', max_length=255, null=True)),
+                ('last_modified', models.CharField(blank=True, help_text='Last-Modified of the last fetched version', max_length=100, null=True)),
+                ('mapping_count', models.IntegerField(default=0, help_text='Number of mappings found in the last fetched version')),
+                ('fetched_at', models.DateTimeField(blank=True, help_text='Date and time of the last successful fetch', null=True)),
+            ],
+            options={
+                'verbose_name': 'Mapping source',
+                'verbose_name_plural': 'Mapping sources',
+            },
+        ),
+    ]
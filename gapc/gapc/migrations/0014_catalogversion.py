@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_catalog_version(apps, schema_editor):
+    # The single row incremented by every catalog change
+    CatalogVersion = apps.get_model('gapc', 'CatalogVersion')
+    CatalogVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gapc', '0013_mappingsource'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0, help_text='Number of committed catalog changes')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Date and time of the last catalog change')),
+            ],
+            options={
+                'verbose_name': 'Catalog version',
+                'verbose_name_plural': 'Catalog version',
+            },
+        ),
+        migrations.RunPython(create_catalog_version, migrations.RunPython.noop),
+    ]
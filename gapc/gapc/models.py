@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 
 class Asteroid(models.Model):
@@ -46,6 +48,10 @@ class Observation(models.Model):
     # Right Ascension and Declination of the asteroid
     ra = models.CharField(max_length=50,null=True,blank=True,help_text='Right Ascension in HH:MM:SS.s format')
     dec = models.CharField(max_length=50,null=True,blank=True,help_text='Declination in DD:MM:SS.s format')
+    # Numeric coordinates parsed from `ra` and `dec` at ingest time, and the coarse sky cell they fall in
+    ra_deg = models.FloatField(null=True,blank=True,help_text='Right Ascension in degrees')
+    dec_deg = models.FloatField(null=True,blank=True,help_text='Declination in degrees')
+    sky_cell = models.IntegerField(null=True,blank=True,help_text='Sky cell id of the position (see gapc.sky)')
     # File name of the observation FITS file
     filename = models.CharField(max_length=255,blank=True,null=True,help_text="File name of the observation FITS file")
 
@@ -59,3 +65,107 @@ class Observation(models.Model):
         verbose_name = 'Observation'
         verbose_name_plural = 'Observations'
         unique_together = ('asteroid', 'date_obs')  # Enforces uniqueness constraint
+        indexes = [
+            models.Index(fields=['date_obs'], name='gapc_obs_date_idx'),
+            models.Index(fields=['asteroid', '-date_obs'], name='gapc_obs_asteroid_date_idx'),
+            models.Index(fields=['sky_cell', 'dec_deg'], name='gapc_obs_sky_cell_idx'),
+        ]
+
+class DesignationToken(models.Model):
+    # Asteroid whose designation the token belongs to
+    asteroid = models.ForeignKey(Asteroid,on_delete=models.CASCADE,related_name='search_tokens',
+                                 help_text='Asteroid the designation belongs to')
+    # Suffix of a normalized designation (uppercase, letters and digits only)
+    token = models.CharField(max_length=100,help_text='Suffix of a normalized designation')
+    # Offset of the suffix in the normalized designation (0 for the whole designation)
+    position = models.PositiveSmallIntegerField(help_text='Offset of the suffix in the normalized designation')
+
+    def __str__(self):
+        return f"{self.token} ({self.asteroid_id})"
+
+    class Meta:
+        verbose_name = 'Designation token'
+        verbose_name_plural = 'Designation tokens'
+        # Prefix range scans on the token, covering the ranking columns
+        indexes = [models.Index(fields=['token', 'position', 'asteroid'], name='gapc_designation_search_idx')]
+
+class DesignationMapping(models.Model):
+    # Provisional designation, as found in FITS file names (e.g., ZTF0NiK)
+    provisional_name = models.CharField(max_length=100,primary_key=True,
+                                        help_text="Provisional name or designation of the asteroid")
+    # Official designation assigned to the object (e.g., 2022 GO5)
+    official_name = models.CharField(max_length=100,help_text="Official name of the asteroid")
+    updated_at = models.DateTimeField(auto_now=True,help_text='Date and time the mapping was last fetched')
+
+    def __str__(self):
+        return f"{self.provisional_name} = {self.official_name}"
+
+    class Meta:
+        verbose_name = 'Designation mapping'
+        verbose_name_plural = 'Designation mappings'
+
+class MappingSource(models.Model):
+    # Page the designation mappings are scraped from
+    url = models.URLField(max_length=500,unique=True,help_text='URL of the designation mappings page')
+    # HTTP validators of the last fetched version, sent back to skip unchanged pages
+    etag = models.CharField(max_length=255,blank=True,null=True,help_text='ETag of the last fetched version')
+    last_modified = models.CharField(max_length=100,blank=True,null=True,
+                                     help_text='Last-Modified of the last fetched version')
+    mapping_count = models.IntegerField(default=0,help_text='Number of mappings found in the last fetched version')
+    fetched_at = models.DateTimeField(null=True,blank=True,help_text='Date and time of the last successful fetch')
+
+    def __str__(self):
+        return self.url
+
+    class Meta:
+        verbose_name = 'Mapping source'
+        verbose_name_plural = 'Mapping sources'
+
+class IngestedFile(models.Model):
+    STATUS_CHOICES = [("committed", "Committed"),("processed", "Processed"),("duplicate", "Duplicate"),("failed", "Failed")]
+    # Path of the file in the input directory when it was ingested
+    path = models.CharField(max_length=1024,unique=True,help_text='Path of the file when it was ingested')
+    # Identity of the file at ingest time: an unchanged file is skipped without being read
+    size = models.BigIntegerField(help_text='File size in bytes')
+    mtime_ns = models.BigIntegerField(help_text='File modification time in nanoseconds')
+    # Digest of the primary header and file size (see gapc.fitsio.header_digest), to detect duplicate frames
+    content_hash = models.CharField(max_length=64,blank=True,null=True,db_index=True,
+                                    help_text='SHA-256 of the primary header blocks and file size')
+    # committed: observation stored, file not moved yet; processed: file moved to the processed directory
+    status = models.CharField(max_length=15,choices=STATUS_CHOICES,help_text='Ingest status of the file')
+    # Observation stored for the file (for duplicates, the observation of the original frame)
+    observation = models.ForeignKey(Observation,on_delete=models.SET_NULL,null=True,blank=True,
+                                    related_name='ingested_files',help_text='Observation stored for the file')
+    updated_at = models.DateTimeField(auto_now=True,help_text='Date and time of the last status change')
+
+    def __str__(self):
+        return f"{self.path} ({self.status})"
+
+    class Meta:
+        verbose_name = 'Ingested file'
+        verbose_name_plural = 'Ingested files'
+
+class CatalogVersion(models.Model):
+    # Single row, incremented in the transaction of every catalog change: cached pages are keyed by it
+    version = models.PositiveBigIntegerField(default=0,help_text='Number of committed catalog changes')
+    updated_at = models.DateTimeField(default=timezone.now,help_text='Date and time of the last catalog change')
+
+    def __str__(self):
+        return f"Catalog version {self.version}"
+
+    class Meta:
+        verbose_name = 'Catalog version'
+        verbose_name_plural = 'Catalog version'
+
+@receiver(post_save, sender=Asteroid)
+def index_asteroid_designations(sender, instance, **kwargs):
+    """Keep the designation search index up to date when an asteroid is saved."""
+    from .search import index_asteroids
+    index_asteroids([instance])
+
+@receiver([post_save, post_delete], sender=Asteroid)
+@receiver([post_save, post_delete], sender=Observation)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Bump the catalog version when an asteroid or observation is changed individually (e.g. in the admin)."""
+    from .catalog_cache import bump_catalog_version
+    bump_catalog_version()
@@ -0,0 +1,133 @@
+"""
+Fetching and parsing of the NEOCP designation pages used by the `mappings` command.
+
+Each page lists lines such as '2022 GO5 = ZTF0NiK (...)', mapping an official
+designation to the provisional name it was observed under. Pages are streamed
+through a small `HTMLParser` that only keeps the text of the current line, so no
+DOM is built, and requests carry the validators (ETag / Last-Modified) of the
+previous fetch so unchanged pages are answered with a bodyless 304.
+
+This module does not use the ORM: pages are fetched from worker threads and the
+command stores the results.
+"""
+import time
+import logging
+from collections import namedtuple
+from html.parser import HTMLParser
+
+logger = logging.getLogger(__name__)
+
+# Tags starting a new line of text
+BREAK_TAGS = frozenset(('br', 'p', 'div', 'tr', 'li', 'pre', 'table', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'))
+# Tags whose content is not page text
+SKIPPED_TAGS = frozenset(('script', 'style'))
+
+CHUNK_SIZE = 64 * 1024
+
+# Result of a page fetch; `mappings` is None when the page has not changed (HTTP 304)
+PageResult = namedtuple('PageResult', ['url', 'status', 'mappings', 'etag', 'last_modified', 'elapsed'])
+
+
+def parse_mapping_line(line):
+    """
+    Parse a line of the form '<official name> = <provisional name> [...]'.
+
+    :return: A (provisional_name, official_name) tuple, or None if the line is not a mapping
+    """
+    parts = line.split('=')
+    if len(parts) != 2:
+        return None
+    official_name = parts[0].strip()
+    provisional_part = parts[1].strip().split()
+    if not official_name or not provisional_part:
+        return None
+    return provisional_part[0], official_name
+
+
+class MappingExtractor(HTMLParser):
+    """
+    Incremental HTML text extractor collecting designation mappings.
+
+    Feed it the page in chunks with `feed()`; complete mappings are available in
+    `mappings` as soon as their line ends, and only the current line is buffered.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.mappings = []
+        self._line = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in BREAK_TAGS:
+            self._end_line()
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in BREAK_TAGS:
+            self._end_line()
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        lines = data.split('\n')
+        self._line.append(lines[0])
+        for line in lines[1:]:
+            self._end_line()
+            self._line.append(line)
+
+    def close(self):
+        super().close()
+        self._end_line()
+
+    def _end_line(self):
+        if self._line:
+            mapping = parse_mapping_line(''.join(self._line))
+            if mapping is not None:
+                self.mappings.append(mapping)
+            self._line = []
+
+
+def extract_mappings(chunks):
+    """
+    Extract the designation mappings from an HTML page given as an iterable of text chunks.
+
+    :return: A list of (provisional_name, official_name) tuples, in page order
+    """
+    extractor = MappingExtractor()
+    for chunk in chunks:
+        extractor.feed(chunk)
+    extractor.close()
+    return extractor.mappings
+
+
+def fetch_page(session, url, etag=None, last_modified=None, timeout=30):
+    """
+    Fetch a NEOCP page and extract its mappings while it downloads.
+
+    :param session: `requests.Session` to use
+    :param etag: ETag of the previously fetched version, sent as If-None-Match
+    :param last_modified: Last-Modified of the previously fetched version, sent as If-Modified-Since
+    :return: A PageResult
+    """
+    start = time.perf_counter()
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        if response.status_code == 304:
+            return PageResult(url, 304, None, etag, last_modified, time.perf_counter() - start)
+        response.raise_for_status()
+        response.encoding = response.encoding or 'utf-8'
+        mappings = extract_mappings(response.iter_content(chunk_size=CHUNK_SIZE, decode_unicode=True))
+        return PageResult(
+            url, response.status_code, mappings,
+            response.headers.get('ETag'), response.headers.get('Last-Modified'),
+            time.perf_counter() - start,
+        )
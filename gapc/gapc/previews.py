@@ -0,0 +1,168 @@
+"""
+Preview (thumbnail) rendering for FITS frames.
+
+Previews are rendered once, with NumPy block-binning of memory-mapped data
+(see `fitsio.read_region`) and a zscale (or percentile) stretch, and written to
+a cache directory under MEDIA_ROOT. Cached files are named after a hash of the
+source file identity (name, size, modification time) and of the rendering
+parameters, so a preview never needs to be invalidated explicitly: a changed
+frame or new parameters give a new name.
+
+This module does not use the ORM, so previews can also be rendered from the
+ingest worker processes.
+"""
+import io
+import os
+import zlib
+import struct
+import hashlib
+import logging
+import tempfile
+
+import numpy as np
+from astropy.io import fits
+from astropy.visualization import PercentileInterval, ZScaleInterval
+
+from .fitsio import read_cutout, read_header, read_image_shape, read_region
+
+logger = logging.getLogger(__name__)
+
+# Bump when the rendering changes, so previously cached previews are not reused
+PREVIEW_VERSION = 1
+
+PREVIEW_FORMATS = ('png', 'webp')
+CONTENT_TYPES = {'png': 'image/png', 'webp': 'image/webp'}
+
+
+def preview_key(name, stat_result, max_size, fmt, stretch='zscale'):
+    """
+    Return the cache key of a preview.
+
+    :param name: Name of the frame relative to the processed directory
+    :param stat_result: `os.stat` result of the FITS file
+    :param max_size: Maximum width/height of the preview in pixels
+    :param fmt: Image format ('png' or 'webp')
+    :param stretch: Stretch method ('zscale' or 'percentile')
+    """
+    identity = (f"{PREVIEW_VERSION}:{name}:{stat_result.st_size}:{stat_result.st_mtime_ns}:"
+                f"{max_size}:{fmt}:{stretch}")
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+def preview_path(cache_dir, key, fmt):
+    """Path of a cached preview, sharded by the first two characters of its key."""
+    return os.path.join(cache_dir, key[:2], f"{key}.{fmt}")
+
+
+def ensure_preview(fits_path, name, cache_dir, max_size=1024, fmt='png', stretch='zscale'):
+    """
+    Return the cached preview of a FITS file, rendering it on first use.
+
+    :param fits_path: Path to the FITS file
+    :param name: Name of the frame relative to the processed directory
+    :param cache_dir: Directory holding the cached previews
+    :return: A tuple (path, key) of the cached preview file and its cache key
+    """
+    key = preview_key(name, os.stat(fits_path), max_size, fmt, stretch)
+    path = preview_path(cache_dir, key, fmt)
+    if not os.path.exists(path):
+        image = render_preview(fits_path, max_size, fmt, stretch)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write atomically, concurrent renders of the same preview are harmless
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(image)
+        os.replace(tmp_path, path)
+        logger.debug(f"Rendered preview of {name} to {path}")
+    return path, key
+
+
+def render_cutout(fits_path, name, x=None, y=None, size=256, bin_factor=1, method='mean', fmt='fits'):
+    """
+    Read a square cutout of a FITS image and encode it as a FITS file or a PNG image.
+
+    FITS cutouts keep the header keywords of the frame, with IRAF-style physical
+    coordinates (LTV/LTM) mapping cutout pixels back to the original frame.
+
+    :param name: Name of the frame relative to the processed directory, recorded in CUTSRC
+    :param x: Centre of the cutout in 0-based pixels, the image centre by default (same for `y`)
+    :param fmt: 'fits' or 'png'
+    :return: A tuple (content, content type)
+    """
+    if x is None or y is None:
+        height, width = read_image_shape(fits_path)
+        x = width // 2 if x is None else x
+        y = height // 2 if y is None else y
+    data, (x0, y0, x1, y1) = read_cutout(fits_path, x, y, size, bin_factor, method)
+    if fmt == 'png':
+        return encode_png(stretch_image(data)[::-1]), 'image/png'
+
+    header = fits.Header()
+    for key, value in read_header(fits_path).items():
+        if not key.startswith('NAXIS'):
+            header[key] = value
+    header['LTV1'] = (-x0 / bin_factor, 'Offset of the cutout along x')
+    header['LTV2'] = (-y0 / bin_factor, 'Offset of the cutout along y')
+    header['LTM1_1'] = (1 / bin_factor, 'Binning along x')
+    header['LTM2_2'] = (1 / bin_factor, 'Binning along y')
+    header['CUTSRC'] = (name, 'Source frame of the cutout')
+
+    buffer = io.BytesIO()
+    fits.PrimaryHDU(data=data, header=header).writeto(buffer)
+    return buffer.getvalue(), 'application/fits'
+
+
+def stretch_image(data, method='zscale'):
+    """Map a 2D array to 8-bit grey levels using a zscale or 99.5% percentile interval."""
+    finite = np.isfinite(data)
+    if not finite.any():
+        return np.zeros(data.shape, dtype=np.uint8)
+    interval = ZScaleInterval() if method == 'zscale' else PercentileInterval(99.5)
+    vmin, vmax = interval.get_limits(data[finite])
+    scale = 255.0 / (vmax - vmin) if vmax > vmin else 0.0
+    scaled = np.clip((np.where(finite, data, vmin) - vmin) * scale, 0, 255)
+    return scaled.astype(np.uint8)
+
+
+def render_preview(fits_path, max_size=1024, fmt='png', stretch='zscale'):
+    """
+    Render a FITS image as an 8-bit greyscale image no larger than `max_size` pixels.
+
+    :return: The encoded image as bytes
+    """
+    factor = max(1, -(-max(read_image_shape(fits_path)) // max_size))  # ceil division
+    binned, _ = read_region(fits_path, bin_factor=factor)
+    image = stretch_image(binned, stretch)
+    # FITS images have their origin at the bottom left
+    return encode_image(image[::-1], fmt)
+
+
+def encode_image(image, fmt='png'):
+    """Encode a 2D uint8 array as PNG, or as WebP when Pillow is installed."""
+    if fmt == 'png':
+        return encode_png(image)
+    if fmt == 'webp':
+        try:
+            from PIL import Image
+        except ImportError:
+            raise ValueError("WebP previews require Pillow to be installed.")
+        buffer = io.BytesIO()
+        Image.fromarray(image, mode='L').save(buffer, format='WEBP')
+        return buffer.getvalue()
+    raise ValueError(f"Unsupported preview format: {fmt}")
+
+
+def encode_png(image):
+    """Encode a 2D uint8 array as an 8-bit greyscale PNG."""
+    height, width = image.shape
+
+    def chunk(tag, payload):
+        return (struct.pack('>I', len(payload)) + tag + payload
+                + struct.pack('>I', zlib.crc32(tag + payload) & 0xffffffff))
+
+    # Each scanline is prefixed with filter type 0 (none)
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), np.ascontiguousarray(image)]).tobytes()
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 6))
+            + chunk(b'IEND', b''))
@@ -0,0 +1,280 @@
+"""
+Classification lookups against the JPL Small-Body Database (SBDB) API.
+
+Lookups go through a persistent SQLite cache keyed by official name, so
+re-ingesting an archive does not hit the network for designations already
+resolved. Designations unknown to SBDB are cached too (negative caching), with
+a shorter time to live. Cache misses of a whole ingest batch are deduplicated
+and looked up concurrently over a pooled HTTP session, with a per-host rate
+limit and retries with exponential backoff.
+"""
+import os
+import time
+import random
+import sqlite3
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_URL = 'https://ssd-api.jpl.nasa.gov/sbdb.api'
+
+# HTTP status codes worth retrying (rate limited or temporarily unavailable)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# A cached SBDB answer: `found` is False for designations SBDB does not know
+Classification = namedtuple('Classification', ['name', 'found', 'orbit_class', 'is_neo'])
+
+
+class ClassificationCache:
+    """
+    SQLite-backed cache of SBDB classifications with TTL-based expiry.
+
+    Entries are also kept in memory for the lifetime of the instance, so
+    repeated lookups within one ingest run do not touch the database file.
+    """
+
+    def __init__(self, path, ttl, negative_ttl):
+        """
+        :param path: Path to the SQLite cache file (created if missing)
+        :param ttl: Time to live in seconds of positive entries
+        :param negative_ttl: Time to live in seconds of "not found" entries
+        """
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._memory = {}
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS classifications ('
+            'name TEXT PRIMARY KEY, found INTEGER NOT NULL, orbit_class TEXT, '
+            'is_neo INTEGER, fetched_at REAL NOT NULL)'
+        )
+        self._connection.commit()
+
+    def get(self, name):
+        """Return the cached Classification for `name`, or None if missing or expired."""
+        entry = self._memory.get(name)
+        if entry is None:
+            row = self._connection.execute(
+                'SELECT found, orbit_class, is_neo, fetched_at FROM classifications WHERE name = ?', (name,)
+            ).fetchone()
+            if row is None:
+                return None
+            found, orbit_class, is_neo, fetched_at = row
+            entry = (Classification(name, bool(found), orbit_class, bool(is_neo)), fetched_at)
+            self._memory[name] = entry
+
+        classification, fetched_at = entry
+        ttl = self.ttl if classification.found else self.negative_ttl
+        if time.time() - fetched_at > ttl:
+            return None
+        return classification
+
+    def put(self, classification):
+        """Store a Classification returned by SBDB."""
+        fetched_at = time.time()
+        self._memory[classification.name] = (classification, fetched_at)
+        self._connection.execute(
+            'INSERT OR REPLACE INTO classifications (name, found, orbit_class, is_neo, fetched_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (classification.name, int(classification.found), classification.orbit_class,
+             int(bool(classification.is_neo)), fetched_at)
+        )
+        self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+
+def parse_sbdb_response(name, response):
+    """
+    Build a Classification from an SBDB API response.
+
+    SBDB answers unknown designations with a 404 or with a payload that has no
+    "object" entry (e.g. a list of ambiguous matches); both are "not found".
+    """
+    if response.status_code == 404:
+        return Classification(name, False, None, False)
+    response.raise_for_status()
+    data = response.json()
+    obj = data.get("object")
+    if not obj:
+        return Classification(name, False, None, False)
+    return Classification(
+        name, True, obj.get("orbit_class", {}).get("name"), bool(obj.get("neo", False))
+    )
+
+
+class RateLimiter:
+    """Thread-safe rate limiter spacing requests to the same host evenly."""
+
+    def __init__(self, rate):
+        """
+        :param rate: Maximum number of requests per second per host (0 disables the limit)
+        """
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, host):
+        """Block until a request to `host` is allowed."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot.get(host, now), now)
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SBDBClassifier:
+    """
+    Resolve official names to (classification, is_neo) through the cache and the SBDB API.
+
+    The cache is only accessed from the calling thread; worker threads only
+    perform HTTP requests.
+    """
+
+    def __init__(self, cache, api_url=None, timeout=None, offline=False,
+                 concurrency=None, rate_limit=None, retries=None, backoff=None):
+        """
+        :param cache: ClassificationCache instance
+        :param api_url: SBDB API endpoint (defaults to settings.SBDB_API_URL)
+        :param timeout: Request timeout in seconds (defaults to settings.SBDB_TIMEOUT)
+        :param offline: Only use the cache, never the network
+        :param concurrency: Maximum number of concurrent requests (defaults to settings.SBDB_CONCURRENCY)
+        :param rate_limit: Maximum requests per second to the API host (defaults to settings.SBDB_RATE_LIMIT)
+        :param retries: Retries of failed requests (defaults to settings.SBDB_RETRIES)
+        :param backoff: Base delay in seconds of the exponential backoff (defaults to settings.SBDB_BACKOFF)
+        """
+        self.cache = cache
+        self.api_url = api_url or getattr(settings, 'SBDB_API_URL', DEFAULT_API_URL)
+        self.timeout = timeout or getattr(settings, 'SBDB_TIMEOUT', 10)
+        self.offline = offline
+        self.concurrency = max(1, concurrency or getattr(settings, 'SBDB_CONCURRENCY', 8))
+        self.retries = retries if retries is not None else getattr(settings, 'SBDB_RETRIES', 3)
+        self.backoff = backoff if backoff is not None else getattr(settings, 'SBDB_BACKOFF', 0.5)
+        self.rate_limiter = RateLimiter(rate_limit if rate_limit is not None else getattr(settings, 'SBDB_RATE_LIMIT', 5))
+        self.network_calls = 0
+
+        self._host = urlparse(self.api_url).netloc
+        self._lock = threading.Lock()
+        self._session = None
+        self._executor = None
+
+    @classmethod
+    def from_settings(cls, cache_file=None, api_url=None, offline=False, concurrency=None, rate_limit=None):
+        """Build a classifier using the SBDB_* settings."""
+        cache = ClassificationCache(
+            cache_file or settings.SBDB_CACHE_FILE,
+            ttl=settings.SBDB_CACHE_TTL,
+            negative_ttl=settings.SBDB_NEGATIVE_CACHE_TTL,
+        )
+        return cls(cache, api_url=api_url, offline=offline, concurrency=concurrency, rate_limit=rate_limit)
+
+    @property
+    def session(self):
+        """HTTP session reusing up to `concurrency` connections to the API host."""
+        if self._session is None:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+            self._session.mount('http://', adapter)
+            self._session.mount('https://', adapter)
+        return self._session
+
+    def fetch(self, name):
+        """
+        Query the SBDB API for `name` and return a Classification.
+
+        Connection errors, timeouts and retryable status codes are retried with
+        exponential backoff (honouring Retry-After); the last error is raised as
+        requests.RequestException.
+        """
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.acquire(self._host)
+            with self._lock:
+                self.network_calls += 1
+            delay = self.backoff * (2 ** attempt) * (1 + random.random() / 10)
+            try:
+                response = self.session.get(self.api_url, params={"sstr": name}, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.retries:
+                    raise
+                logger.debug(f"Retrying SBDB lookup of {name} in {delay:.1f}s: {e}")
+                time.sleep(delay)
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.retries:
+                retry_after = response.headers.get('Retry-After', '')
+                delay = float(retry_after) if retry_after.isdigit() else delay
+                logger.debug(f"Retrying SBDB lookup of {name} in {delay:.1f}s: HTTP {response.status_code}")
+                time.sleep(delay)
+                continue
+            return parse_sbdb_response(name, response)
+
+    def classify(self, name):
+        """
+        Retrieve asteroid classification and NEO status.
+
+        :param name: Official name of the asteroid
+        :return: A tuple (classification, is_neo) or (None, None) if not found
+        """
+        return self.classify_many([name])[name]
+
+    def classify_many(self, names):
+        """
+        Classify several asteroids, looking up the distinct cache misses concurrently.
+
+        :param names: Official names of the asteroids (duplicates are looked up once)
+        :return: A dict mapping each name to a tuple (classification, is_neo),
+                 (None, None) if not found
+        """
+        results = {}
+        missing = []
+        for name in dict.fromkeys(names):
+            classification = self.cache.get(name)
+            if classification is not None:
+                results[name] = classification
+            elif self.offline:
+                logger.debug(f"No cached classification for asteroid {name} (offline mode)")
+            else:
+                missing.append(name)
+
+        if missing:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='sbdb')
+            futures = {name: self._executor.submit(self.fetch, name) for name in missing}
+            for name, future in futures.items():
+                try:
+                    classification = future.result()
+                except (requests.RequestException, ValueError) as e:
+                    # Transient errors are not cached, the lookup is retried on the next run
+                    logger.error(f"Error fetching classification for asteroid {name}: {e}")
+                    continue
+                self.cache.put(classification)
+                results[name] = classification
+
+        return {
+            name: (results[name].orbit_class, results[name].is_neo)
+            if name in results and results[name].found else (None, None)
+            for name in names
+        }
+
+    def close(self):
+        """Release the worker threads, the HTTP session and the cache."""
+        if self._executor is not None:
+            self._executor.shutdown()
+        if self._session is not None:
+            self._session.close()
+        self.cache.close()
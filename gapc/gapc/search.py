@@ -0,0 +1,157 @@
+"""
+Designation search backed by the DesignationToken index.
+
+Every suffix of the normalized provisional and official designations of an
+asteroid is stored as a token, so a substring search becomes an indexed prefix
+range scan (token >= q AND token < q + '~') on any database backend. Results are
+ranked: exact designation matches first, then designations starting with the
+query, then designations containing it.
+
+Queries shorter than settings.SEARCH_MIN_SUBSTRING_LENGTH match a large part of
+the token table, so they only look for designations starting with the query:
+the scan then follows the index order and stops once `limit` matches are found,
+instead of grouping every matching token before the LIMIT. Longer queries take
+the same path when designations starting with them fill the limit, since
+substring matches would rank after all of them.
+"""
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, IntegerField, Min, Q, Value, When
+
+from .models import Asteroid, DesignationToken
+
+# Sorts after every character of a normalized designation, used as exclusive range bound
+RANGE_END = '~'
+
+RANK_EXACT, RANK_PREFIX, RANK_SUBSTRING = 0, 1, 2
+
+
+def normalize_designation(text):
+    """Uppercase a designation and drop everything but letters and digits ('2022 go5' -> '2022GO5')."""
+    return re.sub(r'[^A-Z0-9]', '', (text or '').upper())
+
+
+def designation_tokens(*designations):
+    """Return the (token, position) pairs indexing the given designations."""
+    tokens = set()
+    for designation in designations:
+        normalized = normalize_designation(designation)
+        tokens.update((normalized[position:], position) for position in range(len(normalized)))
+    return tokens
+
+
+def index_asteroids(asteroids):
+    """
+    (Re)build the search tokens of the given asteroids.
+
+    :param asteroids: Asteroid instances, or (provisional_name, official_name) pairs
+    """
+    pairs = [
+        (asteroid.provisional_name, asteroid.official_name) if isinstance(asteroid, Asteroid) else tuple(asteroid)
+        for asteroid in asteroids
+    ]
+    if not pairs:
+        return
+    with transaction.atomic():
+        DesignationToken.objects.filter(asteroid_id__in=[name for name, _ in pairs]).delete()
+        DesignationToken.objects.bulk_create(
+            [
+                DesignationToken(asteroid_id=provisional_name, token=token, position=position)
+                for provisional_name, official_name in pairs
+                for token, position in designation_tokens(provisional_name, official_name)
+            ],
+            batch_size=5000,
+        )
+
+
+def rank_designations(query, limit=None):
+    """
+    Return the provisional names of the asteroids whose designations contain `query`, best match first.
+
+    :param query: Free-text designation (case, spaces and punctuation are ignored)
+    :param limit: Maximum number of results (settings.SEARCH_MAX_RESULTS at most for short queries)
+    :return: A list of (provisional_name, rank) tuples
+    """
+    normalized = normalize_designation(query)
+    if not normalized:
+        return []
+    if len(normalized) < settings.SEARCH_MIN_SUBSTRING_LENGTH:
+        return rank_prefixes(normalized, limit)
+    if limit is not None:
+        ranked = rank_prefixes(normalized, limit)
+        if len(ranked) == limit:
+            return ranked
+    matches = (
+        DesignationToken.objects
+        .filter(token__gte=normalized, token__lt=normalized + RANGE_END)
+        .annotate(rank=Case(
+            When(position=0, token=normalized, then=Value(RANK_EXACT)),
+            When(position=0, then=Value(RANK_PREFIX)),
+            default=Value(RANK_SUBSTRING),
+            output_field=IntegerField(),
+        ))
+        .values('asteroid_id')
+        .annotate(best_rank=Min('rank'))
+        .order_by('best_rank', 'asteroid_id')
+        .values_list('asteroid_id', 'best_rank')
+    )
+    if limit is not None:
+        matches = matches[:limit]
+    return list(matches)
+
+
+def rank_prefixes(normalized, limit=None):
+    """
+    `rank_designations` restricted to the designations starting with `normalized`.
+
+    Only whole-designation tokens (position 0) are read, in the order of the
+    search index, which puts the exact match first: the query stops after
+    `limit` asteroids without sorting the range. Results are in designation order.
+    """
+    if limit is None:
+        limit = settings.SEARCH_MAX_RESULTS
+    matches = (
+        DesignationToken.objects
+        .filter(token__gte=normalized, token__lt=normalized + RANGE_END, position=0)
+        .order_by('token', 'position', 'asteroid_id')
+        .values_list('asteroid_id', 'token')
+    )
+    ranked = {}
+    # An asteroid has up to two designations, both of which may match
+    for asteroid_id, token in matches[:2 * limit]:
+        rank = RANK_EXACT if token == normalized else RANK_PREFIX
+        if ranked.get(asteroid_id, rank + 1) > rank:
+            ranked[asteroid_id] = rank
+    return sorted(ranked.items(), key=lambda item: item[1])[:limit]
+
+
+def filter_catalog(queryset, query, classifications=()):
+    """
+    Restrict an asteroid queryset to a catalog search, ordered by rank.
+
+    Besides designations, the query matches the statuses and the classifications
+    (from `classifications`, the known distinct values) whose name contains it;
+    these are resolved in Python and filtered by equality instead of LIKE.
+    """
+    ranked = rank_designations(query, limit=settings.SEARCH_MAX_RESULTS)
+    lowered = query.lower()
+    statuses = [value for value, label in Asteroid.STATUS_CHOICES if lowered in value or lowered in label.lower()]
+    classes = [cls for cls in classifications if lowered in cls.lower()]
+
+    condition = Q(provisional_name__in=[name for name, _ in ranked])
+    if statuses:
+        condition |= Q(status__in=statuses)
+    if classes:
+        condition |= Q(target_class__in=classes)
+
+    by_rank = {}
+    for name, rank in ranked:
+        by_rank.setdefault(rank, []).append(name)
+    rank_order = Case(
+        *[When(provisional_name__in=names, then=Value(rank)) for rank, names in sorted(by_rank.items())],
+        default=Value(RANK_SUBSTRING + 1),
+        output_field=IntegerField(),
+    ) if ranked else Value(0)
+    return queryset.filter(condition).order_by(rank_order, *Asteroid._meta.ordering)
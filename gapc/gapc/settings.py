@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'gapc.middleware.RequestMetricsMiddleware',  # First, to time the whole chain
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -131,13 +132,100 @@ STATICFILES_DIRS = [
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory (per process) by default; use a shared backend, e.g.
+# 'django.core.cache.backends.filebased.FileBasedCache' with a directory as LOCATION,
+# to share rendered pages between processes. Entries are keyed by the catalog
+# version, so they never need to be cleared by hand (see gapc.catalog_cache).
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('GAPC_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('GAPC_CACHE_LOCATION', 'gapc'),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+CATALOG_CACHE_TIMEOUT = 24 * 3600  # seconds, cached fragments also expire when the catalog changes
+
+# Number of asteroids per catalog page
+CATALOG_PAGE_SIZE = 50
+
+# Maximum number of designation matches returned by a catalog search
+SEARCH_MAX_RESULTS = 1000
+# Shorter queries only match designations starting with them (substring matches would scan most of the index)
+SEARCH_MIN_SUBSTRING_LENGTH = 3
+
+# Rows per page of the JSON list endpoints (/api/asteroids/, /api/observations/), by default and at most
+API_PAGE_SIZE = 500
+API_MAX_PAGE_SIZE = 5000
+
 # Fits directory path (media/fits)
 FITS_DIR = os.path.join(settings.BASE_DIR, 'media', 'fits')
+# Processed (ingested) FITS files
+FITS_PROCESSED_DIR = os.path.join(FITS_DIR, 'processed')
 
 # Media settings
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# JPL Small-Body Database API, used to classify confirmed asteroids during ingest
+SBDB_API_URL = os.environ.get('SBDB_API_URL', 'https://ssd-api.jpl.nasa.gov/sbdb.api')
+SBDB_TIMEOUT = 10  # seconds
+SBDB_CONCURRENCY = 8  # concurrent lookups
+SBDB_RATE_LIMIT = 5  # requests per second to the API host
+SBDB_RETRIES = 3
+SBDB_BACKOFF = 0.5  # seconds, doubled on every retry
+SBDB_CACHE_FILE = os.path.join(MEDIA_ROOT, 'sbdb_cache.sqlite3')
+SBDB_CACHE_TTL = 30 * 24 * 3600  # seconds, for designations found in SBDB
+SBDB_NEGATIVE_CACHE_TTL = 24 * 3600  # seconds, for designations SBDB does not know
+
+# NEOCP pages listing provisional to official designations, one per year (see the `mappings` command)
+MAPPINGS_URL_TEMPLATE = 'https://www.birtwhistle.org.uk/NEOCPObjects{year}.htm'
+MAPPINGS_FIRST_YEAR = 2022
+MAPPINGS_CONCURRENCY = 4  # pages fetched concurrently
+MAPPINGS_TIMEOUT = 30  # seconds
+
+# Cached FITS previews (rendered at ingest time with `populate --previews`, or on first request)
+PREVIEW_DIR = os.path.join(MEDIA_ROOT, 'previews')
+PREVIEW_MAX_SIZE = 1024  # pixels
+PREVIEW_FORMAT = 'png'  # 'png', or 'webp' (requires Pillow)
+PREVIEW_CACHE_MAX_AGE = 7 * 24 * 3600  # seconds, Cache-Control max-age of served previews
+
+# Serve previews, cutouts and downloads with the async views of gapc.async_views, which keep
+# FITS work off the event loop when running under ASGI (e.g. `uvicorn gapc.asgi:application`).
+# The exports, bundles and cone searches stream under ASGI either way (gapc.views.streaming_response).
+FITS_ASYNC_VIEWS = True
+FITS_EXECUTOR = 'thread'  # 'thread' or 'process', runs preview renders and cutouts of the async views
+FITS_EXECUTOR_WORKERS = min(4, os.cpu_count() or 1)  # renders running at once, the others wait their turn
+FILE_STREAM_CHUNK_SIZE = 256 * 1024  # bytes read at a time by streamed file responses
+
+# FITS downloads: None to send files from Django (with Range support), or have the front-end
+# server send them: 'x-accel-redirect' (nginx, see below) or 'x-sendfile' (Apache mod_xsendfile, lighttpd)
+FITS_DOWNLOAD_OFFLOAD = os.environ.get('GAPC_FITS_DOWNLOAD_OFFLOAD') or None
+# Internal nginx location serving FITS_PROCESSED_DIR, for 'x-accel-redirect'
+FITS_DOWNLOAD_ACCEL_PREFIX = '/protected/fits/'
+
+# Limits of the /cutout/ endpoint
+CUTOUT_DEFAULT_SIZE = 256  # pixels
+CUTOUT_MAX_SIZE = 4096  # pixels
+CUTOUT_MAX_BIN = 64
+
+# Rows read per chunk by the bulk exports (`export_catalog`, /export/catalog/); one Parquet row group per chunk
+EXPORT_CHUNK_SIZE = 20000
+
+# Largest search radius accepted by the Simple Cone Search endpoint, in degrees
+CONE_SEARCH_MAX_SR = 10.0
+
+# Per-view request metrics (latency, SQL queries, FITS I/O and rendering time, bytes), served on /metrics
+# in the Prometheus text format; kept per process, see gapc.metrics
+METRICS_ENABLED = True
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+METRICS_QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)  # SQL queries per request
+# Log requests slower than this many seconds with their most expensive SQL statements (None to disable)
+METRICS_SLOW_REQUEST_SECONDS = (float(os.environ['GAPC_SLOW_REQUEST_SECONDS'])
+                                if os.environ.get('GAPC_SLOW_REQUEST_SECONDS') else None)
+METRICS_SLOW_REQUEST_QUERIES = 5  # statements logged per slow request
+
 """
 Deployment Considerations:
 
@@ -149,6 +237,17 @@ Deployment Considerations:
         location /media/ {
             alias /path/to/media/;
         }
+        # FITS downloads with FITS_DOWNLOAD_OFFLOAD = 'x-accel-redirect'
+        location /protected/fits/ {
+            internal;
+            alias /path/to/media/fits/processed/;
+        }
+        # Request metrics, for the Prometheus server only
+        location = /metrics {
+            allow 10.0.0.0/8;
+            deny all;
+            proxy_pass http://gapc;
+        }
         ...
     }
 """
@@ -0,0 +1,125 @@
+"""
+Sky coordinate helpers: parsing of header coordinates and a coarse sky-cell grid.
+
+Observations store their position as the RA/DEC strings found in the FITS
+header; these helpers convert them to degrees once, at ingest time, and assign
+each position to a cell of a fixed grid of declination bands split into RA bins
+of roughly equal area. The cell id is indexed, so positional queries only read
+the observations of the few cells that can match.
+"""
+import math
+import re
+
+import numpy as np
+
+# Height of the declination bands and (approximate) width of the RA bins, in degrees
+SKY_CELL_SIZE = 1.0
+
+DEC_BANDS = int(math.ceil(180 / SKY_CELL_SIZE))
+MAX_RA_BINS = int(math.ceil(360 / SKY_CELL_SIZE))
+
+_SEXAGESIMAL = re.compile(r'^\s*([+-])?\s*(\d+(?:\.\d*)?)[\s:hd]+(\d+(?:\.\d*)?)(?:[\s:m\']+(\d+(?:\.\d*)?))?[s"]?\s*$')
+
+
+def _parse_angle(value, hours):
+    """Convert a sexagesimal string or a number to degrees; returns None if it cannot be parsed."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    match = _SEXAGESIMAL.match(text)
+    if match:
+        sign, first, minutes, seconds = match.groups()
+        angle = float(first) + float(minutes) / 60 + float(seconds or 0) / 3600
+        angle = angle * 15 if hours else angle
+        return -angle if sign == '-' else angle
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_ra(value):
+    """
+    Convert a Right Ascension to degrees in [0, 360).
+
+    Accepts 'HH MM SS.s' / 'HH:MM:SS.s' strings (hours) or numbers (degrees).
+    Returns None for values that cannot be parsed or are out of range.
+    """
+    degrees = _parse_angle(value, hours=True)
+    if degrees is None or not 0 <= degrees <= 360:
+        return None
+    return degrees % 360
+
+
+def parse_dec(value):
+    """
+    Convert a Declination to degrees in [-90, 90].
+
+    Accepts '+DD MM SS.s' / '-DD:MM:SS.s' strings or numbers (degrees).
+    Returns None for values that cannot be parsed or are out of range.
+    """
+    degrees = _parse_angle(value, hours=False)
+    if degrees is None or not -90 <= degrees <= 90:
+        return None
+    return degrees
+
+
+def dec_band(dec):
+    """Index of the declination band containing `dec`."""
+    return min(DEC_BANDS - 1, int((dec + 90) // SKY_CELL_SIZE))
+
+
+def ra_bins(band):
+    """Number of RA bins of a declination band, shrinking with cos(dec) towards the poles."""
+    center = -90 + (band + 0.5) * SKY_CELL_SIZE
+    return max(1, int(MAX_RA_BINS * math.cos(math.radians(center))))
+
+
+def sky_cell(ra, dec):
+    """
+    Return the cell id of a position (degrees), or None if either coordinate is missing.
+    """
+    if ra is None or dec is None:
+        return None
+    band = dec_band(dec)
+    bins = ra_bins(band)
+    return band * MAX_RA_BINS + min(bins - 1, int((ra % 360) / 360 * bins))
+
+
+def cells_in_cone(ra, dec, radius):
+    """
+    Return the ids of the cells that may contain positions within `radius` of (ra, dec).
+
+    All arguments are in degrees. The RA extent is the widest one of the cone,
+    asin(sin(radius) / cos(dec)), so the result is a superset of the cells
+    actually overlapping the cone; cones reaching a pole cover whole bands.
+    """
+    radius = min(radius, 180.0)
+    first_band = dec_band(max(-90.0, dec - radius))
+    last_band = dec_band(min(90.0, dec + radius))
+
+    sin_radius, cos_dec = math.sin(math.radians(radius)), math.cos(math.radians(dec))
+    half_width = 180.0 if cos_dec <= sin_radius else math.degrees(math.asin(sin_radius / cos_dec))
+
+    cells = []
+    for band in range(first_band, last_band + 1):
+        bins = ra_bins(band)
+        first_bin = math.floor((ra - half_width) / 360 * bins)
+        last_bin = math.floor((ra + half_width) / 360 * bins)
+        if last_bin - first_bin + 1 >= bins:
+            cells.extend(band * MAX_RA_BINS + ra_bin for ra_bin in range(bins))
+        else:
+            cells.extend(band * MAX_RA_BINS + ra_bin % bins for ra_bin in range(first_bin, last_bin + 1))
+    return cells
+
+
+def angular_separation(ra1, dec1, ra2, dec2):
+    """Angular separation in degrees between positions in degrees (NumPy arrays or scalars)."""
+    ra1, dec1, ra2, dec2 = (np.radians(value) for value in (ra1, dec1, ra2, dec2))
+    # Haversine formula, accurate for small separations
+    sin_ddec = np.sin((dec2 - dec1) / 2)
+    sin_dra = np.sin((ra2 - ra1) / 2)
+    a = sin_ddec ** 2 + np.cos(dec1) * np.cos(dec2) * sin_dra ** 2
+    return np.degrees(2 * np.arcsin(np.sqrt(np.clip(a, 0, 1))))
@@ -0,0 +1,179 @@
+"""
+Synthetic observations and FITS frames, for benchmarks and load tests.
+
+Observations are numbered: the `index`-th one is the `index // asteroids`-th
+frame of asteroid `index % asteroids`, which moves along a straight track
+across the sky. The same index always gives the same values, so database rows
+(see the `generate_synthetic` command) and FITS frames generated separately
+describe the same observations, and `populate` parses frames into the rows
+`generate_synthetic --rows` would create.
+
+Frames share one simulated image (sky background, read noise and stars): it is
+encoded once, and every frame is written as its own header followed by the
+same data blocks, so generating thousands of frames is bound by disk speed.
+"""
+import io
+import math
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+from astropy.io import fits
+
+# Provisional names of synthetic asteroids start with this prefix
+SYNTHETIC_PREFIX = 'SYN'
+
+FIRST_DATE = datetime(2025, 1, 1, 20, 0, 0)
+CADENCE = 120  # seconds between two frames of an asteroid
+
+# (target_class, is_neo) of synthetic asteroids, cycled through; None for unclassified asteroids
+TARGET_CLASSES = [
+    ('Apollo', True), ('Amor', True), ('Aten', True), ('Main-belt Asteroid', False),
+    ('Outer Main-belt Asteroid', False), ('Jupiter Trojan', False), (None, False),
+]
+STATUSES = ('confirmed', 'pending', 'not_confirmed')
+
+
+def synthetic_name(asteroid_index):
+    """Provisional name of a synthetic asteroid."""
+    return f"{SYNTHETIC_PREFIX}{asteroid_index:05d}"
+
+
+def synthetic_asteroid(asteroid_index):
+    """
+    Field values of a synthetic asteroid.
+
+    :return: A dict with the provisional_name, official_name (confirmed asteroids only), status, target_class and is_neo
+    """
+    status = STATUSES[asteroid_index % len(STATUSES)]
+    target_class, is_neo = TARGET_CLASSES[asteroid_index % len(TARGET_CLASSES)]
+    return {
+        'provisional_name': synthetic_name(asteroid_index),
+        'official_name': f"2099 {SYNTHETIC_PREFIX}{asteroid_index}" if status == 'confirmed' else None,
+        'status': status,
+        'target_class': target_class,
+        'is_neo': is_neo,
+    }
+
+
+def format_ra(degrees):
+    """Right Ascension in degrees as 'HH MM SS.ss'."""
+    seconds = round(degrees / 15 * 3600, 2) % (24 * 3600)
+    return f"{int(seconds // 3600):02d} {int(seconds % 3600 // 60):02d} {seconds % 60:05.2f}"
+
+
+def format_dec(degrees):
+    """Declination in degrees as '+DD MM SS.s'."""
+    sign = '-' if degrees < 0 else '+'
+    seconds = round(abs(degrees) * 3600, 1)
+    return f"{sign}{int(seconds // 3600):02d} {int(seconds % 3600 // 60):02d} {seconds % 60:04.1f}"
+
+
+def synthetic_observation(index, asteroids):
+    """
+    Values of the `index`-th synthetic observation, with observations spread round-robin over `asteroids` asteroids.
+
+    :return: A dict with the provisional_name, filename, date_obs (naive datetime, as written in DATE-OBS),
+             ra and dec (sexagesimal strings), ra_deg, dec_deg, exptime and temperat
+    """
+    asteroid_index, sequence = index % asteroids, index // asteroids
+    # Tracks start spread over the sky (golden angle spiral) and move by 0.01 degree per frame
+    ra0 = asteroid_index * 137.50776 % 360
+    dec0 = math.degrees(math.asin(2 * (asteroid_index * 0.6180339887 % 1) - 1)) * 0.9
+    ra_deg = (ra0 + 0.01 * sequence) % 360
+    dec_deg = max(-89.9, min(89.9, dec0 + 0.004 * sequence))
+    ra, dec = format_ra(ra_deg), format_dec(dec_deg)
+    name = synthetic_name(asteroid_index)
+    return {
+        'provisional_name': name,
+        'filename': f"{name}_{sequence:06d}.fits",
+        'date_obs': FIRST_DATE + timedelta(seconds=sequence * CADENCE + asteroid_index % CADENCE),
+        'ra': ra,
+        'dec': dec,
+        'ra_deg': ra_deg,
+        'dec_deg': dec_deg,
+        'exptime': 60.0,
+        'temperat': round(-20 + 0.5 * math.sin(index), 3),
+    }
+
+
+def synthetic_image(size, bitpix=16, stars=300, seed=0):
+    """
+    Simulated CCD frame: sky background with read noise, and Gaussian stars.
+
+    :param bitpix: 16 for unsigned 16-bit counts (BZERO 32768, as most CCD cameras write), -32 for float32
+    """
+    rng = np.random.default_rng(seed)
+    image = rng.normal(1000, 12, (size, size)).astype(np.float32)
+    ys, xs = np.mgrid[-6:7, -6:7]
+    for _ in range(stars):
+        x, y = rng.integers(6, size - 6, 2)
+        sigma, flux = rng.uniform(1.2, 2.5), rng.lognormal(9, 1)
+        image[y - 6:y + 7, x - 6:x + 7] += flux * np.exp(-(xs ** 2 + ys ** 2) / (2 * sigma ** 2)) / (2 * np.pi * sigma ** 2)
+    if bitpix == 16:
+        return np.clip(image, 0, 65535).astype(np.uint16)
+    if bitpix == -32:
+        return image
+    raise ValueError(f"Unsupported BITPIX: {bitpix}")
+
+
+def synthetic_header(template, observation):
+    """Header of the frame of a synthetic observation, from the header of the encoded image."""
+    header = template.copy()
+    date_obs = observation['date_obs']
+    header['OBJECT'] = (observation['provisional_name'], 'Target designation')
+    header['DATE-OBS'] = (date_obs.isoformat(timespec='milliseconds'), 'Start of exposure')
+    header['JD'] = (2440587.5 + (date_obs - datetime(1970, 1, 1)).total_seconds() / 86400, 'Julian date of start of exposure')
+    header['EXPTIME'] = (observation['exptime'], '[s] Exposure time')
+    header['EXPOSURE'] = (observation['exptime'], '[s] Exposure time')
+    header['TEMPERAT'] = (observation['temperat'], '[C] CCD temperature')
+    header['SET-TEMP'] = (-20.0, '[C] CCD temperature setpoint')
+    header['RA'] = (observation['ra'], 'Right Ascension of the target (hours)')
+    header['DEC'] = (observation['dec'], 'Declination of the target (degrees)')
+    header['OBJCTRA'] = observation['ra']
+    header['OBJCTDEC'] = observation['dec']
+    header['EQUINOX'] = 2000.0
+    header['IMAGETYP'] = 'Light Frame'
+    header['FILTER'] = 'L'
+    header['XBINNING'] = 1
+    header['YBINNING'] = 1
+    header['XPIXSZ'] = (9.0, '[um] Pixel width')
+    header['YPIXSZ'] = (9.0, '[um] Pixel height')
+    header['GAIN'] = (1.4, '[e-/ADU] Detector gain')
+    header['RDNOISE'] = (12.0, '[e-] Read noise')
+    header['FOCALLEN'] = (1200.0, '[mm] Focal length')
+    header['APTDIA'] = (400.0, '[mm] Aperture diameter')
+    header['SITELAT'] = ('+45 00 00', 'Site latitude')
+    header['SITELONG'] = ('+11 00 00', 'Site longitude')
+    header['TELESCOP'] = 'GAPC synthetic telescope'
+    header['INSTRUME'] = 'GAPC synthetic camera'
+    header['SWCREATE'] = 'gapc.synthetic'
+    return header
+
+
+def encode_image(image):
+    """Return the primary header and the encoded (padded) data blocks of a FITS file holding `image`."""
+    buffer = io.BytesIO()
+    hdu = fits.PrimaryHDU(image)
+    hdu.writeto(buffer)
+    header = hdu.header
+    return header, buffer.getvalue()[len(header.tostring()):]
+
+
+def write_frames(directory, indices, asteroids, image_size=2048, bitpix=16, seed=0):
+    """
+    Write the FITS frames of the synthetic observations of `indices`, named after their filename.
+
+    :return: The number of bytes written
+    """
+    template, data = encode_image(synthetic_image(image_size, bitpix, seed=seed))
+    os.makedirs(directory, exist_ok=True)
+    written = 0
+    for index in indices:
+        observation = synthetic_observation(index, asteroids)
+        header = synthetic_header(template, observation).tostring().encode('ascii')
+        with open(os.path.join(directory, observation['filename']), 'wb') as output:
+            output.write(header)
+            output.write(data)
+        written += len(header) + len(data)
+    return written
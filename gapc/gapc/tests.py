@@ -0,0 +1,1601 @@
+import io
+import os
+import gzip
+import types
+import shutil
+import tarfile
+import zipfile
+import unittest
+import importlib.util
+import time
+import struct
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stderr
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+import numpy as np
+import requests
+from astropy.io import fits
+from astropy.io.votable import parse_single_table
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from . import async_views, designations, fitsio, metrics, previews
+from .views import RangeNotSatisfiable, requested_range
+from .api import APIError, decode_cursor, encode_cursor
+from .export import stream_export
+from .catalog_cache import bump_catalog_version, catalog_version, get_or_compute
+from .neocp import extract_mappings, fetch_page, parse_mapping_line
+from .ingest import IngestStats, imap_bounded, scan_fits_files
+from .models import Asteroid, DesignationMapping, DesignationToken, IngestedFile, MappingSource, Observation
+from .search import (RANK_EXACT, RANK_PREFIX, RANK_SUBSTRING, designation_tokens, normalize_designation,
+                     rank_designations)
+from .sbdb import Classification, ClassificationCache, RateLimiter, SBDBClassifier
+from .synthetic import synthetic_image, synthetic_observation, write_frames
+from .watch import INotify, InotifyWatcher, PollingWatcher, make_watcher
+from .sky import DEC_BANDS, MAX_RA_BINS, angular_separation, cells_in_cone, parse_dec, parse_ra, sky_cell
+
+
+def write_fits(directory, name, data=None, header=None):
+    """Write `data` (a small blank image by default) as the primary image of a FITS file and return its path."""
+    path = os.path.join(directory, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    hdu = fits.PrimaryHDU(np.zeros((8, 8), dtype=np.int16) if data is None else data)
+    hdu.header.update(header or {})
+    hdu.writeto(path)
+    return path
+
+
+def frame_header(date_obs, ra='10 00 00.00', dec='+20 00 00.0', **keywords):
+    """Header keywords of an observation frame, as written by the camera software."""
+    return {'DATE-OBS': date_obs, 'EXPTIME': 60.0, 'EXPOSURE': 60.0, 'TEMPERAT': -20.0, 'RA': ra, 'DEC': dec,
+            **keywords}
+
+
+def create_observations(provisional_name, count, official_name=None, start=datetime(2024, 1, 1, tzinfo=dt_timezone.utc),
+                        ra_deg=150.0, dec_deg=20.0, **fields):
+    """Create an asteroid (if needed) and `count` observations of it, one minute apart from `start`."""
+    asteroid, _ = Asteroid.objects.get_or_create(
+        provisional_name=provisional_name, defaults={'official_name': official_name, **fields}
+    )
+    return Observation.objects.bulk_create([
+        Observation(
+            asteroid=asteroid, date_obs=start + timedelta(minutes=index), naxis1=8, naxis2=8,
+            exptime=60.0, exposure=60.0, temperat=-20.0, ra='10 00 00.00', dec='+20 00 00.0',
+            ra_deg=ra_deg, dec_deg=dec_deg, sky_cell=sky_cell(ra_deg, dec_deg),
+            filename=f"{provisional_name}_{index:03d}.fits",
+        )
+        for index in range(count)
+    ])
+
+
+def read_streamed(response):
+    """Body of a streamed response."""
+    return b''.join(response.streaming_content)
+
+
+async def aread_streamed(response):
+    """Body of a streamed response of the async test client, and its number of chunks."""
+    chunks = [chunk async for chunk in response.streaming_content]
+    return b''.join(chunks), len(chunks)
+
+
+class FitsTempDirMixin:
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+
+class IngestMixin(FitsTempDirMixin):
+    """Input and processed directories, and a `populate` run against them (offline SBDB)."""
+
+    def setUp(self):
+        super().setUp()
+        self.input_dir = os.path.join(self.tmp, 'incoming')
+        self.processed_dir = os.path.join(self.tmp, 'processed')
+        os.makedirs(self.input_dir)
+
+    def populate(self, **options):
+        """Run `populate` and return its log lines."""
+        with self.assertLogs('gapc', 'INFO') as logs, redirect_stderr(io.StringIO()):
+            call_command('populate', input=self.input_dir, processed=self.processed_dir, offline=True,
+                         sbdb_cache=os.path.join(self.tmp, 'sbdb.sqlite3'), **options)
+        return logs.output
+
+
+class ParallelIngestTests(IngestMixin, TestCase):
+    def test_imap_bounded_keeps_order_and_window(self):
+        in_flight, peak = [], []
+
+        def task(value):
+            in_flight.append(value)
+            peak.append(len(in_flight))
+            return value * 2
+
+        def consume(item):
+            in_flight.pop()
+            return item
+
+        with ThreadPoolExecutor(4) as executor:
+            results = [consume(item) for item in imap_bounded(executor, task, range(20), window=3)]
+        self.assertEqual(results, [value * 2 for value in range(20)])
+        self.assertLessEqual(max(peak), 3)
+
+    def test_stats_report(self):
+        stats = IngestStats()
+        stats.add('parse', 10, 2.0)
+        with stats.timed('write', 10):
+            pass
+        lines = stats.report(workers=4)
+        self.assertIn('parse: 10 files in 2.00s (5.0 files/s per worker, 4 workers)', lines[0])
+        self.assertTrue(lines[1].strip().startswith('write: 10 files'))
+        self.assertTrue(lines[3].strip().startswith('wall: 10 files'))
+
+    def test_populate_with_workers(self):
+        for index in range(6):
+            write_fits(self.input_dir, f"2024AB{index % 2}_{index:03d}.fits",
+                       header=frame_header(f"2024-03-0{index + 1}T01:02:03.000"))
+
+        logs = self.populate(workers=2, batch_size=4)
+        self.assertEqual(Observation.objects.count(), 6)
+        self.assertEqual(Observation.objects.filter(asteroid_id='2024AB1').count(), 3)
+        self.assertEqual(sorted(os.listdir(self.processed_dir))[0], '2024AB0_000.fits')
+        self.assertEqual(os.listdir(self.input_dir), [])
+        self.assertTrue(any('6 files' in line and 'per worker, 2 workers' in line for line in logs))
+
+
+class BatchedIngestTests(IngestMixin, TestCase):
+    def write_frames(self, prefix, count):
+        for index in range(count):
+            write_fits(self.input_dir, f"{prefix}{index % 3}_{index:03d}.fits",
+                       header=frame_header(f"2024-04-01T00:{index:02d}:00.000", OBJECT=prefix))
+
+    def test_queries_do_not_grow_with_batch(self):
+        query_counts = []
+        for prefix, count in (('2024CA', 3), ('2024CB', 12)):
+            self.write_frames(prefix, count)
+            with CaptureQueriesContext(connection) as queries:
+                self.populate()
+            query_counts.append(len(queries))
+        self.assertEqual(Observation.objects.count(), 15)
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_existing_observations_are_not_duplicated(self):
+        self.write_frames('2024CC', 3)
+        self.populate()
+        # Same asteroids and dates under new file names
+        for index in range(3):
+            write_fits(self.input_dir, f"2024CC{index}_copy.fits",
+                       header=frame_header(f"2024-04-01T00:{index:02d}:00.000", OBJECT='copy'))
+        self.populate()
+        self.assertEqual(Observation.objects.count(), 3)
+        self.assertEqual(len(os.listdir(self.processed_dir)), 6)
+
+    def test_official_name_conflicts(self):
+        Asteroid.objects.create(provisional_name='2024CZ', official_name='2024 CZ9', status='confirmed')
+        designations.upsert_mappings([('2024CD', '2024 CD1'), ('2024CE', '2024 CD1'), ('2024CF', '2024 CZ9')])
+        for index, name in enumerate(('2024CD', '2024CE', '2024CF', '2024CG')):
+            write_fits(self.input_dir, f"{name}_000.fits", header=frame_header(f"2024-04-02T00:0{index}:00.000"))
+
+        with self.assertLogs('gapc.management.commands.populate', 'WARNING') as logs:
+            self.populate()
+        self.assertEqual(len([line for line in logs.output if 'Cannot confirm' in line]), 2)
+        self.assertEqual(Observation.objects.count(), 4)
+        self.assertEqual(os.listdir(self.input_dir), [])
+        self.assertEqual(
+            {name: (official, status) for name, official, status in
+             Asteroid.objects.values_list('provisional_name', 'official_name', 'status')},
+            {'2024CD': ('2024 CD1', 'confirmed'), '2024CE': (None, 'not_confirmed'),
+             '2024CF': (None, 'not_confirmed'), '2024CG': (None, 'not_confirmed'),
+             '2024CZ': ('2024 CZ9', 'confirmed')},
+        )
+
+
+class HeaderReaderTests(FitsTempDirMixin, SimpleTestCase):
+    def test_parse_card_value(self):
+        self.assertEqual(fitsio.parse_card_value("'O''Brien  '         / observer"), "O'Brien")
+        self.assertEqual(fitsio.parse_card_value("                   T / logical"), True)
+        self.assertEqual(fitsio.parse_card_value("                  42 / integer"), 42)
+        self.assertEqual(fitsio.parse_card_value("              1.5D3"), 1500.0)
+        self.assertEqual(fitsio.parse_card_value("          -20.125 / [C]"), -20.125)
+        self.assertIsNone(fitsio.parse_card_value("                     / no value"))
+        with self.assertRaises(fitsio.HeaderParseError):
+            fitsio.parse_card_value("'unterminated")
+
+    def test_read_header_matches_astropy(self):
+        path = write_fits(self.tmp, 'frame.fits', header=frame_header('2024-05-06T07:08:09.100'))
+        header = fitsio.read_header(path)
+        self.assertEqual(header, {
+            'DATE-OBS': '2024-05-06T07:08:09.100', 'NAXIS1': 8, 'NAXIS2': 8, 'TEMPERAT': -20.0,
+            'EXPTIME': 60.0, 'EXPOSURE': 60.0, 'RA': '10 00 00.00', 'DEC': '+20 00 00.0',
+        })
+        astropy_header = fits.getheader(path)
+        self.assertEqual(header, {key: astropy_header[key] for key in header})
+
+    def test_only_header_blocks_are_read(self):
+        header = fits.Header(frame_header('2024-05-06T07:08:09'))
+        for index in range(60):
+            header[f"HIERARCH NOTE{index}"] = 'padding the header over two blocks'
+        buffer = io.BytesIO()
+        fits.PrimaryHDU(np.zeros((64, 64), dtype=np.float32), header=header).writeto(buffer)
+
+        # A missing keyword is looked for up to the END card, in the second block, before the pixel data
+        buffer.seek(0)
+        self.assertEqual(fitsio.parse_header_blocks(buffer, ('RA', 'FILTER')), {'RA': '10 00 00.00'})
+        self.assertEqual(buffer.tell(), 2 * fitsio.BLOCK_SIZE)
+        # Stops as soon as every requested keyword is found, in the first block
+        buffer.seek(0)
+        self.assertEqual(fitsio.parse_header_blocks(buffer, ('NAXIS1',)), {'NAXIS1': 64})
+        self.assertEqual(buffer.tell(), fitsio.BLOCK_SIZE)
+
+    def test_truncated_header(self):
+        with self.assertRaises(fitsio.HeaderParseError):
+            fitsio.parse_header_blocks(io.BytesIO(b'SIMPLE  =                    T' + b' ' * 50))
+
+
+class StubSBDBClassifier(SBDBClassifier):
+    """Classifier answering from a dict of orbit classes (None for unknown designations) instead of the API."""
+
+    def __init__(self, cache, answers, **kwargs):
+        super().__init__(cache, **kwargs)
+        self.answers = answers
+        self.fetched = []
+
+    def fetch(self, name):
+        self.fetched.append(name)
+        orbit_class = self.answers[name]
+        return Classification(name, orbit_class is not None, orbit_class, orbit_class == 'Apollo')
+
+
+class SBDBCacheTests(FitsTempDirMixin, SimpleTestCase):
+    answers = {'99942 Apophis': 'Apollo', '1 Ceres': 'Main-belt Asteroid', 'Nonexistent': None}
+
+    def classifier(self, ttl=3600, negative_ttl=3600, **kwargs):
+        cache = ClassificationCache(os.path.join(self.tmp, 'sbdb.sqlite3'), ttl, negative_ttl)
+        classifier = StubSBDBClassifier(cache, self.answers, **kwargs)
+        self.addCleanup(classifier.close)
+        return classifier
+
+    def test_lookups_persist_across_runs(self):
+        first = self.classifier()
+        self.assertEqual(first.classify('99942 Apophis'), ('Apollo', True))
+        self.assertEqual(first.classify('Nonexistent'), (None, None))
+        self.assertEqual(first.classify('99942 Apophis'), ('Apollo', True))
+        self.assertEqual(first.fetched, ['99942 Apophis', 'Nonexistent'])
+
+        # A new run reads positive and negative answers from the cache file
+        second = self.classifier()
+        self.assertEqual(second.classify('99942 Apophis'), ('Apollo', True))
+        self.assertEqual(second.classify('Nonexistent'), (None, None))
+        self.assertEqual(second.fetched, [])
+
+    def test_expired_entries_are_fetched_again(self):
+        self.classifier().classify_many(['1 Ceres', 'Nonexistent'])
+        classifier = self.classifier(negative_ttl=-1)
+        classifier.classify_many(['1 Ceres', 'Nonexistent'])
+        self.assertEqual(classifier.fetched, ['Nonexistent'])
+
+    def test_offline_uses_the_cache_only(self):
+        self.classifier().classify('1 Ceres')
+        classifier = self.classifier(offline=True)
+        self.assertEqual(classifier.classify_many(['1 Ceres', '99942 Apophis']),
+                         {'1 Ceres': ('Main-belt Asteroid', False), '99942 Apophis': (None, None)})
+        self.assertEqual(classifier.fetched, [])
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self.payload = payload
+        self.headers = headers or {}
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}")
+
+
+class FakeSession:
+    """HTTP session returning queued responses, recording the requested designations."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requested = []
+
+    def get(self, url, params=None, timeout=None):
+        self.requested.append(params['sstr'])
+        return self.responses.pop(0)
+
+    def close(self):
+        pass
+
+
+class ConcurrentSBDBTests(FitsTempDirMixin, SimpleTestCase):
+    def classifier(self, answers, **kwargs):
+        cache = ClassificationCache(os.path.join(self.tmp, 'sbdb.sqlite3'), 3600, 3600)
+        classifier = StubSBDBClassifier(cache, answers, **kwargs)
+        self.addCleanup(classifier.close)
+        return classifier
+
+    def test_distinct_misses_are_fetched_concurrently(self):
+        names = ['433 Eros', '1 Ceres', '4 Vesta']
+        barrier = threading.Barrier(len(names), timeout=10)
+        classifier = self.classifier(dict.fromkeys(names, 'Main-belt Asteroid'), concurrency=len(names))
+        fetch = classifier.fetch
+
+        def fetch_together(name):
+            # Fails with BrokenBarrierError unless all lookups are in flight at once
+            barrier.wait()
+            return fetch(name)
+
+        classifier.fetch = fetch_together
+        results = classifier.classify_many(names + names)
+        self.assertEqual(set(results), set(names))
+        self.assertEqual(sorted(classifier.fetched), sorted(names))
+
+    def test_transient_errors_are_not_cached(self):
+        classifier = self.classifier({'1 Ceres': 'Main-belt Asteroid'})
+        fetch = classifier.fetch
+
+        def fetch_offline(name):
+            raise requests.ConnectionError('Network is unreachable')
+
+        classifier.fetch = fetch_offline
+        with self.assertLogs('gapc.sbdb', 'ERROR'):
+            self.assertEqual(classifier.classify('1 Ceres'), (None, None))
+        classifier.fetch = fetch
+        self.assertEqual(classifier.classify('1 Ceres'), ('Main-belt Asteroid', False))
+
+    def test_fetch_retries_with_retry_after(self):
+        cache = ClassificationCache(os.path.join(self.tmp, 'sbdb.sqlite3'), 3600, 3600)
+        classifier = SBDBClassifier(cache, api_url='https://sbdb.test/api', retries=2, backoff=0, rate_limit=0)
+        self.addCleanup(classifier.close)
+        classifier._session = FakeSession([
+            FakeResponse(503, headers={'Retry-After': '0'}),
+            FakeResponse(200, {'object': {'orbit_class': {'name': 'Apollo'}, 'neo': True}}),
+        ])
+        self.assertEqual(classifier.classify('99942 Apophis'), ('Apollo', True))
+        self.assertEqual(classifier.network_calls, 2)
+        self.assertEqual(classifier._session.requested, ['99942 Apophis'] * 2)
+
+    def test_rate_limiter_spaces_requests_per_host(self):
+        limiter = RateLimiter(50)
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.acquire('sbdb.test')
+        self.assertGreaterEqual(time.monotonic() - start, 5 / 50 - 0.01)
+        start = time.monotonic()
+        limiter.acquire('other.test')
+        self.assertLess(time.monotonic() - start, 1 / 50)
+
+
+class ProcessedFramesMixin(FitsTempDirMixin):
+    """Processed and preview directories of the views, in a temporary directory."""
+
+    def setUp(self):
+        super().setUp()
+        self.processed_dir = os.path.join(self.tmp, 'processed')
+        self.preview_dir = os.path.join(self.tmp, 'previews')
+        os.makedirs(self.processed_dir)
+        settings_override = override_settings(FITS_PROCESSED_DIR=self.processed_dir, PREVIEW_DIR=self.preview_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+def png_size(content):
+    """(width, height) of a PNG image, from its IHDR chunk."""
+    return struct.unpack('>II', content[16:24])
+
+
+@override_settings(PREVIEW_MAX_SIZE=16, PREVIEW_FORMAT='png')
+class PreviewTests(ProcessedFramesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        data = np.random.default_rng(0).normal(1000, 10, (48, 64)).astype(np.float32)
+        write_fits(self.processed_dir, 'night/2024AB_001.fits', data)
+        self.url = reverse('preview_image', args=['night/2024AB_001.fits'])
+
+    def test_preview_is_downsampled_and_cached(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(png_size(b''.join(response.streaming_content)), (16, 12))
+        self.assertIn('max-age', response['Cache-Control'])
+
+        cached = [os.path.join(root, name) for root, _, names in os.walk(self.preview_dir) for name in names]
+        self.assertEqual(len(cached), 1)
+        self.assertIn(os.path.basename(cached[0]).split('.')[0], response['ETag'])
+        # Served from the cache, not rendered again
+        mtime = os.stat(cached[0]).st_mtime_ns
+        self.assertEqual(self.client.get(self.url)['ETag'], response['ETag'])
+        self.assertEqual(os.stat(cached[0]).st_mtime_ns, mtime)
+
+    def test_if_none_match(self):
+        etag = self.client.get(self.url)['ETag']
+        for if_none_match, status in (
+            (etag, 304),
+            (f'"other", {etag}', 304),
+            (f'W/{etag}', 304),
+            ('*', 304),
+            # An entity tag containing the ETag is not a match
+            (f'"a{etag}b"', 200),
+            (f'"{etag[1:-2]}"', 200),
+        ):
+            with self.subTest(if_none_match=if_none_match):
+                response = self.client.get(self.url, headers={'If-None-Match': if_none_match})
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(response['ETag'], etag)
+
+    def test_if_match(self):
+        self.assertEqual(self.client.get(self.url, headers={'If-Match': '"other"'}).status_code, 412)
+
+    def test_missing_frame(self):
+        self.assertEqual(self.client.get(reverse('preview_image', args=['missing.fits'])).status_code, 404)
+
+
+class CutoutTests(ProcessedFramesMixin, TestCase):
+    def test_fits_cutout(self):
+        data = np.arange(64 * 64, dtype=np.uint16).reshape(64, 64)
+        write_fits(self.processed_dir, '2024AB_001.fits', data, header=frame_header('2024-05-06T07:08:09'))
+        response = self.client.get(reverse('fits_cutout', args=['2024AB_001.fits']),
+                                   {'x': 20, 'y': 30, 'size': 8, 'bin': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('2024AB_001_cutout.fits', response['Content-Disposition'])
+        with fits.open(io.BytesIO(response.content)) as hdul:
+            header, cutout = hdul[0].header, hdul[0].data
+        self.assertEqual(cutout.shape, (4, 4))
+        np.testing.assert_allclose(cutout, data[26:34, 16:24].reshape(4, 2, 4, 2).mean(axis=(1, 3)))
+        self.assertEqual((header['LTV1'], header['LTV2'], header['LTM1_1']), (-8.0, -13.0, 0.5))
+        self.assertEqual(header['DATE-OBS'], '2024-05-06T07:08:09')
+
+    def test_invalid_parameters(self):
+        write_fits(self.processed_dir, '2024AB_001.fits')
+        url = reverse('fits_cutout', args=['2024AB_001.fits'])
+        for params in ({'size': 0}, {'x': 'a'}, {'method': 'median'}, {'bin': 8, 'size': 4}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+
+class ReadRegionTests(FitsTempDirMixin, SimpleTestCase):
+    def test_unsigned_16_bit_frame(self):
+        # Unsigned 16-bit frames, the usual CCD output, are stored with BZERO = 32768
+        data = np.arange(64 * 48, dtype=np.uint16).reshape(48, 64) + 40000
+        path = write_fits(self.tmp, 'uint16.fits', data)
+        with fits.open(path) as hdul:
+            self.assertEqual(hdul[0].header['BZERO'], 32768)
+
+        self.assertEqual(fitsio.read_image_shape(path), (48, 64))
+        region, bounds = fitsio.read_region(path, 10, 5, 30, 25)
+        self.assertEqual(bounds, (10, 5, 30, 25))
+        np.testing.assert_array_equal(region, data[5:25, 10:30].astype(np.float32))
+
+    def test_binned_region(self):
+        data = np.arange(16 * 16, dtype=np.float32).reshape(16, 16)
+        path = write_fits(self.tmp, 'float.fits', data)
+
+        region, bounds = fitsio.read_region(path, bin_factor=4)
+        self.assertEqual(bounds, (0, 0, 16, 16))
+        np.testing.assert_allclose(region, data.reshape(4, 4, 4, 4).mean(axis=(1, 3)))
+        region, _ = fitsio.read_region(path, bin_factor=4, method='stride')
+        np.testing.assert_array_equal(region, data[::4, ::4])
+
+    def test_region_clipped_to_image(self):
+        path = write_fits(self.tmp, 'small.fits', np.ones((10, 10), dtype=np.int16))
+        _, bounds = fitsio.read_cutout(path, 0, 0, 8)
+        self.assertEqual(bounds, (0, 0, 4, 4))
+        with self.assertRaises(ValueError):
+            fitsio.read_region(path, 20, 20, 30, 30)
+
+
+class VOTableExportTests(TestCase):
+    def setUp(self):
+        create_observations('2024AB', 5, official_name='2024 AB1')
+        create_observations('2024CD', 3, start=datetime(2024, 1, 3, tzinfo=dt_timezone.utc))
+
+    def parse(self, response):
+        return parse_single_table(io.BytesIO(read_streamed(response))).array
+
+    def test_asteroid_export(self):
+        response = self.client.get(reverse('export_votable_asteroid', args=['2024AB']))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('2024AB.xml', response['Content-Disposition'])
+        table = self.parse(response)
+        self.assertEqual(len(table), 5)
+        self.assertEqual(set(table['official_name']), {'2024 AB1'})
+        self.assertEqual(list(table['date_obs']), sorted(table['date_obs']))
+        self.assertTrue(table['fits_link'][0].endswith('/fits/processed/2024AB_000.fits'))
+
+    def test_binary2_matches_tabledata(self):
+        url = reverse('export_votable_query')
+        tabledata = self.parse(self.client.get(url))
+        binary2 = self.parse(self.client.get(url, {'serialization': 'binary2'}))
+        self.assertEqual(len(binary2), 8)
+        for name in ('obs_id', 'provisional_name', 'official_name', 'date_obs', 'ra_deg', 'fits_link'):
+            self.assertEqual(list(binary2[name]), list(tabledata[name]))
+
+    def test_queries_do_not_depend_on_rows(self):
+        query_counts = []
+        for name in ('2024CD', '2024AB'):
+            with CaptureQueriesContext(connection) as queries:
+                read_streamed(self.client.get(reverse('export_votable_asteroid', args=[name])))
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_filters(self):
+        url = reverse('export_votable_query')
+        self.assertEqual(len(self.parse(self.client.get(url, {'date_from': '2024-01-02'}))), 3)
+        self.assertEqual(len(self.parse(self.client.get(url, {'date_to': '2024-01-01'}))), 5)
+        self.assertEqual(self.client.get(url, {'is_neo': 'maybe'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'serialization': 'binary'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('export_votable_asteroid', args=['unknown'])).status_code, 404)
+
+
+@override_settings(CATALOG_PAGE_SIZE=10)
+class CatalogPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for index in range(25):
+            create_observations(f"2024P{index:02d}", index % 4)
+
+    def get_page(self, **params):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('catalog'), params)
+        return response, len(queries)
+
+    def test_pages_and_observation_counts(self):
+        response, _ = self.get_page(page=3)
+        page = response.context['page_obj']
+        self.assertEqual((page.number, page.paginator.num_pages, len(page.object_list)), (3, 3, 5))
+        for asteroid in page.object_list:
+            self.assertEqual(asteroid.observation_count, int(asteroid.provisional_name[-2:]) % 4)
+        self.assertContains(response, '3 Observations')
+        self.assertContains(response, 'page=2')
+
+    def test_queries_do_not_depend_on_page_size(self):
+        _, full_page = self.get_page(page=1)
+        _, last_page = self.get_page(page=3)
+        self.assertEqual(full_page, last_page)
+
+    def test_out_of_range_page(self):
+        response, _ = self.get_page(page=99)
+        self.assertEqual(response.context['page_obj'].number, 3)
+
+
+class DesignationSearchTests(TestCase):
+    def setUp(self):
+        for provisional_name, official_name in [('ZTF0NiK', '2022 GO5'), ('ZTF0Ab', None), ('C2GO5', None),
+                                                ('A1', '2022 GO'), ('P5GO', None)]:
+            Asteroid.objects.create(provisional_name=provisional_name, official_name=official_name)
+
+    def test_normalize_and_tokens(self):
+        self.assertEqual(normalize_designation(' 2022 go-5 '), '2022GO5')
+        self.assertEqual(normalize_designation(None), '')
+        self.assertEqual(designation_tokens('a1', '2 b'), {('A1', 0), ('1', 1), ('2B', 0), ('B', 1)})
+        self.assertEqual(DesignationToken.objects.filter(asteroid_id='ZTF0NiK', position=0).count(), 2)
+
+    def test_ranking(self):
+        self.assertEqual(rank_designations('2022 go'), [('A1', RANK_EXACT), ('ZTF0NiK', RANK_PREFIX)])
+        self.assertEqual(rank_designations('go5'),
+                         [('C2GO5', RANK_SUBSTRING), ('ZTF0NiK', RANK_SUBSTRING)])
+        self.assertEqual(rank_designations('ztf0', limit=1), [('ZTF0Ab', RANK_PREFIX)])
+        self.assertEqual(rank_designations(' - '), [])
+
+    def test_short_queries_only_match_prefixes(self):
+        self.assertEqual(rank_designations('go'), [])
+        self.assertEqual(rank_designations('a1'), [('A1', RANK_EXACT)])
+        self.assertEqual(rank_designations('z', limit=1), [('ZTF0Ab', RANK_PREFIX)])
+        # One result per asteroid, also when both its designations match
+        Asteroid.objects.create(provisional_name='2024X', official_name='2024 XA')
+        self.assertEqual(rank_designations('20'),
+                         [('A1', RANK_PREFIX), ('ZTF0NiK', RANK_PREFIX), ('2024X', RANK_PREFIX)])
+
+    def test_short_and_filled_queries_are_not_grouped(self):
+        for query, limit in [('zt', None), ('ztf', 2)]:
+            with CaptureQueriesContext(connection) as queries:
+                rank_designations(query, limit)
+            self.assertEqual(len(queries), 1)
+            self.assertNotIn('GROUP BY', queries[0]['sql'])
+            self.assertIn('LIMIT', queries[0]['sql'])
+
+
+class SkyCoordinateTests(IngestMixin, TestCase):
+    def test_parse_coordinates(self):
+        self.assertAlmostEqual(parse_ra('10 30 00.00'), 157.5)
+        self.assertAlmostEqual(parse_ra('23:59:60'), 0.0)
+        self.assertAlmostEqual(parse_dec('-20 30 00'), -20.5)
+        self.assertAlmostEqual(parse_dec('-00:30:00'), -0.5)
+        self.assertEqual(parse_dec(45), 45.0)
+        for value in (None, '', 'unknown', '25 00 00', True):
+            self.assertIsNone(parse_ra(value))
+        self.assertIsNone(parse_dec('+95 00 00'))
+
+    def test_sky_cells(self):
+        self.assertIsNone(sky_cell(None, 10.0))
+        self.assertEqual(sky_cell(0.0, -90.0), 0)
+        self.assertEqual(sky_cell(359.999, 90.0) // MAX_RA_BINS, DEC_BANDS - 1)
+        self.assertEqual(sky_cell(10.2, 0.5), sky_cell(10.7, 0.2))
+        self.assertNotEqual(sky_cell(10.2, 0.5), sky_cell(11.2, 0.5))
+        # RA bins widen towards the poles
+        self.assertEqual(sky_cell(0.5, 89.5), sky_cell(5.5, 89.5))
+
+    def test_populate_stores_degrees_and_cell(self):
+        write_fits(self.input_dir, '2024SK_000.fits',
+                   header=frame_header('2024-05-01T00:00:00.000', ra='10 30 00.00', dec='-20 30 00.0'))
+        self.populate()
+        observation = Observation.objects.get()
+        self.assertAlmostEqual(observation.ra_deg, 157.5)
+        self.assertAlmostEqual(observation.dec_deg, -20.5)
+        self.assertEqual(observation.sky_cell, sky_cell(157.5, -20.5))
+
+    def test_migration_backfill(self):
+        create_observations('2024SK', 2)
+        Observation.objects.update(ra='10 30 00.00', dec='-20 30 00.0', ra_deg=None, dec_deg=None, sky_cell=None)
+        migration = importlib.import_module('gapc.migrations.0010_backfill_observation_sky_coordinates')
+        migration.backfill_sky_coordinates(apps, None)
+        self.assertEqual(set(Observation.objects.values_list('ra_deg', 'dec_deg', 'sky_cell')),
+                         {(157.5, -20.5, sky_cell(157.5, -20.5))})
+
+
+class ConeSearchTests(TestCase):
+    def test_angular_separation(self):
+        self.assertAlmostEqual(angular_separation(10.0, 0.0, 11.0, 0.0), 1.0)
+        self.assertAlmostEqual(angular_separation(0.0, 60.0, 180.0, 60.0), 60.0)
+        self.assertAlmostEqual(angular_separation(359.5, 0.0, 0.5, 0.0), 1.0)
+        np.testing.assert_allclose(angular_separation(0.0, 0.0, np.array([0.0, 90.0]), np.array([90.0, 0.0])),
+                                   [90.0, 90.0])
+
+    def test_cells_in_cone_cover_the_cone(self):
+        rng = np.random.default_rng(0)
+        for ra, dec, radius in [(150.0, 20.0, 0.5), (0.2, -10.0, 2.0), (359.9, 45.0, 1.0), (10.0, 88.0, 3.0)]:
+            cells = set(cells_in_cone(ra, dec, radius))
+            offsets = rng.uniform(-radius, radius, size=(500, 2))
+            for point_ra, point_dec in zip((ra + offsets[:, 0] / np.cos(np.radians(dec))) % 360,
+                                           np.clip(dec + offsets[:, 1], -90, 90)):
+                if angular_separation(ra, dec, point_ra, point_dec) <= radius:
+                    self.assertIn(sky_cell(point_ra, point_dec), cells)
+        # A cone reaching the pole covers whole bands
+        self.assertEqual(len(cells_in_cone(0.0, 89.5, 1.0)),
+                         len({sky_cell(ra, dec) for ra in range(360) for dec in (88.6, 89.5, 90.0)}))
+
+    def test_cone_search(self):
+        create_observations('2024CA', 2, ra_deg=150.0, dec_deg=20.0)
+        create_observations('2024CB', 1, ra_deg=150.8, dec_deg=20.0)
+        create_observations('2024CC', 1, ra_deg=151.5, dec_deg=20.0)
+        response = self.client.get(reverse('cone_search'), {'RA': '150.0', 'DEC': '20.0', 'SR': '1.0'})
+        self.assertEqual(response['Content-Type'], 'text/xml')
+        table = parse_single_table(io.BytesIO(read_streamed(response)))
+        self.assertEqual(sorted(table.array['provisional_name']), ['2024CA', '2024CA', '2024CB'])
+
+        response = self.client.get(reverse('cone_search'), {'ra': '150.0', 'dec': '20.0', 'sr': '0.1'})
+        self.assertEqual(len(parse_single_table(io.BytesIO(read_streamed(response))).array), 2)
+
+    def test_errors_are_votables(self):
+        for params, message in [({'RA': '1', 'DEC': '2'}, 'Missing parameter: SR'),
+                                ({'RA': 'x', 'DEC': '2', 'SR': '1'}, 'decimal degrees'),
+                                ({'RA': '1', 'DEC': '95', 'SR': '1'}, 'DEC in [-90, 90]'),
+                                ({'RA': '1', 'DEC': '2', 'SR': '1000'}, 'SR must be in')]:
+            response = self.client.get(reverse('cone_search'), params)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, '<INFO name="QUERY_STATUS" value="ERROR">')
+            self.assertContains(response, message)
+
+
+class IngestManifestTests(IngestMixin, TestCase):
+    def test_header_digest(self):
+        header = frame_header('2024-06-01T00:00:00.000')
+        first = write_fits(self.tmp, 'a/first.fits', header=header)
+        same = write_fits(self.tmp, 'b/renamed.fits', header=header)
+        other = write_fits(self.tmp, 'other.fits', header={**header, 'EXPTIME': 30.0})
+        self.assertEqual(fitsio.header_digest(first), fitsio.header_digest(same))
+        self.assertNotEqual(fitsio.header_digest(first), fitsio.header_digest(other))
+        self.assertEqual(len(fitsio.header_digest(first)), 64)
+
+    def test_entries_of_processed_files(self):
+        path = write_fits(self.input_dir, '2024MF_000.fits', header=frame_header('2024-06-01T00:00:00.000'))
+        self.populate()
+        entry = IngestedFile.objects.get()
+        self.assertEqual((entry.path, entry.status), (path, 'processed'))
+        self.assertEqual(entry.observation, Observation.objects.get())
+        self.assertEqual(entry.content_hash, fitsio.header_digest(os.path.join(self.processed_dir, '2024MF_000.fits')))
+
+    def test_unchanged_files_are_skipped(self):
+        path = write_fits(self.input_dir, '2024MF_000.fits', header=frame_header('2024-06-01T00:00:00.000'))
+        self.populate()
+        # The same file dropped again: not read, and left where it is
+        shutil.copy2(os.path.join(self.processed_dir, '2024MF_000.fits'), path)
+        with CaptureQueriesContext(connection) as queries:
+            self.populate()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(Observation.objects.count(), 1)
+        self.assertFalse(any('INSERT' in query['sql'] for query in queries))
+
+    def test_committed_files_are_only_moved(self):
+        path = write_fits(self.input_dir, '2024MF_000.fits', header=frame_header('2024-06-01T00:00:00.000'))
+        stat = os.stat(path)
+        IngestedFile.objects.create(path=path, size=stat.st_size, mtime_ns=stat.st_mtime_ns, status='committed')
+        logs = self.populate()
+        self.assertTrue(any('Resuming 1 files' in line for line in logs))
+        self.assertTrue(os.path.exists(os.path.join(self.processed_dir, '2024MF_000.fits')))
+        self.assertEqual(IngestedFile.objects.get().status, 'processed')
+        self.assertEqual(Observation.objects.count(), 0)
+
+    def test_duplicates_are_not_stored_twice(self):
+        header = frame_header('2024-06-01T00:00:00.000')
+        write_fits(self.input_dir, '2024MF_000.fits', header=header)
+        write_fits(self.input_dir, 'copies/2024MF_001.fits', header=header)
+        logs = self.populate()
+        observation = Observation.objects.get()
+        entries = dict(IngestedFile.objects.values_list('status', 'observation'))
+        self.assertEqual(entries, {'processed': observation.obs_id, 'duplicate': observation.obs_id})
+        self.assertTrue(any('is a duplicate of' in line for line in logs))
+
+
+class ScriptedWatcher:
+    """Watcher reporting the given batches of files, then interrupting the watch as Ctrl+C would."""
+
+    def __init__(self, *batches):
+        self.batches = list(batches)
+        self.closed = False
+
+    def changes(self, timeout=None):
+        if not self.batches:
+            raise KeyboardInterrupt
+        return list(self.batches.pop(0))
+
+    def close(self):
+        self.closed = True
+
+
+class WritingWatcher:
+    """Wrap a watcher, writing a frame at the first wait and interrupting the watch once it has been moved."""
+
+    def __init__(self, watcher, write, moved_to):
+        self.watcher = watcher
+        self.write = write
+        self.moved_to = moved_to
+        self.calls = 0
+
+    def changes(self, timeout=None):
+        self.calls += 1
+        if self.calls == 1:
+            self.write()
+        elif os.path.exists(self.moved_to) or self.calls > 200:
+            raise KeyboardInterrupt
+        return self.watcher.changes(timeout)
+
+    def close(self):
+        self.watcher.close()
+
+
+class WatchTests(IngestMixin, TestCase):
+    def test_polling_reports_stable_files_once(self):
+        watcher = PollingWatcher(self.input_dir, ('.fits',), interval=0)
+        path = write_fits(self.input_dir, '2024WA_000.fits')
+        write_fits(self.input_dir, 'notes.txt')
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(watcher.poll(), [path])
+        self.assertEqual(watcher.poll(), [])
+
+        # Still being written: reported once its size stops changing
+        with open(path, 'ab') as fileobj:
+            fileobj.write(b'\0' * fitsio.BLOCK_SIZE)
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(watcher.poll(), [path])
+
+    def test_negative_timeouts_do_not_block(self):
+        watcher = PollingWatcher(self.input_dir, ('.fits',), interval=60)
+        started = time.monotonic()
+        self.assertEqual(watcher.changes(-0.5), [])
+        self.assertLess(time.monotonic() - started, 1)
+
+    @unittest.skipIf(INotify is None, 'inotify_simple is not installed')
+    def test_inotify_timeout_is_clamped_and_rounded_up(self):
+        watcher = InotifyWatcher(self.input_dir, ('.fits',))
+        self.addCleanup(watcher.close)
+        with mock.patch.object(watcher.inotify, 'read', return_value=[]) as read:
+            for timeout in (-0.001, 0.0004, 0.25):
+                watcher.changes(timeout)
+        self.assertEqual([call.kwargs['timeout'] for call in read.call_args_list], [0, 1, 250])
+
+    def test_make_watcher(self):
+        watcher = make_watcher(self.input_dir, ('.fits',), poll=True)
+        self.assertIsInstance(watcher, PollingWatcher)
+        watcher.close()
+
+    def test_watch_ingests_batches(self):
+        first = write_fits(self.input_dir, '2024WA_000.fits', header=frame_header('2024-07-01T00:00:00.000'))
+        second = write_fits(self.input_dir, '2024WA_001.fits', header=frame_header('2024-07-01T00:01:00.000'))
+        watcher = ScriptedWatcher([first], [], [second, first])
+        with mock.patch('gapc.management.commands.populate.make_watcher', return_value=watcher):
+            logs = self.populate(watch=True, batch_window=0)
+        self.assertTrue(watcher.closed)
+        self.assertEqual(Observation.objects.count(), 2)
+        self.assertEqual(sorted(os.listdir(self.processed_dir)), ['2024WA_000.fits', '2024WA_001.fits'])
+        self.assertTrue(any('Stopped watching' in line for line in logs))
+
+
+class NestedTreeTests(IngestMixin, ProcessedFramesMixin, TestCase):
+    def write_tree(self):
+        for index, name in enumerate(('b/2024NA_001.fits', 'a/2024NA_000.fits', 'a/deep/2024NB_000.fits', 'a/notes.txt',
+                     'rejected/2024NC_000.fits', 'processed/old.fits', '2024ND_000.fits')):
+            write_fits(self.input_dir, name, header=frame_header(f'2024-08-01T00:0{index}:00.000'))
+
+    def relative(self, paths):
+        return [os.path.relpath(path, self.input_dir) for path in paths]
+
+    def test_scan_is_lazy_sorted_and_filtered(self):
+        self.write_tree()
+        skip = [os.path.join(self.input_dir, 'processed')]
+        files = scan_fits_files(self.input_dir, ('.fits',), skip=skip)
+        self.assertIsInstance(files, types.GeneratorType)
+        self.assertEqual(self.relative(files), ['2024ND_000.fits', 'a/2024NA_000.fits', 'a/deep/2024NB_000.fits',
+                                                'b/2024NA_001.fits', 'rejected/2024NC_000.fits'])
+        self.assertEqual(self.relative(scan_fits_files(self.input_dir, ('.fits',), exclude=['rejected', 'a/deep'],
+                                                       skip=skip)),
+                         ['2024ND_000.fits', 'a/2024NA_000.fits', 'b/2024NA_001.fits'])
+        self.assertEqual(self.relative(scan_fits_files(self.input_dir, ('.fits',), include=['2024NA_*'])),
+                         ['a/2024NA_000.fits', 'b/2024NA_001.fits'])
+
+    def test_compressed_headers(self):
+        header = frame_header('2024-08-01T00:00:00.000')
+        path = write_fits(self.tmp, 'frame.fits', header=header)
+        with open(path, 'rb') as source, gzip.open(path + '.gz', 'wb') as target:
+            shutil.copyfileobj(source, target)
+        image = fits.CompImageHDU(np.zeros((8, 8), dtype=np.int16), header=fits.Header(header))
+        fits.HDUList([fits.PrimaryHDU(), image]).writeto(os.path.join(self.tmp, 'frame.fits.fz'))
+        for name in ('frame.fits', 'frame.fits.gz', 'frame.fits.fz'):
+            keywords = fitsio.read_header(os.path.join(self.tmp, name))
+            self.assertEqual(keywords['DATE-OBS'], '2024-08-01T00:00:00.000', name)
+            self.assertEqual(keywords['NAXIS1'], 8, name)
+
+    def test_processed_files_mirror_the_tree(self):
+        self.write_tree()
+        self.populate(exclude=['rejected', 'processed'])
+        self.assertEqual(sorted(Observation.objects.values_list('filename', flat=True)),
+                         ['2024ND_000.fits', 'a/2024NA_000.fits', 'a/deep/2024NB_000.fits', 'b/2024NA_001.fits'])
+        self.assertTrue(os.path.isfile(os.path.join(self.processed_dir, 'a', 'deep', '2024NB_000.fits')))
+        self.assertTrue(os.path.isfile(os.path.join(self.input_dir, 'rejected', '2024NC_000.fits')))
+
+        response = self.client.get(reverse('download_fits', args=['a/deep/2024NB_000.fits']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse('download_fits', args=['../incoming/2024ND_000.fits'])).status_code,
+                         404)
+
+    def wait_for(self, watcher, timeout=5):
+        """Files reported by `watcher` until one is, or `timeout` seconds have passed."""
+        reported, deadline = [], time.monotonic() + timeout
+        while not reported and time.monotonic() < deadline:
+            reported += watcher.changes(0.05)
+        return self.relative(reported)
+
+    def test_polling_watcher_walks_the_tree(self):
+        self.write_tree()
+        watcher = PollingWatcher(self.input_dir, ('.fits',), interval=0, exclude=['rejected'],
+                                 skip=[os.path.join(self.input_dir, 'processed')])
+        watcher.poll()
+        self.assertEqual(sorted(self.relative(watcher.poll())),
+                         ['2024ND_000.fits', 'a/2024NA_000.fits', 'a/deep/2024NB_000.fits', 'b/2024NA_001.fits'])
+        write_fits(self.input_dir, '2024-08-02/t1/2024NE/2024NE_000.fits')
+        write_fits(self.input_dir, 'rejected/2024NE_001.fits')
+        watcher.poll()
+        self.assertEqual(self.relative(watcher.poll()), ['2024-08-02/t1/2024NE/2024NE_000.fits'])
+
+    @unittest.skipIf(INotify is None, 'inotify_simple is not installed')
+    def test_inotify_watcher_watches_new_directories(self):
+        write_fits(self.input_dir, 'a/2024NA_000.fits')
+        os.makedirs(os.path.join(self.input_dir, 'rejected'))
+        watcher = InotifyWatcher(self.input_dir, ('.fits',), interval=0.01, exclude=['rejected'])
+        self.addCleanup(watcher.close)
+        self.assertEqual(self.wait_for(watcher), ['a/2024NA_000.fits'])
+
+        write_fits(self.input_dir, 'a/2024NA_001.fits')
+        self.assertEqual(self.wait_for(watcher), ['a/2024NA_001.fits'])
+        # A night directory created after watching started, then a file written in it
+        os.makedirs(os.path.join(self.input_dir, '2024-08-02', 't1'))
+        self.assertEqual(self.wait_for(watcher, 0.2), [])
+        write_fits(self.input_dir, 'rejected/2024NE_001.fits')
+        write_fits(self.input_dir, '2024-08-02/t1/2024NE/2024NE_000.fits')
+        self.assertEqual(self.wait_for(watcher), ['2024-08-02/t1/2024NE/2024NE_000.fits'])
+        # A whole directory moved in
+        write_fits(self.tmp, 'night/2024NF_000.fits')
+        shutil.move(os.path.join(self.tmp, 'night'), os.path.join(self.input_dir, '2024-08-03'))
+        self.assertEqual(self.wait_for(watcher), ['2024-08-03/2024NF_000.fits'])
+        self.assertEqual(self.wait_for(watcher, 0.2), [])
+
+    def test_watch_ingests_nested_directories(self):
+        name = os.path.join('2024-08-02', 't1', '2024NE', '2024NE_000.fits')
+        for poll in (True, False):
+            with self.subTest(poll=poll):
+                moved_to = os.path.join(self.processed_dir, name)
+
+                def watcher(*args, **kwargs):
+                    return WritingWatcher(
+                        make_watcher(*args, **kwargs),
+                        lambda: write_fits(self.input_dir, name, header=frame_header('2024-08-02T00:00:00.000')),
+                        moved_to,
+                    )
+
+                with mock.patch('gapc.management.commands.populate.make_watcher', side_effect=watcher):
+                    self.populate(watch=True, poll=poll, poll_interval=0.01, batch_window=0)
+                self.assertTrue(os.path.isfile(moved_to))
+                self.assertEqual(Observation.objects.get().filename, name)
+                Observation.objects.all().delete()
+                shutil.rmtree(self.processed_dir)
+
+
+class DesignationMappingTests(IngestMixin, TestCase):
+    def test_upsert_keeps_one_row_per_name(self):
+        self.assertEqual(designations.upsert_mappings([('ZTF0A', '2022 AA'), ('ZTF0B', '2022 BB'),
+                                                       ('ZTF0A', '2022 AC')]), 2)
+        designations.upsert_mappings([('ZTF0B', '2022 BD')])
+        self.assertEqual(dict(DesignationMapping.objects.values_list('provisional_name', 'official_name')),
+                         {'ZTF0A': '2022 AC', 'ZTF0B': '2022 BD'})
+
+    @mock.patch.object(designations, 'LOOKUP_BATCH_SIZE', 2)
+    def test_lookup_in_batches(self):
+        designations.upsert_mappings([(f'ZTF0{index}', f'2022 A{index}') for index in range(5)])
+        with CaptureQueriesContext(connection) as queries:
+            found = designations.lookup_official_names(f'ZTF0{index}' for index in range(3, 8))
+        self.assertEqual(found, {'ZTF03': '2022 A3', 'ZTF04': '2022 A4'})
+        self.assertEqual(len(queries), 3)
+
+    def test_apply_mappings(self):
+        for name in ('ZTF0A', 'ZTF0B', 'ZTF0C'):
+            Asteroid.objects.create(provisional_name=name)
+        Asteroid.objects.create(provisional_name='ZTF0D', official_name='2022 DD', status='confirmed')
+        designations.upsert_mappings([('ZTF0A', '2022 AA'), ('ZTF0B', '2022 DD'), ('ZTF0D', '2022 DD')])
+        cache = ClassificationCache(os.path.join(self.tmp, 'sbdb.sqlite3'), 3600, 3600)
+        classifier = StubSBDBClassifier(cache, {'2022 AA': 'Apollo', '2022 DD': None})
+        self.addCleanup(classifier.close)
+
+        with self.assertLogs('gapc.designations', 'WARNING'):
+            self.assertEqual(designations.apply_mappings(classifier), 1)
+        confirmed = Asteroid.objects.get(provisional_name='ZTF0A')
+        self.assertEqual((confirmed.official_name, confirmed.status, confirmed.target_class, confirmed.is_neo),
+                         ('2022 AA', 'confirmed', 'Apollo', True))
+        # 2022 DD already belongs to ZTF0D
+        self.assertIsNone(Asteroid.objects.get(provisional_name='ZTF0B').official_name)
+        self.assertEqual(rank_designations('2022 AA'), [('ZTF0A', RANK_EXACT)])
+        self.assertFalse(designations.pending_confirmations().exclude(provisional_name='ZTF0B').exists())
+
+    def test_populate_looks_up_new_names(self):
+        designations.upsert_mappings([('2024MA', '2024 MA1')])
+        write_fits(self.input_dir, '2024MA_000.fits', header=frame_header('2024-09-01T00:00:00.000'))
+        write_fits(self.input_dir, '2024MB_000.fits', header=frame_header('2024-09-01T00:01:00.000'))
+        self.populate()
+        self.assertEqual(dict(Asteroid.objects.values_list('provisional_name', 'status')),
+                         {'2024MA': 'confirmed', '2024MB': 'not_confirmed'})
+        self.assertEqual(Asteroid.objects.get(provisional_name='2024MA').official_name, '2024 MA1')
+
+
+NEOCP_SAMPLE = os.path.join(settings.BASE_DIR, 'gapc', 'fixtures', 'neocp_sample.htm')
+
+
+class FakePageResponse:
+    """Streamed response of a NEOCP page."""
+
+    def __init__(self, status_code, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+        self.encoding = 'utf-8'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size, decode_unicode=False):
+        # Small chunks, to split lines and tags across them
+        for start in range(0, len(self.text), 100):
+            yield self.text[start:start + 100]
+
+
+class FakePageSession:
+    """HTTP session serving pages with an ETag, and 304 to requests carrying it; records the request headers."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        with self.lock:
+            self.requests.append((url, dict(headers or {})))
+        etag = f'"{len(self.pages[url])}"'
+        if (headers or {}).get('If-None-Match') == etag:
+            return FakePageResponse(304)
+        return FakePageResponse(200, self.pages[url], {'ETag': etag})
+
+
+class NEOCPTests(TestCase):
+    def setUp(self):
+        with open(NEOCP_SAMPLE, encoding='utf-8') as htmlfile:
+            self.page = htmlfile.read()
+
+    def test_parse_mapping_line(self):
+        self.assertEqual(parse_mapping_line(' 2022 GO5 = ZTF0NiK Apr. 1.2 UT'), ('ZTF0NiK', '2022 GO5'))
+        for line in ('', 'no mapping here', '2022 GO5 =', ' = ZTF0NiK', 'a = b = c'):
+            self.assertIsNone(parse_mapping_line(line))
+
+    def test_extract_from_chunks(self):
+        html = ('<p>2022 AA = A1 Jan.<script>2022 BB = B1</script><br>2022 <b>CC</b> = C1 &amp; more\n'
+                '2022 DD = D1</p><style>p { x = y }</style>')
+        expected = [('A1', '2022 AA'), ('C1', '2022 CC'), ('D1', '2022 DD')]
+        self.assertEqual(extract_mappings([html]), expected)
+        self.assertEqual(extract_mappings(html[start:start + 3] for start in range(0, len(html), 3)), expected)
+
+    @unittest.skipUnless(importlib.util.find_spec('bs4'), 'BeautifulSoup is not installed')
+    def test_sample_page_matches_beautifulsoup(self):
+        from bs4 import BeautifulSoup
+        reference = [mapping for mapping in map(parse_mapping_line, BeautifulSoup(self.page, 'html.parser')
+                                                .get_text().splitlines()) if mapping]
+        mappings = extract_mappings(self.page[start:start + 1000] for start in range(0, len(self.page), 1000))
+        self.assertEqual(mappings, reference)
+        self.assertEqual(mappings[0], ('AItLd', '2022 AR37'))
+
+    def test_fetch_page_sends_validators(self):
+        session = FakePageSession({'https://neocp.test/2022': self.page})
+        page = fetch_page(session, 'https://neocp.test/2022')
+        self.assertEqual((page.status, page.etag), (200, f'"{len(self.page)}"'))
+        self.assertEqual(page.mappings[1], ('AtPOD', '2022 AK2'))
+
+        unchanged = fetch_page(session, 'https://neocp.test/2022', page.etag, 'Sat, 31 Dec 2022 00:00:00 GMT')
+        self.assertEqual((unchanged.status, unchanged.mappings, unchanged.etag), (304, None, page.etag))
+        self.assertEqual(session.requests[1][1], {'If-None-Match': page.etag,
+                                                  'If-Modified-Since': 'Sat, 31 Dec 2022 00:00:00 GMT'})
+
+    def test_mappings_command_skips_unchanged_pages(self):
+        urls = ['https://neocp.test/2022', 'https://neocp.test/extra']
+        session = FakePageSession({urls[0]: self.page, urls[1]: '<p>2023 AB = ZTF0Ab</p>'})
+        with mock.patch('gapc.management.commands.mappings.requests.Session', return_value=session), \
+                self.assertLogs('gapc', 'INFO'):
+            call_command('mappings', url=urls, concurrency=2)
+            call_command('mappings', url=urls, concurrency=2)
+        self.assertEqual(DesignationMapping.objects.get(provisional_name='ZTF0Ab').official_name, '2023 AB')
+        self.assertEqual(DesignationMapping.objects.get(provisional_name='AItLd').official_name, '2022 AR37')
+        self.assertEqual(MappingSource.objects.get(url=urls[1]).mapping_count, 1)
+        self.assertEqual(sorted(headers.get('If-None-Match') is not None for _, headers in session.requests),
+                         [False, False, True, True])
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_observations('2024CV', 2)
+
+    def test_version_bumps(self):
+        version, updated_at = catalog_version()
+        self.assertIsNotNone(updated_at)
+        bump_catalog_version()
+        self.assertEqual(catalog_version()[0], version + 1)
+        # Individual changes (e.g. in the admin) bump it too
+        Asteroid.objects.filter(pk='2024CV').get().save()
+        Observation.objects.first().delete()
+        self.assertEqual(catalog_version()[0], version + 3)
+
+    def test_values_are_cached_per_version(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(get_or_compute('test', 1, compute, 'a'), 1)
+        self.assertEqual(get_or_compute('test', 1, compute, 'a'), 1)
+        self.assertEqual(get_or_compute('test', 1, compute, 'b'), 2)
+        self.assertEqual(get_or_compute('test', 2, compute, 'a'), 3)
+
+    def test_cached_pages_are_invalidated_by_changes(self):
+        url = reverse('catalog')
+        self.assertContains(self.client.get(url), '2024CV')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertContains(self.client.get(url), '2024CV')
+        # The catalog version only
+        self.assertEqual(len(queries), 1)
+
+        create_observations('2024CW', 1)
+        self.assertContains(self.client.get(url), '2024CW')
+        self.assertContains(self.client.get(reverse('asteroid_detail', args=['2024CW'])), '2024CW_000.fits')
+
+    def test_conditional_requests(self):
+        url = reverse('catalog')
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(etag, f'"catalog-{catalog_version()[0]}"')
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+        self.assertEqual(self.client.get(url, headers={'If-Modified-Since': last_modified}).status_code, 304)
+
+        bump_catalog_version()
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class APITests(TestCase):
+    def setUp(self):
+        for index in range(7):
+            create_observations(f"2024A{index}", index % 3, status='confirmed' if index % 2 else 'not_confirmed')
+
+    def walk(self, url, **params):
+        """Results of every page of a list endpoint, and the number of pages."""
+        results, pages = [], 0
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            payload = response.json()
+            results += payload['results']
+            pages += 1
+            url, params = payload['next'], {}
+        return results, pages
+
+    def test_cursor_round_trip(self):
+        for key in ('2024 AB', 12345, 'Ü/+'):
+            cursor = encode_cursor(key)
+            self.assertRegex(cursor, r'^[A-Za-z0-9_=-]+$')
+            self.assertEqual(decode_cursor(cursor), key)
+        for cursor in ('not base64!', encode_cursor('x')[:-3], 'Zm9v'):
+            with self.assertRaises(APIError):
+                decode_cursor(cursor)
+
+    def test_asteroid_pages(self):
+        results, pages = self.walk(reverse('api_asteroids'), limit=3)
+        self.assertEqual(pages, 3)
+        self.assertEqual([row['provisional_name'] for row in results], [f"2024A{index}" for index in range(7)])
+        self.assertEqual([row['observation_count'] for row in results], [index % 3 for index in range(7)])
+
+        results, _ = self.walk(reverse('api_asteroids'), fields='provisional_name,status', status='confirmed')
+        self.assertEqual(results, [{'provisional_name': f"2024A{index}", 'status': 'confirmed'} for index in (1, 3, 5)])
+
+    def test_observation_pages(self):
+        results, pages = self.walk(reverse('api_observations'), limit=2, fields='obs_id,asteroid')
+        self.assertEqual(pages, 3)
+        self.assertEqual(len(results), 6)
+        self.assertEqual([row['obs_id'] for row in results], sorted(row['obs_id'] for row in results))
+        self.assertEqual(set(results[0]), {'obs_id', 'asteroid'})
+
+        # The queries of a page do not depend on its depth
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('api_observations'), {'limit': 2, 'cursor': encode_cursor(results[3]['obs_id'])})
+        self.assertIn('"obs_id" >', queries[-1]['sql'])
+
+    def test_errors(self):
+        for url, params in [('api_asteroids', {'fields': 'provisional_name,unknown'}),
+                            ('api_asteroids', {'cursor': 'not base64!'}),
+                            ('api_asteroids', {'limit': 'many'}),
+                            ('api_observations', {'is_neo': 'maybe'}),
+                            ('api_observations', {'date_from': 'yesterday'})]:
+            response = self.client.get(reverse(url), params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+        self.assertEqual(self.client.post(reverse('api_asteroids')).status_code, 405)
+
+    def test_search(self):
+        Asteroid.objects.filter(pk='2024A3').update(official_name='2024 XY3')
+        designations.index_asteroids(Asteroid.objects.filter(pk='2024A3'))
+        payload = self.client.get(reverse('api_search'), {'q': '2024 xy3'}).json()
+        self.assertEqual([(row['provisional_name'], row['match']) for row in payload['results']],
+                         [('2024A3', 'exact')])
+        response = self.client.get(reverse('api_search'), {'q': '2024A', 'limit': 2})
+        self.assertEqual([(row['provisional_name'], row['match']) for row in response.json()['results']],
+                         [('2024A0', 'prefix'), ('2024A1', 'prefix')])
+
+        self.assertEqual(self.client.get(reverse('api_search'), {'q': '2024A'},
+                                         headers={'If-None-Match': response['ETag']}).status_code, 304)
+        response = self.client.get(reverse('api_search'), {'q': '2024A', 'limit': 'many'})
+        self.assertEqual((response.status_code, response.json()), (400, {'error': 'limit must be an integer'}))
+        self.assertEqual(self.client.post(reverse('api_search'), {'q': '2024A'}).status_code, 405)
+
+
+class CatalogExportTests(TestCase):
+    def setUp(self):
+        create_observations('2024EA', 3, official_name='2024 EA1')
+        create_observations('2024EB', 2, start=datetime(2024, 2, 1, tzinfo=dt_timezone.utc))
+
+    def export(self, **params):
+        response = self.client.get(reverse('export_catalog'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, read_streamed(response)
+
+    def test_csv(self):
+        response, body = self.export(asteroid='2024EA')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="observations.csv.gz"')
+        lines = gzip.decompress(body).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertIn('provisional_name', lines[0])
+        self.assertIn('2024 EA1', lines[1])
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_fits_table(self):
+        _, body = self.export(format='fits')
+        with fits.open(io.BytesIO(body)) as hdul:
+            table = hdul[1].data
+            self.assertEqual(len(table), 5)
+            self.assertEqual(sorted(set(table['provisional_name'])), ['2024EA', '2024EB'])
+            self.assertEqual(table['filename'][0], '2024EA_000.fits')
+            self.assertTrue(hdul[1].header['FITSURL'].endswith('/fits/processed/'))
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_parquet_row_groups(self):
+        import pyarrow.parquet as pq
+        _, body = self.export(format='parquet', date_from='2024-02-01')
+        parquet = pq.ParquetFile(io.BytesIO(body))
+        self.assertEqual(parquet.metadata.num_rows, 2)
+        self.assertEqual(parquet.read().column('provisional_name').to_pylist(), ['2024EB', '2024EB'])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(reverse('export_catalog'), {'format': 'xlsx'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('export_catalog'), {'date_to': 'soon'}).status_code, 400)
+
+    @override_settings(EXPORT_CHUNK_SIZE=1)
+    async def test_streamed_under_asgi(self):
+        produced = []
+
+        def recorded_export(*args, **kwargs):
+            for chunk in stream_export(*args, **kwargs):
+                produced.append(chunk)
+                yield chunk
+
+        with mock.patch('gapc.views.stream_export', recorded_export):
+            response = await self.async_client.get(reverse('export_catalog'), {'format': 'fits'})
+            self.assertTrue(response.is_async)
+            chunks = aiter(response.streaming_content)
+            first = await anext(chunks)
+            # Sent before the rest of the table is read
+            self.assertEqual(len(produced), 1)
+            body = first + b''.join([chunk async for chunk in chunks])
+        self.assertGreater(len(produced), 3)
+        with fits.open(io.BytesIO(body)) as hdul:
+            self.assertEqual(len(hdul[1].data), 5)
+
+
+@override_settings(PREVIEW_MAX_SIZE=16, PREVIEW_FORMAT='png', FILE_STREAM_CHUNK_SIZE=1000)
+class ASGIViewTests(ProcessedFramesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.data = np.random.default_rng(0).normal(1000, 10, (48, 64)).astype(np.float32)
+        self.path = write_fits(self.processed_dir, 'night/2024AS_000.fits', self.data)
+        create_observations('2024AS', 3, ra_deg=150.0, dec_deg=20.0)
+
+    def test_fits_executor_is_shared(self):
+        self.assertIs(async_views.fits_executor(), async_views.fits_executor())
+
+    async def test_preview(self):
+        url = reverse('preview_image', args=['night/2024AS_000.fits'])
+        response = await self.async_client.get(url)
+        self.assertTrue(response.is_async)
+        body, _ = await aread_streamed(response)
+        self.assertEqual(png_size(body), (16, 12))
+        self.assertEqual(int(response['Content-Length']), len(body))
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_download_and_range(self):
+        url = reverse('download_fits', args=['night/2024AS_000.fits'])
+        with open(self.path, 'rb') as fileobj:
+            content = fileobj.read()
+        response = await self.async_client.get(url)
+        self.assertTrue(response.is_async)
+        body, chunks = await aread_streamed(response)
+        self.assertEqual((body, chunks), (content, -(-len(content) // 1000)))
+
+        response = await self.async_client.get(url, headers={'Range': 'bytes=2880-'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual((await aread_streamed(response))[0], content[2880:])
+
+    async def test_cutout(self):
+        response = await self.async_client.get(reverse('fits_cutout', args=['night/2024AS_000.fits']),
+                                               {'x': 10, 'y': 10, 'size': 4})
+        self.assertEqual(response.status_code, 200)
+        with fits.open(io.BytesIO(response.content)) as hdul:
+            np.testing.assert_allclose(hdul[0].data, self.data[8:12, 8:12])
+
+    async def test_votables_are_streamed(self):
+        for url, params in [(reverse('export_votable_query'), {}),
+                            (reverse('export_votable_asteroid', args=['2024AS']), {'serialization': 'binary2'}),
+                            (reverse('cone_search'), {'RA': 150, 'DEC': 20, 'SR': 0.5})]:
+            with self.subTest(url=url):
+                response = await self.async_client.get(url, params)
+                self.assertTrue(response.is_async)
+                body, chunks = await aread_streamed(response)
+                self.assertGreater(chunks, 1)
+                self.assertEqual(len(parse_single_table(io.BytesIO(body)).array), 3)
+
+
+class RangeRequestTests(ProcessedFramesMixin, TestCase):
+    etag, last_modified = '"1f40-abc"', 1700000000
+
+    def byte_range(self, size=1000, **headers):
+        request = RequestFactory().get('/', headers=headers)
+        return requested_range(request, size, self.etag, self.last_modified)
+
+    def test_requested_range(self):
+        self.assertIsNone(self.byte_range())
+        self.assertEqual(self.byte_range(Range='bytes=0-99'), (0, 100))
+        self.assertEqual(self.byte_range(Range='bytes=900-'), (900, 100))
+        self.assertEqual(self.byte_range(Range='bytes=990-2000'), (990, 10))
+        self.assertEqual(self.byte_range(Range='bytes=-100'), (900, 100))
+        self.assertEqual(self.byte_range(Range='bytes=-5000'), (0, 1000))
+        # Invalid, multiple or non-byte ranges select the whole file
+        for header in ('bytes=10-5', 'bytes=a-b', 'bytes=0-1,5-6', 'items=0-1', 'bytes=-'):
+            self.assertIsNone(self.byte_range(Range=header), header)
+        for header in ('bytes=1000-', 'bytes=-0'):
+            with self.assertRaises(RangeNotSatisfiable):
+                self.byte_range(Range=header)
+
+    def test_if_range(self):
+        date = http_date(self.last_modified)
+        for if_range, expected in [(self.etag, (0, 10)), (date, (0, 10)),
+                                   (f'W/{self.etag}', None), ('"1f40-abcd"', None), ('"1f40-ab"', None),
+                                   (f'{self.etag}, "other"', None), (f'"x{self.etag}"', None),
+                                   (http_date(self.last_modified + 1), None), ('not a date', None)]:
+            self.assertEqual(self.byte_range(Range='bytes=0-9', **{'If-Range': if_range}), expected, if_range)
+
+    def test_download_responses(self):
+        path = write_fits(self.processed_dir, '2024RR_000.fits')
+        with open(path, 'rb') as fileobj:
+            content = fileobj.read()
+        url = reverse('download_fits', args=['2024RR_000.fits'])
+        response = self.client.get(url)
+        self.assertEqual(read_streamed(response), content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        etag = response['ETag']
+
+        response = self.client.get(url, headers={'Range': 'bytes=10-19', 'If-Range': etag})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f"bytes 10-19/{len(content)}")
+        self.assertEqual(read_streamed(response), content[10:20])
+
+        response = self.client.get(url, headers={'Range': 'bytes=10-19', 'If-Range': f'W/{etag}'})
+        self.assertEqual((response.status_code, read_streamed(response)), (200, content))
+
+        response = self.client.get(url, headers={'Range': f'bytes={len(content)}-'})
+        self.assertEqual((response.status_code, response['Content-Range']), (416, f"bytes */{len(content)}"))
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+        self.assertEqual(self.client.get(url, headers={'If-Modified-Since': response['Last-Modified']}).status_code,
+                         304)
+
+    @override_settings(FITS_DOWNLOAD_OFFLOAD='x-accel-redirect', FITS_DOWNLOAD_ACCEL_PREFIX='/protected/')
+    def test_offloaded_download(self):
+        write_fits(self.processed_dir, 'a b/2024RR_000.fits')
+        response = self.client.get(reverse('download_fits', args=['a b/2024RR_000.fits']))
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/a%20b/2024RR_000.fits')
+        self.assertEqual(response.content, b'')
+
+
+@override_settings(FILE_STREAM_CHUNK_SIZE=1000)
+class BundleTests(ProcessedFramesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        create_observations('2024BU', 3)
+        create_observations('2024BV', 1)
+        self.frames = {}
+        for index in range(2):
+            filename = f"2024BU_{index:03d}.fits"
+            path = write_fits(self.processed_dir, filename, np.full((40, 40), index, dtype=np.int16))
+            with open(path, 'rb') as fileobj:
+                self.frames[f"2024BU/{filename}"] = fileobj.read()
+        # 2024BU_002.fits is missing: listed in the manifest only
+
+    def manifest(self, content):
+        table = parse_single_table(io.BytesIO(content)).array
+        return list(table['provisional_name']), list(table['fits_link'])
+
+    def test_zip(self):
+        response = self.client.get(reverse('bundle_frames_asteroid', args=['2024BU']))
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="2024BU.zip"')
+        with self.assertLogs('gapc.bundle', 'WARNING'):
+            body = read_streamed(response)
+        with zipfile.ZipFile(io.BytesIO(body)) as archive:
+            self.assertIsNone(archive.testzip())
+            infos = archive.infolist()
+            self.assertEqual([info.filename for info in infos], [*self.frames, '2024BU/manifest.xml'])
+            for info in infos:
+                # Stored, with sizes and CRC in a data descriptor after the data
+                self.assertEqual((info.compress_type, info.flag_bits & 0x08), (zipfile.ZIP_STORED, 0x08))
+            for arcname, content in self.frames.items():
+                self.assertEqual(archive.read(arcname), content)
+            names, links = self.manifest(archive.read('2024BU/manifest.xml'))
+        self.assertEqual(names, ['2024BU'] * 3)
+        self.assertEqual(links, ['2024BU_000.fits', '2024BU_001.fits', '2024BU_002.fits'])
+
+    def test_tar(self):
+        response = self.client.get(reverse('bundle_frames'), {'format': 'tar', 'asteroid': '2024BU'})
+        with self.assertLogs('gapc.bundle', 'WARNING'):
+            body = read_streamed(response)
+        self.assertEqual(len(body) % tarfile.RECORDSIZE, 0)
+        with tarfile.open(fileobj=io.BytesIO(body)) as archive:
+            self.assertEqual(archive.getnames(), ['observations/2024BU_000.fits', 'observations/2024BU_001.fits',
+                                                  'observations/manifest.xml'])
+            for arcname, content in self.frames.items():
+                self.assertEqual(archive.extractfile(arcname.replace('2024BU/', 'observations/')).read(), content)
+            names, _ = self.manifest(archive.extractfile('observations/manifest.xml').read())
+        self.assertEqual(names, ['2024BU'] * 3)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get(reverse('bundle_frames'), {'format': 'rar'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('bundle_frames_asteroid', args=['unknown'])).status_code, 404)
+
+    async def test_streamed_under_asgi(self):
+        response = await self.async_client.get(reverse('bundle_frames'), {'format': 'tar', 'asteroid': '2024BU'})
+        self.assertTrue(response.is_async)
+        chunks = aiter(response.streaming_content)
+        with self.assertLogs('gapc.bundle', 'WARNING'):
+            # The header of the first frame, sent before its data is read
+            first = await anext(chunks)
+            self.assertEqual(len(first), tarfile.BLOCKSIZE)
+            rest = [chunk async for chunk in chunks]
+        self.assertGreater(len(rest), 4)
+        with tarfile.open(fileobj=io.BytesIO(first + b''.join(rest))) as archive:
+            self.assertEqual(len(archive.getnames()), 3)
+
+
+class SyntheticDataTests(IngestMixin, TestCase):
+    def test_observations_are_deterministic(self):
+        self.assertEqual(synthetic_observation(7, 3), synthetic_observation(7, 3))
+        first, next_frame = synthetic_observation(1, 3), synthetic_observation(4, 3)
+        self.assertEqual((first['provisional_name'], first['filename']), ('SYN00001', 'SYN00001_000000.fits'))
+        self.assertEqual((next_frame['provisional_name'], next_frame['filename']), ('SYN00001', 'SYN00001_000001.fits'))
+        self.assertEqual(next_frame['date_obs'] - first['date_obs'], timedelta(seconds=120))
+        self.assertAlmostEqual(parse_ra(first['ra']), first['ra_deg'], places=4)
+        self.assertAlmostEqual(parse_dec(first['dec']), first['dec_deg'], places=4)
+
+    def test_images(self):
+        image = synthetic_image(64, stars=5)
+        self.assertEqual((image.shape, image.dtype), ((64, 64), np.uint16))
+        self.assertEqual(synthetic_image(32, bitpix=-32).dtype, np.float32)
+        with self.assertRaises(ValueError):
+            synthetic_image(32, bitpix=8)
+
+    def test_populate_parses_frames_into_the_rows(self):
+        write_frames(self.input_dir, range(6), 2, image_size=32)
+        self.populate()
+        rows = Observation.objects.order_by('asteroid_id', 'date_obs')
+        self.assertEqual(len(rows), 6)
+        by_filename = {row.filename: row for row in rows}
+        for index in range(6):
+            expected = synthetic_observation(index, 2)
+            row = by_filename[expected['filename']]
+            self.assertEqual(row.asteroid_id, expected['provisional_name'])
+            self.assertEqual(timezone.make_naive(row.date_obs), expected['date_obs'])
+            self.assertEqual((row.ra, row.dec, row.naxis1), (expected['ra'], expected['dec'], 32))
+            self.assertAlmostEqual(row.ra_deg, expected['ra_deg'], places=4)
+            self.assertEqual(row.sky_cell, sky_cell(row.ra_deg, row.dec_deg))
+        with fits.open(os.path.join(self.processed_dir, 'SYN00000_000000.fits')) as hdul:
+            self.assertEqual(hdul[0].header['BZERO'], 32768)
+
+    def test_generate_rows(self):
+        with self.assertLogs('gapc', 'INFO'):
+            call_command('generate_synthetic', rows=25, asteroids=4, image_size=64, batch_size=10)
+        self.assertEqual(Observation.objects.count(), 25)
+        self.assertEqual(Asteroid.objects.filter(provisional_name__startswith='SYN').count(), 4)
+        self.assertEqual(Observation.objects.filter(asteroid_id='SYN00001').count(), 6)
+        self.assertEqual(rank_designations('syn00003'), [('SYN00003', RANK_EXACT)])
+        row = Observation.objects.get(filename='SYN00002_000003.fits')
+        self.assertEqual(timezone.make_naive(row.date_obs), synthetic_observation(14, 4)['date_obs'])
+
+        with self.assertRaises(CommandError):
+            call_command('generate_synthetic', rows=5)
+        create_observations('2024SY', 1)
+        with self.assertLogs('gapc', 'INFO'):
+            call_command('generate_synthetic', clear=True, rows=5, asteroids=1)
+        self.assertEqual(Observation.objects.filter(asteroid__provisional_name__startswith='SYN').count(), 5)
+        self.assertEqual(Observation.objects.filter(asteroid_id='2024SY').count(), 1)
+        self.assertFalse(DesignationToken.objects.filter(asteroid_id='SYN00003').exists())
+
+    def test_generate_frames(self):
+        output = os.path.join(self.tmp, 'frames')
+        with self.assertLogs('gapc', 'INFO'):
+            call_command('generate_synthetic', frames=3, output=output, image_size=32, bitpix=-32)
+        self.assertEqual(sorted(os.listdir(output)), ['SYN00000_000000.fits', 'SYN00000_000001.fits',
+                                                      'SYN00000_000002.fits'])
+        header = fitsio.read_header(os.path.join(output, 'SYN00000_000002.fits'))
+        self.assertEqual(header['DATE-OBS'], synthetic_observation(2, 1)['date_obs'].isoformat(timespec='milliseconds'))
+
+
+class MetricsTests(ProcessedFramesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        cache.clear()
+        create_observations('2024ME', 3)
+
+    def sample(self, name, **labels):
+        """Value of a sample of the rendered registry, or None."""
+        prefix = f"{name}{{{metrics.format_labels(labels.keys(), labels.values())}}} "
+        for line in metrics.registry.render().splitlines():
+            if line.startswith(prefix):
+                return float(line[len(prefix):])
+        return None
+
+    def test_histogram(self):
+        histogram = metrics.Histogram((1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(list(histogram.samples()), [(1, 2), (5, 3), ('+Inf', 4)])
+        self.assertEqual((histogram.sum, histogram.count), (14.5, 4))
+
+    def test_render_escapes_labels(self):
+        metrics.registry.record('a"b\\c\nd', 'GET', 200, 0.2, metrics.RequestStats(), 10)
+        text = metrics.registry.render()
+        self.assertIn('gapc_requests_total{view="a\\"b\\\\c\\nd",method="GET",status="200"} 1', text)
+        self.assertIn('le="0.25"} 1', text)
+        self.assertIn('# TYPE gapc_request_duration_seconds histogram', text)
+
+    def test_requests_are_recorded(self):
+        self.client.get(reverse('catalog'))
+        self.client.get(reverse('asteroid_detail', args=['2024ME']))
+        self.client.get(reverse('asteroid_detail', args=['unknown']))
+        self.assertEqual(self.sample('gapc_requests_total', view='catalog', method='GET', status='200'), 1)
+        self.assertEqual(self.sample('gapc_requests_total', view='asteroid_detail', method='GET', status='404'), 1)
+        self.assertGreater(self.sample('gapc_db_queries_per_request_sum', view='catalog'), 0)
+        self.assertGreater(self.sample('gapc_phase_seconds_total', view='catalog', phase='render'), 0)
+        self.assertGreater(self.sample('gapc_response_bytes_total', view='catalog'), 0)
+
+    def test_streamed_bytes_are_counted_once_sent(self):
+        response = self.client.get(reverse('export_votable_query'))
+        self.assertIsNone(self.sample('gapc_response_bytes_total', view='export_votable_query'))
+        body = read_streamed(response)
+        self.assertEqual(self.sample('gapc_response_bytes_total', view='export_votable_query'), len(body))
+
+    async def test_async_streamed_bytes_are_counted(self):
+        response = await self.async_client.get(reverse('cone_search'), {'RA': 150, 'DEC': 20, 'SR': 1})
+        body, _ = await aread_streamed(response)
+        self.assertEqual(self.sample('gapc_response_bytes_total', view='cone_search'), len(body))
+
+    def test_fits_phase(self):
+        write_fits(self.processed_dir, '2024ME_000.fits')
+        self.client.get(reverse('fits_cutout', args=['2024ME_000.fits']), {'size': 4})
+        self.assertGreater(self.sample('gapc_phase_seconds_total', view='fits_cutout', phase='fits'), 0)
+
+    def test_endpoint(self):
+        self.client.get(reverse('catalog'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        self.assertContains(response, 'gapc_requests_total{view="catalog",method="GET",status="200"} 1')
+
+    @override_settings(METRICS_SLOW_REQUEST_SECONDS=0, METRICS_SLOW_REQUEST_QUERIES=2)
+    def test_slow_requests_are_logged(self):
+        with self.assertLogs('gapc.middleware', 'WARNING') as logs:
+            self.client.get(reverse('catalog'), {'search': '2024'})
+        message = logs.output[0]
+        self.assertIn('Slow request GET /catalog/?search=2024 (catalog)', message)
+        self.assertEqual(message.count('SELECT'), 2)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        self.client.get(reverse('catalog'))
+        self.assertIsNone(self.sample('gapc_requests_total', view='catalog', method='GET', status='200'))
@@ -20,6 +20,11 @@ from django.urls import path
 from django.conf.urls.static import static
 from django.conf import settings
 from . import views  # Import views.py
+from . import api
+from . import async_views
+
+# FITS-heavy views, async variants by default (see gapc.async_views)
+fits_views = async_views if settings.FITS_ASYNC_VIEWS else views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -28,8 +33,22 @@ urlpatterns = [
     path('catalog/<str:target_name>/', views.AsteroidDetail.as_view(), name='asteroid_detail'),  # Route the asteroid detail page using target_name
 
     path('export_votable/<int:obs_id>/', views.export_votable, name='export_votable'),  # Route the export_votable page using obs_id
-    path('download/fits/<str:filename>/', views.download_fits, name='download_fits'),
-    path('preview/<str:filename>/', views.preview_fits_image, name='preview_fits_image'),
+    path('export_votable/', views.export_votable_query, name='export_votable_query'),  # Filtered observations as one VOTable
+    path('export_votable/asteroid/<str:target_name>/', views.export_votable_query, name='export_votable_asteroid'),
+    path('export/catalog/', views.export_catalog, name='export_catalog'),  # Parquet, FITS table or gzipped CSV
+    path('bundle/', views.bundle_frames, name='bundle_frames'),  # Frames of filtered observations as one ZIP or TAR
+    path('bundle/asteroid/<str:target_name>/', views.bundle_frames, name='bundle_frames_asteroid'),
+    # FITS file names are paths relative to the processed directory
+    path('download/fits/<path:filename>/', fits_views.download_fits, name='download_fits'),
+    path('preview/<path:filename>/image/', fits_views.preview_image, name='preview_image'),  # Before the page, <path:> also matches '/image'
+    path('preview/<path:filename>/', views.preview_fits_image, name='preview_fits_image'),
+    path('cutout/<path:filename>/', fits_views.fits_cutout, name='fits_cutout'),
+    path('scs/', views.cone_search, name='cone_search'),  # IVOA Simple Cone Search (RA, DEC, SR)
+    path('metrics', views.prometheus_metrics, name='metrics'),  # Prometheus scrape endpoint, see gapc.metrics
+
+    path('api/search/', api.search_asteroids, name='api_search'),
+    path('api/asteroids/', api.asteroid_list, name='api_asteroids'),  # Keyset-paginated JSON lists
+    path('api/observations/', api.observation_list, name='api_observations'),
 
 ]
 
@@ -1,98 +1,318 @@
 # gapc/views.py
-from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponse, FileResponse, Http404
-from django.views.generic import TemplateView, ListView
-from django.db.models import Q
-from .models import Asteroid, Observation
-from datetime import datetime
-from urllib.parse import urljoin
-
-
-from django.shortcuts import render
-from django.views.generic import TemplateView
-from django.db.models import Q
-from .models import Asteroid
+import os
+import logging
+from datetime import datetime, timedelta
+from urllib.parse import quote
 
+import numpy as np
+from asgiref.sync import sync_to_async
 from astropy.io.votable.tree import VOTableFile, Resource, Table, Field
-from astropy.table import Table as AstroTable
-from astropy.io import fits
 from django.conf import settings
-import os
-from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import Paginator
+from django.db.models import Count
+from django.http import HttpResponse, HttpResponseBadRequest, FileResponse, StreamingHttpResponse, Http404
+from django.shortcuts import render, get_object_or_404
+from django.utils import timezone
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.decorators import method_decorator
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from django.views.decorators.http import condition
+from django.views.generic import TemplateView
+
+from . import previews
+from .bundle import BUNDLE_FORMATS, stream_bundle
+from .catalog_cache import catalog_etag, catalog_last_modified, get_or_compute, request_catalog_version
+from .export import EXPORT_FORMATS, stream_export
+from .fitsio import BINNING_METHODS, read_header
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry as metrics_registry, timed
+from .models import Asteroid, Observation
+from .search import filter_catalog
+from .sky import angular_separation, cells_in_cone
+from .votable import SERIALIZATIONS, error_votable, field_index, observation_rows, stream_votable
 
-import logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
-import numpy as np
+def processed_fits_path(filename):
+    """
+    Return the path of a processed FITS file from its path relative to the processed directory.
 
-from django.shortcuts import render, get_object_or_404
-from django.http import Http404
-from astropy.io import fits
-from io import BytesIO
-import numpy as np
-import matplotlib
-matplotlib.use('Agg')  # Use the Agg backend for non-interactive plotting
-import matplotlib.pyplot as plt
-import base64
-import os
-from django.conf import settings
-import logging
+    Raises Http404 for paths outside of the processed directory and missing files.
+    """
+    try:
+        fits_file_path = safe_join(settings.FITS_PROCESSED_DIR, filename)
+    except SuspiciousFileOperation:
+        raise Http404("Invalid file name.")
+    if not os.path.isfile(fits_file_path):
+        raise Http404(f"FITS file '{filename}' not found.")
+    return fits_file_path
 
-logger = logging.getLogger(__name__)
+def fits_stem(filename):
+    """Base name of a FITS file without its extension(s), e.g. 'a/b.fits.gz' -> 'b'."""
+    name = os.path.basename(filename)
+    for suffix in ('.gz', '.fz'):
+        name = name.removesuffix(suffix)
+    return os.path.splitext(name)[0]
 
 def preview_fits_image(request, filename):
     """
     Render a page to preview a given FITS file as an image.
     """
-    # Construct the full path to the FITS file
-    fits_file_path = os.path.join(settings.FITS_DIR, 'processed', filename)
+    # Check that the FITS file exists
+    processed_fits_path(filename)
 
-    # Check if the FITS file exists
-    if not os.path.exists(fits_file_path):
-        raise Http404(f"FITS file '{filename}' not found.")
+    return render(request, 'fits_preview.html', {'filename': filename})
 
-    try:
-        # Open the FITS file
-        with fits.open(fits_file_path) as hdul:
-            data = hdul[0].data  # Assume the image data is in the first HDU
-            if data is None:
-                raise ValueError("No image data found in FITS file.")
-
-            # Normalize the data for display
-            #data = np.log10(data - np.min(data) + 1)
-
-            # Generate the image using Matplotlib
-            plt.figure(figsize=(8, 8))  # Optional: Adjust figure size
-            plt.imshow(data, cmap='gray', origin='lower')
-            plt.axis('off')  # Remove axes for cleaner image
-            buffer = BytesIO()
-            plt.savefig(buffer, format='png', bbox_inches='tight', pad_inches=0)
-            plt.close()  # Close the figure to free resources
-            buffer.seek(0)
-            image_data = buffer.getvalue()
-
-        # Encode the image as base64 for rendering in HTML
-        encoded_image = base64.b64encode(image_data).decode('utf-8')
-        return render(request, 'fits_preview.html', {'image_data': encoded_image, 'filename': filename})
+def preview_image(request, filename):
+    """
+    Serve the cached preview image of a FITS file, rendering it on first request.
+    """
+    fits_file_path = processed_fits_path(filename)
 
+    try:
+        with timed('fits'):
+            image_path, key = previews.ensure_preview(
+                fits_file_path, filename, settings.PREVIEW_DIR,
+                max_size=settings.PREVIEW_MAX_SIZE, fmt=settings.PREVIEW_FORMAT,
+            )
     except Exception as e:
         logger.error(f"Error generating preview for FITS file '{filename}': {e}")
         return HttpResponse("Error generating preview for FITS file.", status=500)
+
+    return preview_response(
+        request, key, lambda content_type: FileResponse(open(image_path, 'rb'), content_type=content_type)
+    )
+
+def preview_response(request, key, file_response):
+    """
+    Response serving a cached preview, or a 304 if the client already has it.
+
+    :param key: Cache key of the preview (see `previews.ensure_preview`)
+    :param file_response: Callable returning the response streaming the preview file, given its content type
+    """
+    # Cached previews are immutable, the key changes whenever the frame does
+    etag = quote_etag(key)
+    # Matches If-None-Match entity tags exactly (weak comparison, '*' included), and handles If-Match
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = file_response(previews.CONTENT_TYPES[settings.PREVIEW_FORMAT])
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=settings.PREVIEW_CACHE_MAX_AGE)
+    return response
     
-def download_fits(request, filename):
-    """ Download a processed FITS file. """
-    
-    if '..' in filename or '/' in filename or '\\' in filename:
-        raise Http404("Invalid file name.")
-    
-    file_path = os.path.join(settings.MEDIA_ROOT, 'fits/processed', filename)
-    if os.path.exists(file_path):
-        response = FileResponse(open(file_path, 'rb'), content_type='application/fits')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
+def parse_cutout_params(params):
+    """
+    Read the cutout parameters of a request: x, y (centre in 0-based pixels, None for
+    the image centre), size (side in pixels), bin (binning factor), method ('mean' or
+    'stride') and format ('fits' or 'png'). Raises ValueError on invalid values.
+    """
+    try:
+        x = int(params['x']) if 'x' in params else None
+        y = int(params['y']) if 'y' in params else None
+        size = int(params.get('size', settings.CUTOUT_DEFAULT_SIZE))
+        bin_factor = int(params.get('bin', 1))
+    except ValueError:
+        raise ValueError("Parameters x, y, size and bin must be integers.")
+    method = params.get('method', 'mean')
+    output_format = params.get('format', 'fits')
+
+    if not 0 < size <= settings.CUTOUT_MAX_SIZE:
+        raise ValueError(f"size must be between 1 and {settings.CUTOUT_MAX_SIZE}.")
+    if not 0 < bin_factor <= min(size, settings.CUTOUT_MAX_BIN):
+        raise ValueError(f"bin must be between 1 and {min(size, settings.CUTOUT_MAX_BIN)}.")
+    if method not in BINNING_METHODS or output_format not in ('fits', 'png'):
+        raise ValueError("Unsupported method or format.")
+    return {'x': x, 'y': y, 'size': size, 'bin_factor': bin_factor, 'method': method, 'fmt': output_format}
+
+def cutout_response(filename, content, content_type):
+    """Response serving a cutout rendered by `previews.render_cutout`."""
+    stem = fits_stem(filename)
+    response = HttpResponse(content, content_type=content_type)
+    if content_type == 'image/png':
+        response['Content-Disposition'] = f'inline; filename="{stem}_cutout.png"'
     else:
-        raise Http404(f"FITS file '{filename}' not found.")
+        response['Content-Disposition'] = f'attachment; filename="{stem}_cutout.fits"'
+    return response
+
+def fits_cutout(request, filename):
+    """
+    Return a square cutout of a FITS image, read from the memory-mapped file.
+
+    Query parameters: see `parse_cutout_params`.
+    """
+    fits_file_path = processed_fits_path(filename)
+    try:
+        params = parse_cutout_params(request.GET)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    try:
+        with timed('fits'):
+            content, content_type = previews.render_cutout(fits_file_path, filename, **params)
+    except ValueError as e:
+        return HttpResponseBadRequest(f"Invalid cutout: {e}")
+    except Exception as e:
+        logger.error(f"Error reading cutout of FITS file '{filename}': {e}")
+        return HttpResponse("Error reading FITS file.", status=500)
+    return cutout_response(filename, content, content_type)
+
+def fits_content_type(filename):
+    """Content type of a FITS file download."""
+    return 'application/gzip' if filename.lower().endswith('.gz') else 'application/fits'
+
+class RangeNotSatisfiable(Exception):
+    """Raised for a Range header selecting no byte of the file."""
+
+def requested_range(request, size, etag, last_modified):
+    """
+    Return the byte range requested by the Range header of a request, honouring If-Range.
+
+    Only single ranges are supported; other or invalid Range headers, and ranges of a
+    file whose ETag or modification date no longer matches If-Range, select the whole file.
+
+    :param etag: Quoted strong ETag of the file
+    :param last_modified: Modification time of the file, in whole seconds
+    :return: A (start, length) tuple, or None for the whole file
+    """
+    header = request.headers.get('Range', '')
+    if not header.startswith('bytes=') or ',' in header:
+        return None
+    if_range = request.headers.get('If-Range', '').strip()
+    if if_range:
+        if if_range.startswith(('"', 'W/')):
+            # Strong comparison: a single entity tag, identical to the ETag and not weak
+            if parse_etags(if_range) != [etag]:
+                return None
+        elif parse_http_date_safe(if_range) != last_modified:
+            return None
+
+    first, _, last = header[len('bytes='):].strip().partition('-')
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if int(last or start) < start:
+                return None
+        else:
+            # Suffix range: the last `last` bytes
+            start, end = max(0, size - int(last)), size - 1
+            if int(last) == 0:
+                raise RangeNotSatisfiable()
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, end - start + 1
+
+def read_file_range(fileobj, length, chunk_size=None):
+    """Yield `length` bytes of an open file from its current position, in chunks, then close it."""
+    chunk_size = chunk_size or settings.FILE_STREAM_CHUNK_SIZE
+    try:
+        while length > 0:
+            chunk = fileobj.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        fileobj.close()
+
+def file_response(request, path, content_type, start=0, length=None):
+    """Response streaming `length` bytes of a file from `start` (the whole file by default)."""
+    fileobj = open(path, 'rb')
+    if start == 0 and length is None:
+        return FileResponse(fileobj, content_type=content_type)
+    fileobj.seek(start)
+    response = StreamingHttpResponse(read_file_range(fileobj, length), content_type=content_type)
+    response['Content-Length'] = length
+    return response
+
+async def aiter_content(content):
+    """
+    Yield the chunks of a synchronous iterator, each one produced in a thread by `sync_to_async`.
+
+    Thread-sensitive, as the view that built the iterator: database cursors are
+    read in the thread that opened them.
+    """
+    iterator = iter(content)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            chunk = await next_chunk(iterator, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
+
+def streaming_response(request, content, content_type):
+    """
+    Response streaming `content`, an iterator of chunks generated while they are sent.
+
+    Under ASGI, Django would read a synchronous iterator to the end before sending
+    anything, so it is consumed asynchronously (see `aiter_content`) instead.
+    """
+    if isinstance(request, ASGIRequest):
+        content = aiter_content(content)
+    return StreamingHttpResponse(content, content_type=content_type)
+
+def download_response(request, filename, file_path, stream_file):
+    """
+    Response downloading a processed FITS file.
+
+    With settings.FITS_DOWNLOAD_OFFLOAD, the front-end server is told to send the
+    file (X-Accel-Redirect for nginx, X-Sendfile for Apache/lighttpd) and Django only
+    checks the request. Otherwise the file is sent with conditional request (ETag,
+    Last-Modified) and single byte range (206, If-Range) support.
+
+    :param stream_file: `file_response`, or a variant taking the same arguments
+    """
+    content_type = fits_content_type(filename)
+    offload = settings.FITS_DOWNLOAD_OFFLOAD
+    if offload == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = f"{settings.FITS_DOWNLOAD_ACCEL_PREFIX}{quote(filename)}"
+    elif offload == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = os.path.abspath(file_path)
+    elif offload:
+        raise ImproperlyConfigured(f"Unsupported FITS_DOWNLOAD_OFFLOAD: {offload}")
+    else:
+        stat = os.stat(file_path)
+        # Strong validator: changes with the size or the modification time of the file
+        etag = quote_etag(f"{stat.st_size:x}-{stat.st_mtime_ns:x}")
+        last_modified = int(stat.st_mtime)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            try:
+                byte_range = requested_range(request, stat.st_size, etag, last_modified)
+            except RangeNotSatisfiable:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f"bytes */{stat.st_size}"
+            else:
+                if byte_range is None:
+                    response = stream_file(request, file_path, content_type)
+                else:
+                    start, length = byte_range
+                    response = stream_file(request, file_path, content_type, start, length)
+                    response.status_code = 206
+                    response['Content-Range'] = f"bytes {start}-{start + length - 1}/{stat.st_size}"
+            response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Content-Disposition'] = f'attachment; filename="{os.path.basename(filename)}"'
+    return response
+
+def download_fits(request, filename):
+    """ Download a processed FITS file, or a byte range of it. """
+    return download_response(request, filename, processed_fits_path(filename), file_response)
 
 def export_votable(request, obs_id):
     """
@@ -102,7 +322,7 @@ def export_votable(request, obs_id):
     observation = get_object_or_404(Observation, obs_id=obs_id)
     
     # Construct the full path to the FITS file
-    fits_file_path = os.path.join(settings.FITS_DIR, 'processed', observation.filename)
+    fits_file_path = os.path.join(settings.FITS_PROCESSED_DIR, observation.filename)
 
     # Log debug information
     logger.info(f"Attempting to export VOTable for FITS file at: {fits_file_path}")
@@ -113,18 +333,18 @@ def export_votable(request, obs_id):
         return HttpResponse(f"FITS file '{observation.filename}' not found in the processed directory.", status=404)
 
     try:
-        # Open the FITS file and extract header information
-        with fits.open(fits_file_path) as hdul:
-            header = hdul[0].header
-
-            date_obs = header.get('DATE-OBS', 'N/A')
-            naxis1 = header.get('NAXIS1', 'N/A')
-            naxis2 = header.get('NAXIS2', 'N/A')
-            temperature = header.get('TEMPERAT', 'N/A')
-            exptime = header.get('EXPTIME', 'N/A')
-            exposure = header.get('EXPOSURE', 'N/A')
-            ra = header.get('RA', 'N/A')
-            dec = header.get('DEC', 'N/A')
+        # Read the header keywords only, without loading the pixel data
+        with timed('fits'):
+            header = read_header(fits_file_path)
+
+        date_obs = header.get('DATE-OBS', 'N/A')
+        naxis1 = header.get('NAXIS1', 'N/A')
+        naxis2 = header.get('NAXIS2', 'N/A')
+        temperature = header.get('TEMPERAT', 'N/A')
+        exptime = header.get('EXPTIME', 'N/A')
+        exposure = header.get('EXPOSURE', 'N/A')
+        ra = header.get('RA', 'N/A')
+        dec = header.get('DEC', 'N/A')
 
     except Exception as e:
         logger.error(f"Error reading FITS file header: {e}")
@@ -215,7 +435,7 @@ def export_votable(request, obs_id):
     votable_table.create_arrays(1)  # Create a table with one row
     
     # Populate the table with extracted metadata
-    fits_link = f"{request.build_absolute_uri(settings.MEDIA_URL)}fits/processed/{observation.filename}"
+    fits_link = f"{request.build_absolute_uri(settings.MEDIA_URL)}fits/processed/{quote(observation.filename)}"
     votable_table.array[0] = (
         date_obs,
         naxis1,
@@ -238,50 +458,272 @@ def export_votable(request, obs_id):
     
     return response
 
+def parse_date_param(value, end=False):
+    """
+    Parse a date or datetime query parameter.
+
+    A plain date selects the start of that day, or the start of the next day if `end` is set.
+    """
+    try:
+        day = parse_date(value)
+        parsed = parse_datetime(value) if day is None else None
+    except ValueError:
+        day = parsed = None
+    if day is not None:
+        parsed = datetime.combine(day + timedelta(days=1) if end else day, datetime.min.time())
+    elif parsed is None:
+        raise ValueError(f"Invalid date: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+def filter_observations(queryset, params):
+    """
+    Filter an observation queryset with query parameters.
+
+    Supported parameters: asteroid (provisional name), status, target_class,
+    is_neo (true/false), date_from and date_to (ISO dates or datetimes; a plain
+    date_to includes that whole day, a datetime is exclusive). Raises ValueError
+    on invalid values.
+    """
+    if params.get('asteroid'):
+        queryset = queryset.filter(asteroid_id=params['asteroid'])
+    if params.get('status'):
+        queryset = queryset.filter(asteroid__status=params['status'])
+    if params.get('target_class'):
+        queryset = queryset.filter(asteroid__target_class=params['target_class'])
+    if params.get('is_neo'):
+        if params['is_neo'].lower() not in ('true', 'false', '1', '0'):
+            raise ValueError("is_neo must be true or false")
+        queryset = queryset.filter(asteroid__is_neo=params['is_neo'].lower() in ('true', '1'))
+    if params.get('date_from'):
+        queryset = queryset.filter(date_obs__gte=parse_date_param(params['date_from']))
+    if params.get('date_to'):
+        queryset = queryset.filter(date_obs__lt=parse_date_param(params['date_to'], end=True))
+    return queryset
+
+def export_votable_query(request, target_name=None):
+    """
+    Stream the observations of an asteroid, or of any filtered query, as a single VOTable.
+
+    Values are read from the database only (no FITS I/O). Filters are the query
+    parameters of `filter_observations`; `serialization=binary2` selects the
+    BINARY2 serialization instead of TABLEDATA.
+    """
+    params = request.GET.copy()
+    if target_name is not None:
+        get_object_or_404(Asteroid, provisional_name=target_name)
+        params['asteroid'] = target_name
+
+    serialization = params.get('serialization', 'tabledata').lower()
+    if serialization not in SERIALIZATIONS:
+        return HttpResponseBadRequest(f"serialization must be one of: {', '.join(SERIALIZATIONS)}")
+    try:
+        queryset = filter_observations(Observation.objects.all(), params)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    queryset = queryset.order_by('asteroid_id', 'date_obs')
+    fits_base_url = f"{request.build_absolute_uri(settings.MEDIA_URL)}fits/processed/"
+    name = target_name or 'observations'
+    response = streaming_response(
+        request,
+        stream_votable(observation_rows(queryset), fits_base_url, resource_name=f"GAPC {name}",
+                       serialization=serialization),
+        'application/xml',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{name}.xml"'
+    return response
+
+def export_catalog(request):
+    """
+    Stream the observations, or any filtered query, as a Parquet, FITS binary table or gzipped CSV file.
+
+    Filters are the query parameters of `filter_observations`; `format` is
+    'parquet' (requires pyarrow), 'fits' or 'csv' (the default). The table is
+    read and encoded in chunks of settings.EXPORT_CHUNK_SIZE rows, as they are
+    sent (under ASGI too, see `streaming_response`).
+    """
+    export_format = request.GET.get('format', 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    try:
+        queryset = filter_observations(Observation.objects.all(), request.GET).order_by('obs_id')
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    fits_base_url = f"{request.build_absolute_uri(settings.MEDIA_URL)}fits/processed/"
+    total = queryset.count() if export_format == 'fits' else None
+    try:
+        content = stream_export(observation_rows(queryset, chunk_size=settings.EXPORT_CHUNK_SIZE),
+                                export_format, fits_base_url, total)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    extension, content_type = EXPORT_FORMATS[export_format]
+    response = streaming_response(request, content, content_type)
+    response['Content-Disposition'] = f'attachment; filename="observations{extension}"'
+    return response
+
+def bundle_frames(request, target_name=None):
+    """
+    Stream the FITS frames of an asteroid, or of any filtered query, as one ZIP or TAR archive.
+
+    Filters are the query parameters of `filter_observations`; `format` is 'zip'
+    (ZIP64, the default) or 'tar'. Frames are stored without recompression and
+    followed by a VOTable manifest of the observations, see `gapc.bundle`. The
+    archive is built while it is sent, under ASGI too (see `streaming_response`).
+    """
+    params = request.GET.copy()
+    if target_name is not None:
+        get_object_or_404(Asteroid, provisional_name=target_name)
+        params['asteroid'] = target_name
+
+    bundle_format = params.get('format', 'zip').lower()
+    if bundle_format not in BUNDLE_FORMATS:
+        return HttpResponseBadRequest(f"format must be one of: {', '.join(BUNDLE_FORMATS)}")
+    try:
+        queryset = filter_observations(Observation.objects.all(), params)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    queryset = queryset.order_by('asteroid_id', 'date_obs')
+    name = target_name or 'observations'
+    extension, content_type = BUNDLE_FORMATS[bundle_format]
+    response = streaming_response(
+        request,
+        stream_bundle(observation_rows(queryset), settings.FITS_PROCESSED_DIR, bundle_format, name,
+                      chunk_size=settings.FILE_STREAM_CHUNK_SIZE),
+        content_type,
+    )
+    response['Content-Disposition'] = f'attachment; filename="{name}{extension}"'
+    return response
+
+def prometheus_metrics(request):
+    """ Request metrics of this process, in the Prometheus text format (see `gapc.metrics`). """
+    return HttpResponse(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+def cone_queryset(queryset, ra, dec, radius):
+    """
+    Restrict an observation queryset to the sky cells (and declination range) a cone can overlap.
+
+    The result is a superset of the cone, see `filter_cone` for the exact selection.
+    """
+    return queryset.filter(
+        sky_cell__in=cells_in_cone(ra, dec, radius),
+        dec_deg__gte=dec - radius,
+        dec_deg__lte=dec + radius,
+    )
+
+def filter_cone(chunks, ra, dec, radius):
+    """Keep the rows of `observation_rows` chunks lying within `radius` degrees of (ra, dec)."""
+    ra_index, dec_index = field_index('ra_deg'), field_index('dec_deg')
+    for chunk in chunks:
+        positions = np.array([(row[ra_index], row[dec_index]) for row in chunk], dtype=float)
+        inside = angular_separation(ra, dec, positions[:, 0], positions[:, 1]) <= radius
+        selected = [row for row, keep in zip(chunk, inside) if keep]
+        if selected:
+            yield selected
+
+def cone_search(request):
+    """
+    IVOA Simple Cone Search over the observations.
+
+    Takes the `RA`, `DEC` and `SR` parameters (ICRS, decimal degrees) and returns
+    the observations pointed within SR degrees of the position as a VOTable.
+    Only the observations of the sky cells overlapping the cone are read.
+    Errors are reported as VOTables with QUERY_STATUS=ERROR, as the standard requires.
+    """
+    params = {key.upper(): value for key, value in request.GET.items()}
+    try:
+        ra, dec, radius = (float(params[name]) for name in ('RA', 'DEC', 'SR'))
+    except KeyError as e:
+        return HttpResponse(error_votable(f"Missing parameter: {e.args[0]}"), content_type='text/xml')
+    except ValueError:
+        return HttpResponse(error_votable("RA, DEC and SR must be decimal degrees"), content_type='text/xml')
+    if not (0 <= ra <= 360 and -90 <= dec <= 90):
+        return HttpResponse(error_votable("RA must be in [0, 360] and DEC in [-90, 90]"), content_type='text/xml')
+    if not 0 <= radius <= settings.CONE_SEARCH_MAX_SR:
+        return HttpResponse(error_votable(f"SR must be in [0, {settings.CONE_SEARCH_MAX_SR}]"),
+                            content_type='text/xml')
+
+    queryset = cone_queryset(Observation.objects.all(), ra % 360, dec, radius).order_by('date_obs')
+    fits_base_url = f"{request.build_absolute_uri(settings.MEDIA_URL)}fits/processed/"
+    return streaming_response(
+        request,
+        stream_votable(filter_cone(observation_rows(queryset), ra % 360, dec, radius), fits_base_url,
+                       resource_name='GAPC cone search',
+                       description=f"Observations within {radius} deg of RA={ra}, DEC={dec}",
+                       infos=[('QUERY_STATUS', 'OK')]),
+        'text/xml',
+    )
+
+@method_decorator(condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified), name='dispatch')
 class Catalog(TemplateView):
-    """ Retrieve the catalog of asteroids. """
+    """
+    Retrieve the catalog of asteroids.
+
+    The result list is a template fragment cached per catalog version and query,
+    and the page is lazily paginated, so a cached page runs no catalog query.
+    """
 
     template_name = 'catalog.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        version, _ = request_catalog_version(self.request)
 
         # Retrieve query parameters
         search_query = self.request.GET.get('search', '')
         selected_classification = self.request.GET.get('classification', '')
 
-        # Filter asteroids based on search and classification
-        queryset = Asteroid.objects.all()
-
-        if search_query:
-            queryset = queryset.filter(
-                Q(provisional_name__icontains=search_query) |
-                Q(official_name__icontains=search_query) |
-                Q(target_class__icontains=search_query) |
-                Q(status__icontains=search_query)
+        # Unique classification choices of the database (None as "Undefined"), cached per catalog version
+        classifications = get_or_compute('classifications', version, lambda: sorted(
+            {cls if cls is not None else "Undefined"
+             for cls in Asteroid.objects.values_list('target_class', flat=True).distinct()}
+        ))
+
+        def get_page():
+            # Filter asteroids based on search and classification; observation counts are
+            # computed in the same query instead of one COUNT per asteroid
+            # (aggregation drops Meta.ordering, so it is restated for stable pages)
+            queryset = (
+                Asteroid.objects.annotate(observation_count=Count('observations'))
+                .order_by(*Asteroid._meta.ordering)
             )
-
-        if selected_classification:
-            queryset = queryset.filter(target_class=selected_classification)
-
-
-        # Get unique classification choices from the database, handle NoneType values, and remove duplicates
-        classifications = (
-            Asteroid.objects.values_list('target_class', flat=True)
-            .distinct()
-        )
-        classifications = sorted(
-            {cls if cls is not None else "Undefined" for cls in classifications}
-        )
-
-        context['asteroids'] = queryset
+            if search_query:
+                # Ranked search through the designation index (exact matches first)
+                queryset = filter_catalog(queryset, search_query, classifications)
+            if selected_classification:
+                queryset = queryset.filter(target_class=selected_classification)
+            paginator = Paginator(queryset, settings.CATALOG_PAGE_SIZE)
+            return paginator.get_page(self.request.GET.get('page'))
+
+        # Evaluated only when the results fragment is not cached
+        page = SimpleLazyObject(get_page)
+
+        # Query string of the current filters, kept by the pagination links
+        filters = self.request.GET.copy()
+        filters.pop('page', None)
+
+        context['asteroids'] = SimpleLazyObject(lambda: page.object_list)
+        context['page_obj'] = page
+        context['filters_query'] = filters.urlencode()
         context['search_query'] = search_query
         context['selected_classification'] = selected_classification
         context['classifications'] = classifications
+        context['catalog_version'] = version
+        context['cache_timeout'] = settings.CATALOG_CACHE_TIMEOUT
+        context['page_number'] = self.request.GET.get('page', '')
         return context
 
+@method_decorator(condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified), name='dispatch')
 class AsteroidDetail(TemplateView):
-    """ Retrieve the observations of a specific asteroid. """
+    """
+    Retrieve the observations of a specific asteroid.
+
+    The page content is a template fragment cached per catalog version.
+    """
 
     template_name = 'asteroid_detail.html'
 
@@ -291,4 +733,6 @@ class AsteroidDetail(TemplateView):
         context['asteroid'] = asteroid
         context['observations'] = asteroid.observations.all()
         context['MEDIA_URL'] = settings.MEDIA_URL  # Include MEDIA_URL for templates
-        return context
\ No newline at end of file
+        context['catalog_version'], _ = request_catalog_version(self.request)
+        context['cache_timeout'] = settings.CATALOG_CACHE_TIMEOUT
+        return context
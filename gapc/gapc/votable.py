@@ -0,0 +1,274 @@
+"""
+Streaming VOTable serialization of observation querysets.
+
+The table is written incrementally: the queryset is read in chunks with
+`values_list(...).iterator()`, each chunk is converted column by column and the
+encoded rows are yielded right away, so memory use does not depend on the
+number of rows. Both TABLEDATA and BINARY2 serializations are supported.
+"""
+import base64
+import struct
+from itertools import islice
+from urllib.parse import quote
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+from django.utils import timezone
+
+VOTABLE_NAMESPACE = 'http://www.ivoa.net/xml/VOTable/v1.3'
+
+SERIALIZATIONS = ('tabledata', 'binary2')
+
+# Column definitions of observation tables. `source` is the Observation field the
+# column is read from (None for computed columns).
+OBSERVATION_FIELDS = [
+    {
+        'name': 'obs_id',
+        'source': 'obs_id',
+        'datatype': 'int',
+        'ucd': 'meta.id;meta.main',
+        'description': 'Identifier of the observation in the GAPC catalog'
+    },
+    {
+        'name': 'provisional_name',
+        'source': 'asteroid_id',
+        'datatype': 'char',
+        'ucd': 'meta.id',
+        'description': 'Provisional name or designation of the observed asteroid'
+    },
+    {
+        'name': 'official_name',
+        'source': 'asteroid__official_name',
+        'datatype': 'char',
+        'ucd': 'meta.id',
+        'description': 'Official name of the observed asteroid, if confirmed'
+    },
+    {
+        'name': 'date_obs',
+        'source': 'date_obs',
+        'datatype': 'char',
+        'ucd': 'time.start',
+        'description': 'The starting date and time of the observation in ISO 8601 format'
+    },
+    {
+        'name': 'naxis1',
+        'source': 'naxis1',
+        'datatype': 'int',
+        'ucd': 'meta.number',
+        'description': 'The number of pixels along the x-axis (image width)'
+    },
+    {
+        'name': 'naxis2',
+        'source': 'naxis2',
+        'datatype': 'int',
+        'ucd': 'meta.number',
+        'description': 'The number of pixels along the y-axis (image height)'
+    },
+    {
+        'name': 'temperature',
+        'source': 'temperat',
+        'datatype': 'double',
+        'ucd': 'phys.temperature',
+        'description': 'The temperature of the camera sensor in degrees Celsius'
+    },
+    {
+        'name': 'exptime',
+        'source': 'exptime',
+        'datatype': 'double',
+        'ucd': 'time.duration',
+        'description': 'The total exposure time for the observation in seconds'
+    },
+    {
+        'name': 'exposure',
+        'source': 'exposure',
+        'datatype': 'double',
+        'ucd': 'time.duration',
+        'description': 'The effective exposure duration in seconds'
+    },
+    {
+        'name': 'ra',
+        'source': 'ra',
+        'datatype': 'char',
+        'ucd': 'pos.eq.ra',
+        'description': 'The Right Ascension coordinate of the observation in HH:MM:SS format'
+    },
+    {
+        'name': 'dec',
+        'source': 'dec',
+        'datatype': 'char',
+        'ucd': 'pos.eq.dec',
+        'description': 'The Declination coordinate of the observation in DD:MM:SS format'
+    },
+    {
+        'name': 'ra_deg',
+        'source': 'ra_deg',
+        'datatype': 'double',
+        'ucd': 'pos.eq.ra;meta.main',
+        'description': 'The Right Ascension coordinate of the observation in degrees'
+    },
+    {
+        'name': 'dec_deg',
+        'source': 'dec_deg',
+        'datatype': 'double',
+        'ucd': 'pos.eq.dec;meta.main',
+        'description': 'The Declination coordinate of the observation in degrees'
+    },
+    {
+        'name': 'fits_link',
+        'source': None,
+        'datatype': 'char',
+        'ucd': 'meta.ref.url',
+        'description': 'A URL link to download the associated FITS file for this observation'
+    },
+]
+
+# numpy dtypes of the fixed-size BINARY2 datatypes, with the value written for nulls
+BINARY_TYPES = {
+    'int': ('>i4', 0),
+    'long': ('>i8', 0),
+    'double': ('>f8', np.nan),
+}
+
+
+def observation_rows(queryset, chunk_size=2000):
+    """
+    Read the columns of OBSERVATION_FIELDS from an observation queryset, chunk by chunk.
+
+    The `filename` is read in place of the computed `fits_link` column.
+
+    :return: An iterator of lists of row tuples
+    """
+    sources = [field['source'] or 'filename' for field in OBSERVATION_FIELDS]
+    rows = queryset.values_list(*sources).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def to_columns(chunk, fits_base_url):
+    """Transpose a chunk of rows into columns, converting values to their VOTable representation."""
+    columns = [list(column) for column in zip(*chunk)]
+    for index, field in enumerate(OBSERVATION_FIELDS):
+        if field['name'] == 'date_obs':
+            columns[index] = [timezone.localtime(value).isoformat() for value in columns[index]]
+        elif field['name'] == 'fits_link':
+            columns[index] = [f"{fits_base_url}{quote(filename)}" if filename else None for filename in columns[index]]
+    return columns
+
+
+def field_index(name):
+    """Position of a column of OBSERVATION_FIELDS in the row tuples."""
+    return [field['name'] for field in OBSERVATION_FIELDS].index(name)
+
+
+def info_elements(infos, indent):
+    """Format (name, value) pairs as INFO elements."""
+    return [f'{indent}<INFO name={quoteattr(name)} value={quoteattr(str(value))}/>' for name, value in infos]
+
+
+def votable_header(resource_name, description, serialization, infos=()):
+    """Return the XML preceding the table data."""
+    lines = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        f'<VOTABLE version="1.4" xmlns="{VOTABLE_NAMESPACE}">',
+        f' <RESOURCE name={quoteattr(resource_name)} type="results">',
+        *info_elements(infos, '  '),
+        '  <TABLE>',
+        f'   <DESCRIPTION>{escape(description)}</DESCRIPTION>',
+    ]
+    for field in OBSERVATION_FIELDS:
+        arraysize = ' arraysize="*"' if field['datatype'] == 'char' else ''
+        lines.append(
+            f'   <FIELD ID="{field["name"]}" name="{field["name"]}" datatype="{field["datatype"]}"'
+            f'{arraysize} ucd="{field["ucd"]}">'
+        )
+        lines.append(f'    <DESCRIPTION>{escape(field["description"])}</DESCRIPTION>')
+        lines.append('   </FIELD>')
+    lines.append('   <DATA>')
+    lines.append('    <BINARY2>\n     <STREAM encoding="base64">' if serialization == 'binary2' else '    <TABLEDATA>')
+    return '\n'.join(lines) + '\n'
+
+
+def votable_footer(serialization):
+    """Return the XML following the table data."""
+    closing = '\n     </STREAM>\n    </BINARY2>' if serialization == 'binary2' else '    </TABLEDATA>'
+    return closing + '\n   </DATA>\n  </TABLE>\n </RESOURCE>\n</VOTABLE>\n'
+
+
+def error_votable(message):
+    """Return a VOTable document reporting an error, as expected by IVOA protocols (QUERY_STATUS=ERROR)."""
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        f'<VOTABLE version="1.4" xmlns="{VOTABLE_NAMESPACE}">\n'
+        ' <RESOURCE type="results">\n'
+        f'  <INFO name="QUERY_STATUS" value="ERROR">{escape(message)}</INFO>\n'
+        ' </RESOURCE>\n'
+        '</VOTABLE>\n'
+    )
+
+
+def encode_tabledata(columns):
+    """Encode columns as TABLEDATA rows."""
+    formatted = []
+    for field, column in zip(OBSERVATION_FIELDS, columns):
+        if field['datatype'] == 'char':
+            formatted.append(['' if value is None else escape(value) for value in column])
+        else:
+            formatted.append(['' if value is None else repr(value) for value in column])
+    return ''.join(
+        '     <TR>' + ''.join(f'<TD>{value}</TD>' for value in row) + '</TR>\n'
+        for row in zip(*formatted)
+    )
+
+
+def encode_binary2(columns):
+    """Encode columns as BINARY2 rows: a null-flag bit mask followed by the values of each row."""
+    row_count = len(columns[0])
+    mask_size = (len(OBSERVATION_FIELDS) + 7) // 8
+    null_masks = np.zeros((row_count, mask_size), dtype=np.uint8)
+    encoded = []
+    for index, (field, column) in enumerate(zip(OBSERVATION_FIELDS, columns)):
+        nulls = np.array([value is None for value in column], dtype=bool)
+        null_masks[:, index // 8] |= (nulls.astype(np.uint8) << (7 - index % 8))
+        if field['datatype'] == 'char':
+            values = [b'' if value is None else value.encode('utf-8') for value in column]
+            encoded.append([struct.pack('>I', len(value)) + value for value in values])
+        else:
+            dtype, null_value = BINARY_TYPES[field['datatype']]
+            array = np.array([null_value if value is None else value for value in column], dtype=dtype)
+            data, size = array.tobytes(), array.itemsize
+            encoded.append([data[i * size:(i + 1) * size] for i in range(row_count)])
+    masks = [mask.tobytes() for mask in null_masks]
+    return b''.join(mask + b''.join(values) for mask, *values in zip(masks, *encoded))
+
+
+def stream_votable(chunks, fits_base_url, resource_name='GAPC observations',
+                   description='Observations from the GAPC catalog', serialization='tabledata', infos=()):
+    """
+    Yield a VOTable document piece by piece.
+
+    :param chunks: Iterator of row chunks, as returned by `observation_rows`
+    :param fits_base_url: URL prefix of the FITS files (the URL-quoted relative path is appended)
+    :param serialization: 'tabledata' or 'binary2'
+    :param infos: (name, value) pairs written as INFO elements of the resource
+    """
+    if serialization not in SERIALIZATIONS:
+        raise ValueError(f"Unsupported serialization: {serialization}")
+
+    yield votable_header(resource_name, description, serialization, infos)
+    pending = b''
+    for chunk in chunks:
+        columns = to_columns(chunk, fits_base_url)
+        if serialization == 'tabledata':
+            yield encode_tabledata(columns)
+        else:
+            # Base64-encode whole 3-byte groups only, the remainder goes with the next chunk
+            pending += encode_binary2(columns)
+            cut = len(pending) - len(pending) % 3
+            yield base64.encodebytes(pending[:cut]).decode('ascii')
+            pending = pending[cut:]
+    if pending:
+        yield base64.encodebytes(pending).decode('ascii')
+    yield votable_footer(serialization)
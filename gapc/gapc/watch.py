@@ -0,0 +1,193 @@
+"""
+Detection of FITS files arriving in a directory tree, used by `populate --watch`.
+
+The tree is walked with the include/exclude/skip rules of `scan_fits_files`.
+With inotify (through the optional `inotify_simple` package) every directory of
+the tree is watched, and a file is reported as soon as it is closed after
+writing or moved in; directories created or moved in are watched as they
+appear. Otherwise the tree is polled and a file is reported once its size and
+modification time have not changed between two polls. Files already present
+when watching starts, or when their directory appears, are always checked by
+polling, since they may still be being written.
+
+Like `gapc.ingest`, this module does not use the ORM.
+"""
+import os
+import math
+import time
+import logging
+
+from .ingest import matches_patterns, scan_fits_files
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:  # inotify is optional, polling is used instead
+    INotify = flags = None
+
+logger = logging.getLogger(__name__)
+
+
+class PollingWatcher:
+    """Report the files of a directory tree whose size and modification time are stable."""
+
+    def __init__(self, directory, suffixes, interval=0.5, include=(), exclude=(), skip=()):
+        """
+        :param directory: Directory to watch, recursively
+        :param suffixes: Lowercase filename suffixes of the files to report
+        :param interval: Seconds between two polls of the directory
+        :param include: Patterns of the files to report (all matching files if empty), as for `scan_fits_files`
+        :param exclude: Patterns of the files and directories to ignore
+        :param skip: Directories not to descend into (e.g. a processed directory inside `directory`)
+        """
+        self.directory = directory
+        self.suffixes = tuple(suffixes)
+        self.interval = interval
+        self.include = tuple(include)
+        self.exclude = tuple(exclude)
+        self.skip = list(skip)
+        self.previous = {}
+        self.reported = {}
+        self.next_poll = time.monotonic()
+
+    def scan(self):
+        """Return the identity (size, mtime_ns) of the matching files of the tree, by path."""
+        identities = {}
+        for path in scan_fits_files(self.directory, self.suffixes, self.include, self.exclude, self.skip):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            identities[path] = (stat.st_size, stat.st_mtime_ns)
+        return identities
+
+    def poll(self):
+        """
+        Scan the directory and return the files unchanged since the previous scan.
+
+        A file is reported once; it is reported again only if it changes afterwards.
+        """
+        current = self.scan()
+        ready = [
+            path for path, identity in current.items()
+            if self.previous.get(path) == identity and self.reported.get(path) != identity
+        ]
+        self.reported = {path: identity for path, identity in self.reported.items() if path in current}
+        self.reported.update((path, current[path]) for path in ready)
+        self.previous = current
+        return ready
+
+    def changes(self, timeout=None):
+        """
+        Wait for files ready to be ingested.
+
+        :param timeout: Maximum number of seconds to wait (defaults to the poll interval)
+        :return: A list of paths, possibly empty
+        """
+        timeout = self.interval if timeout is None else max(0.0, timeout)
+        delay = self.next_poll - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(0.0, delay))
+        self.next_poll = time.monotonic() + self.interval
+        return self.poll()
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(PollingWatcher):
+    """Report files on inotify close-after-write and moved-in events, in every directory of the tree."""
+
+    def __init__(self, directory, suffixes, interval=0.5, include=(), exclude=(), skip=()):
+        super().__init__(directory, suffixes, interval, include, exclude, skip)
+        self.skip = {os.path.realpath(path) for path in self.skip}
+        self.inotify = INotify()
+        self.watches = {}
+        self.add_watches(directory)
+        # Files present before the watch started are checked by polling until reported
+        self.initial = set(self.scan())
+
+    def ignored(self, path):
+        """Whether `path` is excluded, or a directory not to descend into."""
+        relative = os.path.relpath(path, self.directory)
+        return (matches_patterns(relative, os.path.basename(path), self.exclude)
+                or os.path.realpath(path) in self.skip)
+
+    def wanted(self, path):
+        """Whether the file at `path` (in a watched directory) is to be reported."""
+        relative, name = os.path.relpath(path, self.directory), os.path.basename(path)
+        return (name.lower().endswith(self.suffixes) and not matches_patterns(relative, name, self.exclude)
+                and (not self.include or matches_patterns(relative, name, self.include)))
+
+    def add_watches(self, top):
+        """
+        Watch `top` and its subdirectories, except the ignored ones.
+
+        :return: The matching files already in these directories
+        """
+        found = []
+        pending = [top]
+        while pending:
+            current = pending.pop()
+            try:
+                descriptor = self.inotify.add_watch(current, flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE)
+                with os.scandir(current) as entries:
+                    entries = list(entries)
+            except FileNotFoundError:  # Removed meanwhile
+                continue
+            self.watches[descriptor] = current
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if not self.ignored(entry.path):
+                        pending.append(entry.path)
+                elif self.wanted(entry.path):
+                    found.append(entry.path)
+        return found
+
+    def changes(self, timeout=None):
+        timeout = self.interval if timeout is None else max(0.0, timeout)
+        if self.initial:
+            ready = [path for path in super().changes(timeout) if path in self.initial]
+            self.initial &= set(self.previous)
+            self.initial -= set(ready)
+            # Events of files arriving meanwhile are queued, files already ingested are skipped then
+            return ready
+
+        # In whole milliseconds, rounded up; a negative timeout would block indefinitely
+        events = self.inotify.read(timeout=math.ceil(timeout * 1000))
+        ready = []
+        for event in events:
+            if event.mask & flags.IGNORED:
+                # The directory was removed (or unmounted)
+                self.watches.pop(event.wd, None)
+                continue
+            if event.wd not in self.watches:
+                continue
+            path = os.path.join(self.watches[event.wd], event.name)
+            if event.mask & flags.ISDIR:
+                if event.mask & (flags.CREATE | flags.MOVED_TO) and not self.ignored(path):
+                    try:
+                        # Its files may have been written before the watch was added, they are polled
+                        self.initial.update(self.add_watches(path))
+                    except OSError as e:  # e.g. out of inotify watches
+                        logger.warning(f"Cannot watch directory {path}: {e}")
+                continue
+            if event.mask & flags.CREATE or not self.wanted(path):
+                continue
+            if path not in ready and os.path.isfile(path):
+                ready.append(path)
+        return ready
+
+    def close(self):
+        self.inotify.close()
+
+
+def make_watcher(directory, suffixes, interval=0.5, poll=False, include=(), exclude=(), skip=()):
+    """Return an inotify watcher when available (and `poll` is not set), a polling watcher otherwise."""
+    if not poll and INotify is not None:
+        try:
+            return InotifyWatcher(directory, suffixes, interval, include, exclude, skip)
+        except OSError as e:
+            logger.warning(f"inotify is not available ({e}), polling '{directory}' instead")
+    return PollingWatcher(directory, suffixes, interval, include, exclude, skip)